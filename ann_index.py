@@ -0,0 +1,220 @@
+"""Approximate nearest-neighbour index over the abstract embeddings.
+
+An inverted-file (IVF) index: unit-normalised vectors are partitioned
+among `nlist` k-means centroids, and a query scans only the lists of its
+`nprobe` closest centroids. Vectors are stored grouped by list, so each
+probed list is one contiguous slice of a memory-mapped matrix.
+
+    <path>/meta.json         counts, model, centroids' training size (written last)
+    <path>/<version>/centroids.npy
+                             nlist x dim float32, unit length
+    <path>/<version>/offsets.npy
+                             list i holds entries offsets[i]:offsets[i + 1]
+    <path>/<version>/vectors.npy
+                             entries x dim float16, unit length, grouped by list
+    <path>/<version>/rows.npy
+                             embedding store row of each entry
+    <path>/<version>/ids.txt paper id of each entry
+
+Each build writes a new version directory and then swaps meta.json
+(store_versions.py), so a server keeps reading the index it has mapped.
+
+build_index() is incremental: entries whose store row is unchanged keep
+their list, and only new or re-embedded papers are assigned. Centroids are
+retrained once the corpus has doubled since they were fitted.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import metrics
+import store_versions
+
+DEFAULT_NPROBE = 12
+MAX_K = 100
+
+
+def _normalise(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _assign(matrix, rows, centroids, chunk=65536):
+    """Closest centroid (by cosine) of each of the given store rows."""
+    lists = np.empty(len(rows), dtype=np.int32)
+    for start in range(0, len(rows), chunk):
+        block = rows[start:start + chunk]
+        by_row = np.argsort(block)  # sequential reads from the memmap
+        lists[start + by_row] = (_normalise(matrix[block[by_row]]) @ centroids.T).argmax(axis=1)
+    return lists
+
+
+def _train(matrix, rows, seed=0, sample=100_000):
+    """Unit-length k-means centroids of a sample of the given store rows."""
+    from sklearn.cluster import MiniBatchKMeans
+
+    n = len(rows)
+    nlist = int(min(max(1, 4 * np.sqrt(n)), 65536, n))
+    rng = np.random.default_rng(seed)
+    sample = np.sort(rng.choice(rows, size=min(n, max(sample, 40 * nlist)), replace=False))
+    kmeans = MiniBatchKMeans(n_clusters=nlist, random_state=seed, batch_size=4096, n_init=1)
+    kmeans.fit(_normalise(matrix[sample]))
+    return _normalise(kmeans.cluster_centers_)
+
+
+def build_index(store, path, rebuild=False):
+    """(Re)build the index at `path` from an embedding_store.EmbeddingStore
+    so it covers every paper in the store. Returns the new meta dict."""
+    ids = list(store.keys)
+    rows = np.array([store.keys[pid][0] for pid in ids], dtype=np.int64)
+    matrix = store.matrix()
+
+    old = None
+    if not rebuild and os.path.exists(os.path.join(path, "meta.json")):
+        old = store_versions.read_meta(path)
+        if old["model"] != store.model_name or len(ids) > 2 * old["trained_on"]:
+            old = None
+
+    lists = np.full(len(ids), -1, dtype=np.int32)
+    if old is not None:
+        old_dir = store_versions.data_dir(path, old)
+        centroids = np.load(os.path.join(old_dir, "centroids.npy"))
+        offsets = np.load(os.path.join(old_dir, "offsets.npy"))
+        with open(os.path.join(old_dir, "ids.txt"), encoding="utf-8") as f:
+            old_ids = pd.Index(f.read().splitlines())
+        old_rows = np.load(os.path.join(old_dir, "rows.npy"))
+        old_lists = np.repeat(np.arange(len(offsets) - 1, dtype=np.int32), np.diff(offsets))
+
+        # Keep the list of every paper whose vector has not changed
+        where = old_ids.get_indexer(ids)
+        kept = (where >= 0)
+        kept[kept] = old_rows[where[kept]] == rows[kept]
+        lists[kept] = old_lists[where[kept]]
+        trained_on = old["trained_on"]
+    else:
+        centroids = _train(matrix, rows) if len(ids) else np.empty((0, store.dim or 0))
+        trained_on = len(ids)
+
+    todo = np.flatnonzero(lists < 0)
+    if len(todo):
+        lists[todo] = _assign(matrix, rows[todo], centroids)
+    added = len(todo)
+
+    order = np.argsort(lists, kind="stable")
+    offsets = np.searchsorted(lists[order], np.arange(len(centroids) + 1)).astype(np.int64)
+    entries = rows[order]
+
+    version = store_versions.new_version(path)
+    np.save(os.path.join(version, "centroids.npy"), centroids.astype(np.float32))
+    np.save(os.path.join(version, "offsets.npy"), offsets)
+    np.save(os.path.join(version, "rows.npy"), entries)
+    vectors = np.lib.format.open_memmap(os.path.join(version, "vectors.npy"), mode="w+", dtype=np.float16,
+                                        shape=(len(entries), store.dim or 0))
+    for start in range(0, len(entries), 65536):
+        # Read the store in row order within each block, then put it back in list order
+        block = entries[start:start + 65536]
+        by_row = np.argsort(block)
+        chunk = np.empty((len(block), store.dim), dtype=np.float32)
+        chunk[by_row] = _normalise(matrix[block[by_row]])
+        vectors[start:start + len(block)] = chunk
+    vectors.flush()
+    del vectors
+    with open(os.path.join(version, "ids.txt"), "w", encoding="utf-8") as f:
+        f.writelines(ids[i] + "\n" for i in order)
+
+    meta = {
+        "model": store.model_name,
+        "papers": len(entries),
+        "nlist": len(centroids),
+        "trained_on": trained_on,
+        "assigned": int(added),
+        "built_at": time.time(),
+    }
+    return store_versions.publish(path, version, meta)
+
+
+class AnnIndex:
+    """One opened index; arrays are memory-mapped and shared between requests."""
+
+    def __init__(self, path, mtime):
+        self.path = path
+        self.mtime = mtime
+        self.meta = store_versions.read_meta(path)
+        data = store_versions.data_dir(path, self.meta)
+        self.centroids = np.load(os.path.join(data, "centroids.npy"))
+        self.offsets = np.load(os.path.join(data, "offsets.npy"))
+        self.vectors = np.load(os.path.join(data, "vectors.npy"), mmap_mode="r")
+        with open(os.path.join(data, "ids.txt"), encoding="utf-8") as f:
+            self.ids = pd.Index(f.read().splitlines())
+        self.loaded_at = time.time()
+
+    def __contains__(self, paper_id):
+        return paper_id in self.ids
+
+    def search(self, query, k=10, nprobe=DEFAULT_NPROBE, exclude=None):
+        """[(entry, cosine score)] of the k entries closest to `query`."""
+        query = _normalise(np.asarray(query)[None, :])[0]
+        nprobe = min(nprobe, len(self.centroids))
+        if nprobe == 0:
+            return []
+        probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        entries = np.concatenate([np.arange(self.offsets[i], self.offsets[i + 1]) for i in probe])
+        candidates = np.concatenate([self.vectors[self.offsets[i]:self.offsets[i + 1]] for i in probe])
+        if exclude is not None:
+            keep = entries != exclude
+            entries, candidates = entries[keep], candidates[keep]
+        if not len(entries):
+            return []
+
+        scores = candidates.astype(np.float32) @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(entries[i]), float(scores[i])) for i in top]
+
+    def similar(self, paper_id, k=10, nprobe=DEFAULT_NPROBE):
+        """[(paper id, cosine score)] of the papers most similar to `paper_id`'s
+        abstract, best first. Raises KeyError for a paper not in the index."""
+        entry = self.ids.get_loc(paper_id)
+        hits = self.search(self.vectors[entry], k, nprobe, exclude=entry)
+        return [(self.ids[i], score) for i, score in hits]
+
+    def stats(self):
+        return {
+            "papers": self.meta["papers"],
+            "nlist": self.meta["nlist"],
+            "built_at": self.meta["built_at"],
+            "loaded_at": self.loaded_at,
+        }
+
+
+class IndexCache:
+    """The index at `path`, reopened when its meta.json changes (same policy
+    as category_store.CategoryStore)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._index = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """The current AnnIndex, or None if none has been built."""
+        meta_path = os.path.join(self.path, "meta.json")
+        if not os.path.isfile(meta_path):
+            return None
+        mtime = os.stat(meta_path).st_mtime
+        index = self._index
+        if index is not None and index.mtime == mtime:
+            return index
+        with self._lock:
+            if self._index is None or self._index.mtime != mtime:
+                with metrics.timed("ann_index"):
+                    self._index = AnnIndex(self.path, mtime)
+            return self._index
+
+    def stats(self):
+        return self._index.stats() if self._index is not None else {"loaded": False}
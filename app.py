@@ -1,9 +1,19 @@
-from flask import Flask, jsonify, send_from_directory, render_template, request
+from flask import Flask, jsonify, send_from_directory, render_template, request, Response
 from flask_cors import CORS
-import pandas as pd
-import json
 import os
-import ast
+import numpy as np
+import metrics
+from search_index import SEARCH_FIELDS
+from category_store import CategoryStore
+from author_graph import build_author_paper_graph, filter_papers
+from graph_cache import ENCODINGS, GraphCache
+from citation_store import load_citation_store
+from graph_store import GraphStore
+from ann_index import IndexCache, MAX_K
+from stats_cube import CubeCache, parse_filters
+from category_graphs import CategoryGraphs
+from author_index import AuthorIndexCache
+from coauthor_store import CoauthorCache, store_dir_for as coauthor_store_dir
 
 app = Flask(__name__)
 PAGE_SIZE = 50
@@ -11,6 +21,9 @@ DATA_DIR = "datafiles_categories"
 CSV_DIR = "datafiles"
 CORS(app)
 
+# Per-route latency and payload histograms for /metrics; see metrics.py
+metrics.instrument(app)
+
 CATEGORIES = {
     "computer_science": "computer_science.json",
     "physics": "physics.json",
@@ -22,6 +35,30 @@ CATEGORIES = {
     "economics": "economics.json"
 }
 
+# Category files are parsed once and kept resident; see category_store.py
+store = CategoryStore(DATA_DIR, CATEGORIES)
+
+# Graph API payloads are built once per version of arxiv.csv; see graph_cache.py
+graph_cache = GraphCache(os.path.join(CSV_DIR, 'arxiv.csv'))
+
+# Laid-out graphs tiled for level-of-detail viewing; see graph_store.py
+graph_store = GraphStore("graph_store")
+
+# Nearest-neighbour index over abstract embeddings; see ann_index.py
+similar_index = IndexCache("ann_index")
+
+# Paper counts by category, month and cross-listing; see stats_cube.py
+stats_cube = CubeCache("stats_cube")
+
+# Per-category citation graphs filtered from one metrics store; see category_graphs.py
+category_graphs = CategoryGraphs(os.path.join(CSV_DIR, 'arxiv.csv'))
+
+# Deduplicated authors and their name index; see author_index.py
+author_index = AuthorIndexCache(os.path.join(CSV_DIR, 'arxiv.csv'))
+
+# Papers shared by each coauthor pair, for edge details; see coauthor_store.py
+coauthor_edges = CoauthorCache(coauthor_store_dir(os.path.join(CSV_DIR, 'arxiv.csv')))
+
 # ---------- Static HTML Page Routes ---------- #
 
 @app.route("/")
@@ -50,15 +87,230 @@ def coauthor_3d():
 
 @app.route('/api/graph_data')
 def get_graph_data():
-    return jsonify(load_data())
+    # ?limit=0 serves every row; ?category= narrows to e.g. "cs" or "cs.LG".
+    # Equivalent requests share one cache entry (see graph_cache.py)
+    limit = max(request.args.get("limit", 10000, type=int), 0)
+    category = (request.args.get("category") or "").strip() or None
+    return graph_response("graph_data", load_data, limit=limit, category=category)
 
 @app.route('/api/coauthor_graph_data')
 def get_coauthor_graph_data():
-    return jsonify(load_coauthor_data())
+    return graph_response("coauthor_graph_data", load_coauthor_data)
 
 @app.route('/api/citation_graph_data')
 def get_citation_graph_data():
-    return jsonify(load_citation_data())
+    return graph_response("citation_graph_data", load_citation_data)
+
+@app.route('/api/graph_cache')
+def graph_cache_stats():
+    return jsonify(graph_cache.stats())
+
+@app.route('/api/graph/<name>/tiles')
+def graph_tiles(name):
+    # ?bbox=x0,y0,x1,y1 in layout units [0, 1]; ?zoom= picks the level of detail
+    graph = graph_store.get(name)
+    if graph is None:
+        return jsonify({"error": "Graph not found"}), 404
+
+    bbox = request.args.get("bbox", "0,0,1,1").split(",")
+    try:
+        bbox = [float(v) for v in bbox]
+    except ValueError:
+        bbox = []
+    if len(bbox) != 4:
+        return jsonify({"error": "bbox must be x0,y0,x1,y1"}), 400
+
+    try:
+        return jsonify(graph.tiles(bbox, request.args.get("zoom", 0, type=int), requested_fields()))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/api/subgraph')
+def subgraph():
+    # ?graph=<name>&top=N&metric=pagerank, optional ?category= and ?year=2005 or 2000-2010
+    graph = graph_store.get(request.args.get("graph", ""))
+    if graph is None:
+        return jsonify({"error": "Graph not found", "graphs": graph_store.names()}), 404
+
+    try:
+        return jsonify(graph.subgraph(
+            request.args.get("top", 1000, type=int),
+            metric=request.args.get("metric", "pagerank"),
+            category=request.args.get("category") or None,
+            years=requested_years(),
+            fields=requested_fields()))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/api/category_graph/<category>')
+def category_graph(category):
+    # Citation graph within a category: optional ?year=2005 or 2000-2010,
+    # ?min_degree=N (links within the view), ?top=N by ?metric=pagerank
+    top = request.args.get("top", type=int)
+    try:
+        graph = category_graphs.view(
+            category,
+            years=requested_years(),
+            min_degree=request.args.get("min_degree", 0, type=int),
+            top=top if top is None else max(top, 0),
+            metric=request.args.get("metric", "pagerank"))
+    except KeyError:
+        return jsonify({"error": "Category not found"}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if graph is None:
+        return jsonify({"error": "Category graphs not built"}), 404
+    return jsonify(graph)
+
+@app.route('/api/category_graphs')
+def category_graphs_stats():
+    return jsonify(category_graphs.stats())
+
+@app.route('/api/author/<path:name>')
+def author_api(name):
+    # One author by any spelling of their name: ?papers=N newest papers, top coauthors
+    index = author_index.get()
+    if index is None:
+        return jsonify({"error": "Author index not built"}), 404
+    max_papers = min(max(request.args.get("papers", 100, type=int), 0), 1000)
+    try:
+        return jsonify(index.author(name, max_papers=max_papers))
+    except KeyError:
+        return jsonify({"error": "Author not found", "suggestions": index.suggest(name, 5)}), 404
+
+@app.route('/api/authors/autocomplete')
+def author_autocomplete():
+    # ?q=name prefix&limit=10, authors with the most papers first
+    index = author_index.get()
+    if index is None:
+        return jsonify({"error": "Author index not built"}), 404
+    query = request.args.get("q", "")
+    limit = min(max(request.args.get("limit", 10, type=int), 1), 50)
+    return jsonify({"query": query, "authors": index.suggest(query, limit)})
+
+@app.route('/api/coauthor/edge')
+def coauthor_edge():
+    # ?a=author:<name>&b=author:<name> -> the papers the two wrote together
+    index, edges = author_index.get(), coauthor_edges.get()
+    if index is None or edges is None:
+        return jsonify({"error": "Coauthor store not built"}), 404
+    if edges.meta["author_index_built_at"] != index.meta["built_at"]:
+        return jsonify({"error": "Coauthor store is older than the author index; rebuild it"}), 404
+    names = [request.args.get(side, "").removeprefix("author:") for side in ("a", "b")]
+    if not all(names):
+        return jsonify({"error": "a and b are required"}), 400
+    try:
+        a, b = (index.find(name) for name in names)
+    except KeyError:
+        return jsonify({"error": "Author not found"}), 404
+    try:
+        weight, papers = edges.edge(a, b)
+    except KeyError:
+        return jsonify({"error": "These authors have no paper together"}), 404
+    papers = papers[np.argsort(-np.asarray(index.year[papers]), kind="stable")].tolist()
+    return jsonify({
+        "a": index.records([a])[0],
+        "b": index.records([b])[0],
+        "weight": weight,
+        "papers": [dict(paper, year=int(year) or None)
+                   for paper, year in zip(index.papers.rows(papers), np.asarray(index.year[papers]).tolist())]
+    })
+
+@app.route('/api/coauthor_store')
+def coauthor_store_stats():
+    return jsonify(coauthor_edges.stats())
+
+@app.route('/api/author_index')
+def author_index_stats():
+    return jsonify(author_index.stats())
+
+@app.route('/api/graph_store')
+def graph_store_stats():
+    return jsonify(graph_store.stats())
+
+@app.route('/api/paper/<path:paper_id>/similar')
+def similar_papers(paper_id):
+    # ?k= papers with the closest abstracts (cosine similarity), best first
+    index = similar_index.get()
+    if index is None:
+        return jsonify({"error": "Similarity index not built"}), 404
+    k = min(max(request.args.get("k", 10, type=int), 1), MAX_K)
+    try:
+        hits = index.similar(paper_id, k)
+    except KeyError:
+        return jsonify({"error": "Paper not found"}), 404
+    return jsonify({
+        "id": paper_id,
+        "similar": [{"id": pid, "score": round(score, 4)} for pid, score in hits]
+    })
+
+@app.route('/api/similar_index')
+def similar_index_stats():
+    return jsonify(similar_index.stats())
+
+@app.route('/api/stats')
+def stats():
+    # ?group_by=main,year&filter=category:cs.LG|cs.AI,year:2015..2020
+    cube = stats_cube.get()
+    if cube is None:
+        return jsonify({"error": "Stats cube not built"}), 404
+    group_by = [d for d in request.args.get("group_by", "").split(",") if d]
+    try:
+        rows = cube.query(group_by, parse_filters(request.args.get("filter")))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"group_by": group_by, "rows": rows})
+
+@app.route('/api/stats_cube')
+def stats_cube_stats():
+    return jsonify(stats_cube.stats())
+
+@app.route('/metrics')
+def metrics_endpoint():
+    # Prometheus text format, summed over every worker of the server
+    return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
+
+def warm_graph_cache():
+    """Build (or load from disk) the default graph payloads ahead of requests."""
+    graph_cache.get("graph_data", load_data, limit=10000, category=None)
+    graph_cache.get("coauthor_graph_data", load_coauthor_data)
+    graph_cache.get("citation_graph_data", load_citation_data)
+
+def preload_data():
+    """Load every dataset and index this process serves up front. wsgi.py
+    calls it in a preforking server's master, so workers share the result."""
+    store.preload()
+    for category in CATEGORIES:
+        data = store.get(category)
+        if data is not None:
+            data.search_index()
+    if os.path.exists(graph_cache.source_path):
+        warm_graph_cache()
+    for name in graph_store.names():
+        graph_store.get(name)
+    similar_index.get()
+    stats_cube.get()
+    category_graphs.store()
+    author_index.get()
+    coauthor_edges.get()
+
+def graph_response(name, builder, **params):
+    """Serve a cached graph artifact, pre-compressed when the client allows
+    it, with ETag/Last-Modified so repeat loads can be answered with a 304."""
+    if not os.path.exists(graph_cache.source_path):
+        return jsonify({"error": "File not found"}), 404
+
+    artifact = graph_cache.get(name, builder, **params)
+    encoding = next((e for e in ENCODINGS if e in request.accept_encodings), None)
+
+    response = Response(artifact.body(encoding), mimetype="application/json")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Vary"] = "Accept-Encoding"
+    response.set_etag(f"{artifact.etag}-{encoding or 'identity'}")
+    response.last_modified = artifact.last_modified
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 @app.route('/graphdata/<path:filename>')
 def serve_graphdata(filename):
@@ -83,69 +335,78 @@ def category_api(category):
     if category not in CATEGORIES:
         return jsonify({"error": "Invalid category"}), 404
 
-    filepath = os.path.join(DATA_DIR, CATEGORIES[category])
-    if not os.path.exists(filepath):
+    data = store.get(category)
+    if data is None:
         return jsonify({"error": "File not found"}), 404
 
-    with open(filepath, encoding="utf-8") as f:
-        data = json.load(f)
-        papers = data.get("nodes", [])
-
     page = int(request.args.get("page", 1))
     start = (page - 1) * PAGE_SIZE
     end = start + PAGE_SIZE
-    total_pages = (len(papers) + PAGE_SIZE - 1) // PAGE_SIZE
+    total_pages = (len(data) + PAGE_SIZE - 1) // PAGE_SIZE
 
     return jsonify({
         "page": page,
         "total_pages": total_pages,
-        "papers": papers[start:end]
+        "papers": data.page(start, end, requested_fields())
     })
 
-# ---------- Load Graph Data from CSV ---------- #
+def requested_years():
+    """`?year=2005` or `?year=2000-2010` as an inclusive (first, last) pair, or None."""
+    years = request.args.get("year")
+    if not years:
+        return None
+    try:
+        bounds = [int(v) for v in years.split("-")]
+    except ValueError:
+        bounds = []
+    if len(bounds) not in (1, 2):
+        raise ValueError("year must be YYYY or YYYY-YYYY")
+    return bounds[0], bounds[-1]
+
+def requested_fields():
+    """`?fields=title,authors` limits the paper fields returned (default: all)."""
+    fields = request.args.get("fields")
+    return set(fields.split(",")) if fields else None
+
+@app.route("/api/category_store")
+def category_store_stats():
+    return jsonify(store.stats())
+
+# ---------- Full-Text Search over a Whole Category ---------- #
+
+@app.route("/api/<category>/search")
+def category_search_api(category):
+    if category not in CATEGORIES:
+        return jsonify({"error": "Invalid category"}), 404
 
-def load_data():
-    file_path = os.path.join(CSV_DIR, 'arxiv.csv')
-    df = pd.read_csv(file_path).head(10000)
+    data = store.get(category)
+    if data is None:
+        return jsonify({"error": "File not found"}), 404
 
-    nodes = []
-    links = []
-    paper_id_map = {}
+    queries = {name: request.args[name] for name in ["q", *SEARCH_FIELDS] if request.args.get(name)}
+    page = max(request.args.get("page", 1, type=int), 1)
+    start = (page - 1) * PAGE_SIZE
 
-    for i, row in df.iterrows():
-        paper_id = row['id']
-        title = row['title']
-        category = row['categories']
+    total, hits = data.search_index().search(queries, offset=start, limit=PAGE_SIZE)
+    total_pages = (total + PAGE_SIZE - 1) // PAGE_SIZE
 
-        paper_node = {
-            'id': paper_id,
-            'label': title,
-            'type': 'paper',
-            'category': category
-        }
-        nodes.append(paper_node)
-        paper_id_map[paper_id] = paper_node
+    return jsonify({
+        "page": page,
+        "total_pages": total_pages,
+        "total": total,
+        "papers": [
+            dict(paper, score=round(score, 4))
+            for paper, (_, score) in zip(data.rows([doc_id for doc_id, _ in hits], requested_fields()), hits)
+        ]
+    })
 
-        authors = str(row['authors']).split(',')[:3]
-        for author in authors:
-            author = author.strip()
-            author_node_id = f'author:{author}'
-            if not any(n['id'] == author_node_id for n in nodes):
-                nodes.append({
-                    'id': author_node_id,
-                    'label': author,
-                    'type': 'author'
-                })
-            links.append({
-                'source': author_node_id,
-                'target': paper_id
-            })
+# ---------- Load Graph Data from CSV ---------- #
 
-    return {'nodes': nodes, 'links': links}
+def load_data(df, limit=10000, category=None):
+    return build_author_paper_graph(filter_papers(df, category=category, limit=limit))
 
-def load_coauthor_data():
-    file_path = os.path.join(CSV_DIR, 'arxiv.csv')
-    df = pd.read_csv(file_path).head(10000)
+def load_coauthor_data(df):
+    df = df.head(10000)
 
     links = []
     nodes = {}
@@ -171,12 +432,10 @@ def load_coauthor_data():
 
     return {'nodes': list(nodes.values()), 'links': links}
 
-def load_citation_data():
-    file_path = os.path.join(CSV_DIR, 'arxiv.csv')
-    df = pd.read_csv(file_path).head(10000)
+def load_citation_data(df):
+    df = df.head(10000)
 
     nodes = {}
-    links = []
 
     for _, row in df.iterrows():
         paper_id = row['id']
@@ -189,22 +448,31 @@ def load_citation_data():
             'category': category
         }
 
-    for _, row in df.iterrows():
-        if 'citations' in df.columns and pd.notna(row['citations']):
-            try:
-                cited_ids = ast.literal_eval(row['citations'])
-                for cited in cited_ids:
-                    if cited in nodes:
-                        links.append({
-                            'source': row['id'],
-                            'target': cited
-                        })
-            except Exception as e:
-                print(f"Error parsing citations for {row['id']}: {e}")
+    # Citations between these papers, from the integer edge store compiled
+    # once per version of the CSV (see citation_store.py)
+    if 'citations' not in df.columns:
+        return {'nodes': list(nodes.values()), 'links': []}
+    citations = load_citation_store(graph_cache.source_path)
+    # Store rows are CSV rows, so the frame's index selects the citing rows
+    citing_rows = np.zeros(len(citations), dtype=bool)
+    citing_rows[df.index.to_numpy()] = True
+    cited_rows = citations.ids.isin(list(nodes))
+    citing, cited = citations.edges()
+    keep = citing_rows[citing] & cited_rows[cited]
+    links = [
+        {'source': source, 'target': target}
+        for source, target in zip(citations.ids[citing[keep]], citations.ids[cited[keep]])
+    ]
 
     return {'nodes': list(nodes.values()), 'links': links}
 
 # ---------- Run the App ---------- #
 
 if __name__ == "__main__":
+    # PRELOAD_CATEGORIES=1 parses every category file before serving
+    if os.environ.get("PRELOAD_CATEGORIES"):
+        store.preload()
+    # PRELOAD_GRAPHS=1 builds the default graph payloads before serving
+    if os.environ.get("PRELOAD_GRAPHS"):
+        warm_graph_cache()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,56 @@
+import json
+
+# Fields kept from the raw arXiv metadata, including update_date
+CLEAN_FIELDS = ["id", "submitter", "authors", "title", "categories", "abstract", "update_date"]
+
+# Category mapping (arXiv category prefix to main category)
+PREFIX_TO_CATEGORY = {
+    "astro-ph": "physics", "cond-mat": "physics", "gr-qc": "physics", "hep-ex": "physics",
+    "hep-lat": "physics", "hep-ph": "physics", "hep-th": "physics", "math-ph": "physics",
+    "nlin": "physics", "nucl-ex": "physics", "nucl-th": "physics", "physics": "physics", "quant-ph": "physics",
+    "math": "mathematics",
+    "cs": "computer_science",
+    "q-bio": "quantitative_biology",
+    "q-fin": "quantitative_finance",
+    "stat": "statistics",
+    "eess": "electrical_engineering",
+    "econ": "economics"
+}
+
+
+def clean_record(record):
+    cleaned = {field: record.get(field, "") for field in CLEAN_FIELDS}
+    if isinstance(cleaned["abstract"], str):
+        cleaned["abstract"] = cleaned["abstract"].strip()
+    return cleaned
+
+
+def main_categories(categories):
+    """Main categories of a space-separated arXiv category string, each once,
+    in order of first appearance."""
+    found = []
+    for cat in categories.split():
+        main_cat = PREFIX_TO_CATEGORY.get(cat.split(".")[0])
+        if main_cat and main_cat not in found:
+            found.append(main_cat)
+    return found
+
+
+def iter_records(path):
+    """Yield the records of a metadata/cleaned shard one at a time.
+
+    Shards are JSON lines; older cleaned shards are a single
+    `{"nodes": [...]}` document, which has to be parsed whole.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        first = f.readline().strip()
+        f.seek(0)
+        if first == "{" or first.startswith('{"nodes"'):
+            yield from json.load(f).get("nodes", [])
+            return
+
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue  # skip malformed lines
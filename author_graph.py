@@ -0,0 +1,95 @@
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def category_pattern(category):
+    """Regex matching a space-separated category list that contains
+    `category` exactly, or as an archive prefix ("cs" matches "cs.LG")."""
+    return rf"(?:^|\s){re.escape(category)}(?:[.\s]|$)"
+
+
+def filter_papers(df, category=None, limit=None):
+    """Rows listed under `category` (an exact arXiv category like "cs.LG",
+    or an archive prefix like "cs"), then the first `limit` of them."""
+    if category:
+        df = df[df["categories"].astype(str).str.contains(category_pattern(category), regex=True)]
+    if limit:
+        df = df.head(limit)
+    return df
+
+
+def build_author_paper_graph(df, max_authors=3):
+    """Bipartite author-paper graph in the /api/graph_data format.
+
+    Every row becomes a paper node, linked from its first `max_authors`
+    comma-separated authors; each author gets one node, placed right after
+    the paper it first appears on. Author splitting and deduplication are
+    vectorized, so the build is linear in the number of rows.
+    """
+    df = df.reset_index(drop=True)
+    n_rows = len(df)
+
+    authors = df["authors"].astype(str).str.split(",").str[:max_authors].explode().str.strip()
+    author_rows = authors.index.to_numpy()
+    author_ids = ("author:" + authors).to_numpy()
+
+    links = pd.DataFrame({
+        "source": author_ids,
+        "target": df["id"].to_numpy()[author_rows]
+    })
+
+    first = ~pd.Series(author_ids).duplicated().to_numpy()
+    author_nodes = pd.DataFrame({
+        "id": author_ids[first],
+        "label": authors.to_numpy()[first],
+        "type": "author"
+    })
+    paper_nodes = pd.DataFrame({
+        "id": df["id"].to_numpy(),
+        "label": df["title"].to_numpy(),
+        "type": "paper",
+        "category": df["categories"].to_numpy()
+    })
+
+    # Interleave: each paper, then the authors first seen on it
+    rows = np.concatenate([np.arange(n_rows), author_rows[first]])
+    kinds = np.concatenate([np.zeros(n_rows, dtype=np.int8), np.ones(first.sum(), dtype=np.int8)])
+    order = np.lexsort((kinds, rows))
+
+    records = paper_nodes.to_dict("records") + author_nodes.to_dict("records")
+    return {
+        "nodes": [records[i] for i in order],
+        "links": links.to_dict("records")
+    }
+
+
+def benchmark(sizes=(10_000, 100_000, 1_000_000), seed=0):
+    """Build time on synthetic rows at increasing sizes."""
+    rng = np.random.default_rng(seed)
+    results = []
+    for size in sizes:
+        n_authors = max(size // 2, 1)
+        per_paper = rng.integers(1, 6, size)
+        names = rng.integers(0, n_authors, per_paper.sum())
+        splits = np.split(names, np.cumsum(per_paper)[:-1])
+        df = pd.DataFrame({
+            "id": [f"{i // 100000:04d}.{i % 100000:05d}" for i in range(size)],
+            "title": [f"Paper {i}" for i in range(size)],
+            "categories": rng.choice(["cs.LG", "math.CO", "hep-th", "stat.ML cs.LG"], size),
+            "authors": [", ".join(f"Author {a}" for a in s) for s in splits]
+        })
+
+        start = time.perf_counter()
+        graph = build_author_paper_graph(df)
+        elapsed = time.perf_counter() - start
+        results.append((size, len(graph["nodes"]), len(graph["links"]), elapsed))
+        print(f"{size:>9,} rows  {len(graph['nodes']):>9,} nodes  {len(graph['links']):>9,} links  "
+              f"{elapsed:7.2f}s  ({elapsed / size * 1e6:.1f} µs/row)")
+    return results
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,358 @@
+"""Deduplicated authors of a papers CSV, with integer ids and a name index.
+
+build_author_index() reads the `authors_parsed` column ([last, first,
+suffix] lists; the comma-separated `authors` string where that is missing),
+normalises every name to a key (TeX accents and diacritics folded to ASCII,
+lower case, punctuation collapsed to spaces) and merges authors by key:
+
+    <stem>_authors/meta.json         source signature and counts (written last)
+    <stem>_authors/<version>/        the files below, one directory per build (store_versions.py)
+    .../authors/                     name (most common spelling) and key per author (paper_shards.py)
+    .../keys.txt                     key of author i on line i
+    .../paper_count.npy              int32; authors are numbered by paper count, highest first
+    .../paper_indptr.npy, paper_authors.npy
+                                     authors of each paper, in byline order (CSR)
+    .../author_indptr.npy, author_papers.npy
+                                     papers of each author (CSR)
+    .../papers/                      id and title per paper; year.npy alongside
+    .../tokens.txt, token_indptr.npy, token_authors.npy
+                                     sorted key words -> authors, for prefix search
+    .../trigram_indptr.npy, trigram_authors.npy
+                                     key trigrams -> authors, for misspelt queries
+
+Papers are the distinct ids of the CSV; a repeated id keeps its first row,
+as in the citation store. Since author ids follow paper count, every
+posting list is sorted best first and a search reads only its head.
+"""
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import metrics
+import store_versions
+from category_graphs import paper_years
+from paper_shards import ShardReader, ShardWriter
+from pipeline_manifest import file_signature
+
+# Affiliations and collaborations that turn up in author lists
+INVALID_KEYWORDS = [
+    "University", "Institute", "Laboratory", "Dept", "Department",
+    "Collaboration", "College", "Group", "Center", "School",
+    "Russia", "Germany", "France", "China", "Japan", "USA",
+    "Poland", "Italy", "Turkey", "Argentina", "Korea", "India",
+    "UK", "Netherlands", "Mexico"
+]
+TEX_LETTERS = r"\\(ss|ae|oe|aa|o|l|i|j)\b"
+TEX_ACCENT = r"\\[`'\"^~=.uvHckbdrt]\s*\{?\s*([A-Za-z])\s*\}?"
+PARSED_NAME = (r"^\[\s*(['\"])(?P<last>.*?)\1\s*(?:,\s*(['\"])(?P<first>.*?)\3)?"
+               r"\s*(?:,\s*(['\"])(?P<suffix>.*?)\5)?")
+ALPHABET = " 0123456789abcdefghijklmnopqrstuvwxyz"
+TRIGRAMS = len(ALPHABET) ** 3
+MAX_QUERY = 64
+CANDIDATES = 50_000
+MAX_CHECKS = 5_000
+MIN_TRIGRAM_SHARE = 0.6
+
+
+def store_dir_for(csv_path):
+    """Default store location: next to the CSV, e.g. arxiv.csv -> arxiv_authors/."""
+    return os.path.splitext(csv_path)[0] + "_authors"
+
+
+def is_valid_author(author):
+    """Whether a byline entry looks like a person rather than an affiliation."""
+    return len(author) > 2 and not any(kw in author for kw in INVALID_KEYWORDS)
+
+
+def name_keys(names):
+    """Normalised key of each name: "Schr\\"odinger, E." -> "schrodinger e"."""
+    s = pd.Series(names, dtype=object).fillna("").astype(str)
+    s = s.str.replace(TEX_LETTERS, r"\1", regex=True).str.replace(TEX_ACCENT, r"\1", regex=True)
+    s = s.str.replace(r"\\[A-Za-z]+\s*|[{}\\]", "", regex=True)
+    s = s.str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii")
+    return s.str.lower().str.replace(r"[^a-z0-9]+", " ", regex=True).str.strip()
+
+
+def authorships(df):
+    """Series of display names ("First Last") indexed by row of `df`, in
+    byline order, with affiliations dropped."""
+    names = pd.Series(dtype=object)
+    parsed_rows = np.zeros(len(df), dtype=bool)
+    if "authors_parsed" in df.columns:
+        entries = df["authors_parsed"].fillna("").astype(str).str.findall(r"\[[^\[\]]*\]").explode().dropna()
+        # Each distinct entry is parsed once
+        codes, distinct = pd.factorize(entries)
+        parts = pd.Series(distinct, dtype=object).str.extract(PARSED_NAME)[["first", "last", "suffix"]].fillna("")
+        parsed = (parts["first"] + " " + parts["last"] + " " + parts["suffix"]).str.replace("\\\\", "\\", regex=False)
+        names = pd.Series(parsed.to_numpy()[codes], index=entries.index, dtype=object)
+        parsed_rows[np.unique(names.index.to_numpy())] = True
+
+    if "authors" in df.columns and not parsed_rows.all():
+        raw = df.loc[~parsed_rows, "authors"].fillna("").astype(str)
+        raw = raw.str.replace(r"\([^)]*\)", "", regex=True).str.replace(r"\s+and\s+", ",", regex=True)
+        names = pd.concat([names, raw.str.split(",").explode().dropna()]).sort_index(kind="stable")
+
+    codes, distinct = pd.factorize(names)
+    distinct = pd.Series(distinct, dtype=object).str.replace(r"\s+", " ", regex=True).str.strip()
+    valid = (distinct.str.len() > 2) & ~distinct.str.contains("|".join(INVALID_KEYWORDS), regex=True)
+    keep = valid.to_numpy()[codes]
+    return pd.Series(distinct.to_numpy()[codes[keep]], index=names.index[keep], dtype=object)
+
+
+def _trigram_codes(keys):
+    """(trigram code, position in `keys`) of every trigram of " key "."""
+    lookup = np.full(256, 255, dtype=np.uint8)
+    lookup[np.frombuffer(ALPHABET.encode(), dtype=np.uint8)] = np.arange(len(ALPHABET))
+    buffer = np.frombuffer(("\n".join(f" {key} " for key in keys)).encode("ascii"), dtype=np.uint8)
+    codes = lookup[buffer].astype(np.int64)
+    owner = np.cumsum(buffer == ord("\n"))
+    a, b, c = codes[:-2], codes[1:-1], codes[2:]
+    whole = (a != 255) & (b != 255) & (c != 255)
+    size = len(ALPHABET)
+    return ((a * size + b) * size + c)[whole], owner[:-2][whole]
+
+
+def _csr(groups, values, size):
+    """indptr over `size` groups for `values` already sorted by group."""
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(groups, minlength=size), out=indptr[1:])
+    return indptr, values
+
+
+def build_author_index(csv_path, store_dir=None):
+    """Build the author index for csv_path. Returns the meta dict."""
+    store_dir = store_dir or store_dir_for(csv_path)
+    signature = file_signature(csv_path)
+    header = pd.read_csv(csv_path, nrows=0).columns
+    usecols = [c for c in ("id", "title", "authors", "authors_parsed") if c in header]
+    df = pd.read_csv(csv_path, usecols=usecols, dtype={"id": str})
+    df = df[~df["id"].duplicated()].reset_index(drop=True)
+
+    # One row per (paper, author key), in byline order
+    names = authorships(df)
+    codes, distinct = pd.factorize(names)
+    keys = name_keys(distinct).to_numpy()[codes]
+    pairs = pd.DataFrame({"paper": names.index.to_numpy(), "key": keys, "name": names.to_numpy()})
+    pairs = pairs[pairs["key"] != ""].drop_duplicates(["paper", "key"]).reset_index(drop=True)
+
+    # Authors, numbered by paper count (then key); the most common spelling names each
+    table = pairs.groupby("key", sort=False).size().rename("papers").reset_index()
+    table = table.sort_values(["papers", "key"], ascending=[False, True], kind="stable").reset_index(drop=True)
+    author_of = pd.Index(table["key"]).get_indexer(pairs["key"])
+    spellings = pairs.assign(author=author_of).groupby(["author", "name"], sort=False).size().rename("uses")
+    spellings = spellings.reset_index().sort_values(["author", "uses"], ascending=[True, False], kind="stable")
+    display = spellings.drop_duplicates("author")["name"].to_numpy()
+    n_authors, n_papers = len(table), len(df)
+
+    paper_rows = pairs["paper"].to_numpy()
+    paper_indptr, paper_authors = _csr(paper_rows, author_of.astype(np.int32), n_papers)
+    by_author = np.argsort(author_of, kind="stable")
+    author_indptr, author_papers = _csr(author_of[by_author], paper_rows[by_author].astype(np.int32), n_authors)
+
+    # Prefix index: every word of every key, sorted, with its authors best first
+    words = table["key"].str.split().explode()
+    words = pd.DataFrame({"token": words.to_numpy(), "author": words.index.to_numpy()}).drop_duplicates()
+    words = words.sort_values(["token", "author"], kind="stable")
+    token_codes, tokens = pd.factorize(words["token"])
+    token_indptr, token_authors = _csr(token_codes, words["author"].to_numpy(np.int32), len(tokens))
+
+    trigrams, owners = _trigram_codes(table["key"])
+    grams = np.unique(trigrams * n_authors + owners)
+    trigram_indptr, trigram_authors = _csr(grams // n_authors if n_authors else grams,
+                                           (grams % n_authors if n_authors else grams).astype(np.int32),
+                                           TRIGRAMS)
+
+    version = store_versions.new_version(store_dir)
+    with ShardWriter(os.path.join(version, "authors"), ["name", "key"]) as writer:
+        for name, key in zip(display, table["key"]):
+            writer.append({"name": name, "key": key})
+    with ShardWriter(os.path.join(version, "papers"), ["id", "title"]) as writer:
+        titles = df["title"].fillna("").astype(str) if "title" in df else [""] * n_papers
+        for paper_id, title in zip(df["id"], titles):
+            writer.append({"id": paper_id, "title": title})
+    with open(os.path.join(version, "keys.txt"), "w", encoding="utf-8") as f:
+        f.writelines(key + "\n" for key in table["key"])
+    with open(os.path.join(version, "tokens.txt"), "w", encoding="utf-8") as f:
+        f.writelines(token + "\n" for token in tokens)
+    arrays = {
+        "paper_count": table["papers"].to_numpy(np.int32),
+        "paper_indptr": paper_indptr,
+        "paper_authors": paper_authors,
+        "author_indptr": author_indptr,
+        "author_papers": author_papers,
+        "year": paper_years(df["id"]),
+        "token_indptr": token_indptr,
+        "token_authors": token_authors,
+        "trigram_indptr": trigram_indptr,
+        "trigram_authors": trigram_authors,
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(version, f"{name}.npy"), array)
+
+    meta = {
+        "source": os.path.abspath(csv_path),
+        "signature": signature,
+        "papers": n_papers,
+        "authors": n_authors,
+        "authorships": len(pairs),
+        "built_at": time.time(),
+    }
+    return store_versions.publish(store_dir, version, meta)
+
+
+def is_current(csv_path, store_dir=None):
+    meta_path = os.path.join(store_dir or store_dir_for(csv_path), "meta.json")
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path, encoding="utf-8") as f:
+        return json.load(f).get("signature") == file_signature(csv_path)
+
+
+class AuthorIndex:
+    """One opened author index; arrays are memory-mapped."""
+
+    def __init__(self, store_dir, mtime=None):
+        self.path = store_dir
+        self.mtime = mtime
+        self.meta = store_versions.read_meta(store_dir)
+        data = store_versions.data_dir(store_dir, self.meta)
+        with open(os.path.join(data, "keys.txt"), encoding="utf-8") as f:
+            self.keys = pd.Index(f.read().splitlines())
+        with open(os.path.join(data, "tokens.txt"), encoding="utf-8") as f:
+            self.tokens = np.array(f.read().splitlines(), dtype=object)
+        for name in ("paper_count", "paper_indptr", "paper_authors", "author_indptr", "author_papers",
+                     "year", "token_indptr", "token_authors", "trigram_indptr", "trigram_authors"):
+            setattr(self, name, np.load(os.path.join(data, f"{name}.npy"), mmap_mode="r"))
+        self.authors = ShardReader(os.path.join(data, "authors"))
+        self.papers = ShardReader(os.path.join(data, "papers"))
+        self.keys.get_loc(self.keys[0]) if len(self.keys) else None  # build the hash table now
+        self.loaded_at = time.time()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def find(self, name):
+        """Author id of `name` (any spelling with the same key); KeyError if none."""
+        key = name_keys([name])[0]
+        return int(self.keys.get_loc(key))
+
+    def records(self, authors):
+        """[{"id", "name", "paper_count"}] of the given author ids."""
+        return [
+            {"id": author, "name": row["name"], "paper_count": int(self.paper_count[author])}
+            for author, row in zip(authors, self.authors.rows(authors, ["name"]))
+        ]
+
+    def suggest(self, query, limit=10):
+        """Authors whose names have words starting with every word of
+        `query`, most papers first; misspelt queries fall back to trigrams."""
+        key = name_keys([query[:MAX_QUERY]])[0]
+        words = key.split()
+        if not words or limit <= 0:
+            return []
+
+        # Postings of every token starting with the longest word, best first
+        longest = max(words, key=len)
+        lo, hi = np.searchsorted(self.tokens, [longest, longest + "\x7f"])
+        postings = np.asarray(self.token_authors[self.token_indptr[lo]:self.token_indptr[hi]])
+        if len(postings) > CANDIDATES:
+            postings = np.partition(postings, CANDIDATES)[:CANDIDATES]
+
+        found = []
+        others = [word for word in words if word != longest]
+        for author in np.unique(postings)[:MAX_CHECKS].tolist():
+            if others:
+                tokens = self.keys[author].split()
+                if not all(any(t.startswith(word) for t in tokens) for word in others):
+                    continue
+            found.append(author)
+            if len(found) == limit:
+                break
+        return self.records(found or self._fuzzy(key, limit))
+
+    def _fuzzy(self, key, limit):
+        """Authors sharing most of the trigrams of `key`."""
+        grams = np.unique(_trigram_codes([key])[0])
+        if not len(grams):
+            return []
+        postings = np.concatenate([self.trigram_authors[self.trigram_indptr[g]:self.trigram_indptr[g + 1]]
+                                   for g in grams.tolist()])
+        if not len(postings):
+            return []
+        authors, shared = np.unique(postings, return_counts=True)
+        good = shared >= MIN_TRIGRAM_SHARE * len(grams)
+        authors, shared = authors[good], shared[good]
+        top = np.lexsort((authors, -shared))[:limit]
+        return authors[top].tolist()
+
+    def author(self, name, max_papers=100, max_coauthors=20):
+        """Record of the author named `name` with their papers (newest first)
+        and most frequent coauthors. Raises KeyError for an unknown name."""
+        author = self.find(name)
+        row = self.authors.rows([author])[0]
+        papers = np.asarray(self.author_papers[self.author_indptr[author]:self.author_indptr[author + 1]],
+                            dtype=np.int64)
+        papers = papers[np.argsort(-np.asarray(self.year[papers]), kind="stable")]
+
+        # Authors of those papers, counted
+        starts = np.asarray(self.paper_indptr[papers])
+        counts = np.asarray(self.paper_indptr[papers + 1]) - starts
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(starts, counts)
+        shared = np.bincount(np.asarray(self.paper_authors[offsets]), minlength=len(self))
+        shared[author] = 0
+        coauthors = np.flatnonzero(shared)
+        shared = shared[coauthors]
+        top = np.lexsort((coauthors, -shared))[:max_coauthors]
+
+        shown = papers[:max_papers].tolist()
+        return {
+            "id": author,
+            "name": row["name"],
+            "key": row["key"],
+            "paper_count": int(self.paper_count[author]),
+            "papers": [dict(paper, year=int(year) or None)
+                       for paper, year in zip(self.papers.rows(shown), np.asarray(self.year[shown]).tolist())],
+            "coauthors": [dict(record, shared_papers=int(n))
+                          for record, n in zip(self.records(coauthors[top].tolist()), shared[top].tolist())],
+        }
+
+    def stats(self):
+        return {
+            "papers": self.meta["papers"],
+            "authors": self.meta["authors"],
+            "authorships": self.meta["authorships"],
+            "built_at": self.meta["built_at"],
+            "loaded_at": self.loaded_at,
+        }
+
+
+class AuthorIndexCache:
+    """The author index of `csv_path`, reopened when its meta.json changes
+    (same policy as category_store.CategoryStore)."""
+
+    def __init__(self, csv_path, store_dir=None):
+        self.path = store_dir or store_dir_for(csv_path)
+        self._index = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """The current AuthorIndex, or None if none has been built."""
+        meta_path = os.path.join(self.path, "meta.json")
+        if not os.path.isfile(meta_path):
+            return None
+        mtime = os.stat(meta_path).st_mtime
+        index = self._index
+        if index is not None and index.mtime == mtime:
+            return index
+        with self._lock:
+            if self._index is None or self._index.mtime != mtime:
+                with metrics.timed("author_index"):
+                    self._index = AuthorIndex(self.path, mtime)
+            return self._index
+
+    def stats(self):
+        return self._index.stats() if self._index is not None else {"loaded": False}
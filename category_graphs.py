@@ -0,0 +1,263 @@
+"""Per-category citation graphs derived on demand from one shared store.
+
+build_metrics() computes metrics over the whole citation graph of a papers
+CSV once per version of the file, next to its citation store
+(citation_store.py):
+
+    <stem>_metrics/meta.json        source signature, counts, category labels (written last)
+    <stem>_metrics/<version>/       the files below, one directory per build (store_versions.py)
+    .../nodes/                      id and title of every paper (paper_shards.py)
+    .../pagerank.npy, betweenness.npy
+                                    float32, over the whole graph
+    .../in_degree.npy, out_degree.npy
+                                    int32, over the whole graph
+    .../year.npy                    int16 year from the arXiv id, 0 if unknown
+    .../indptr.npy, indices.npy     citing -> cited as CSR over papers
+    .../category_indptr.npy, category_indices.npy
+                                    papers of each arXiv category, in paper order
+
+Papers are the distinct ids of the CSV; a repeated id keeps its first row,
+as in the citation store. A category view is the citation graph induced on
+the category's papers, narrowed by year range, minimum degree within the
+view and the top k by a metric. Views are cached per process, LRU.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import metrics
+import store_versions
+from citation_store import load_citation_store
+from graph_metrics import Graph, betweenness, pagerank
+from paper_shards import ShardReader, ShardWriter
+from pipeline_manifest import file_signature
+
+METRICS = ("pagerank", "betweenness", "in_degree", "out_degree")
+MAX_VIEW_NODES = 50_000
+
+
+def store_dir_for(csv_path):
+    """Default store location: next to the CSV, e.g. arxiv.csv -> arxiv_metrics/."""
+    return os.path.splitext(csv_path)[0] + "_metrics"
+
+
+def paper_years(ids):
+    """Year of each arXiv id: 0704.0001 -> 2007, hep-th/9901001 -> 1999; 0 if neither."""
+    ids = pd.Series(ids, dtype=str)
+    new = ids.str.extract(r"^(\d{2})\d{2}\.\d+", expand=False)
+    old = ids.str.extract(r"/(\d{2})\d{2}\d+", expand=False)
+    years = np.zeros(len(ids), dtype=np.int16)
+    has_new, has_old = new.notna().to_numpy(), old.notna().to_numpy()
+    years[has_new] = 2000 + new[has_new].astype(int).to_numpy()
+    old_yy = old[has_old & ~has_new].astype(int).to_numpy()
+    years[has_old & ~has_new] = np.where(old_yy > 50, 1900 + old_yy, 2000 + old_yy)
+    return years
+
+
+def _out_edges(indptr, indices, rows):
+    """(source, target) arrays of every edge leaving `rows`."""
+    starts = indptr[rows]
+    counts = indptr[rows + 1] - starts
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(starts, counts)
+    return np.repeat(rows, counts), np.asarray(indices[offsets], dtype=np.int64)
+
+
+def build_metrics(csv_path, store_dir=None, betweenness_samples=256):
+    """Compute the shared metrics store for csv_path. Betweenness is
+    estimated from `betweenness_samples` BFS pivots (exact if the graph has
+    no more nodes than that). Returns the meta dict."""
+    store_dir = store_dir or store_dir_for(csv_path)
+    signature = file_signature(csv_path)
+    citations = load_citation_store(csv_path)
+
+    # CSV rows -> distinct papers, in order of first appearance
+    codes, ids = pd.factorize(citations.ids)
+    n = len(ids)
+    first_rows = np.unique(codes, return_index=True)[1]
+    citing_rows, cited_rows = citations.edges()
+    is_first = np.zeros(len(codes), dtype=bool)
+    is_first[first_rows] = True
+    keep = is_first[citing_rows]
+    pairs = np.unique(codes[citing_rows[keep]].astype(np.int64) * n + codes[cited_rows[keep]])
+    sources, targets = pairs // n, pairs % n
+
+    graph = Graph(n, sources, targets, directed=True)
+    ranks = pagerank(graph)
+    between = betweenness(graph, k=betweenness_samples if betweenness_samples < n else None, seed=0)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=n), out=indptr[1:])
+
+    df = pd.read_csv(csv_path, usecols=["id", "title", "categories"], dtype={"id": str}).iloc[first_rows]
+    listed = df["categories"].fillna("").astype(str).str.split().explode().dropna()
+    paper_of_row = np.empty(len(citations.ids), dtype=np.int64)
+    paper_of_row[first_rows] = np.arange(n)
+    category_codes, categories = pd.factorize(listed, sort=True)
+    members = np.unique(category_codes.astype(np.int64) * n + paper_of_row[listed.index.to_numpy()])
+    category_indptr = np.zeros(len(categories) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(members // n, minlength=len(categories)), out=category_indptr[1:])
+
+    version = store_versions.new_version(store_dir)
+    with ShardWriter(os.path.join(version, "nodes"), ["id", "title"]) as writer:
+        for paper_id, title in zip(ids, df["title"].fillna("").astype(str)):
+            writer.append({"id": paper_id, "title": title})
+    arrays = {
+        "pagerank": ranks.astype(np.float32),
+        "betweenness": between.astype(np.float32),
+        "in_degree": np.bincount(targets, minlength=n).astype(np.int32),
+        "out_degree": np.bincount(sources, minlength=n).astype(np.int32),
+        "year": paper_years(ids),
+        "indptr": indptr,
+        "indices": targets.astype(np.int32),
+        "category_indptr": category_indptr,
+        "category_indices": (members % n).astype(np.int32),
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(version, f"{name}.npy"), array)
+
+    meta = {
+        "source": os.path.abspath(csv_path),
+        "signature": signature,
+        "papers": n,
+        "links": int(len(pairs)),
+        "betweenness_samples": min(betweenness_samples, n),
+        "categories": list(categories),
+        "built_at": time.time(),
+    }
+    return store_versions.publish(store_dir, version, meta)
+
+
+def is_current(csv_path, store_dir=None):
+    meta_path = os.path.join(store_dir or store_dir_for(csv_path), "meta.json")
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path, encoding="utf-8") as f:
+        return json.load(f).get("signature") == file_signature(csv_path)
+
+
+class MetricsStore:
+    """One opened metrics store; arrays are memory-mapped."""
+
+    def __init__(self, store_dir, mtime=None):
+        self.path = store_dir
+        self.mtime = mtime
+        self.meta = store_versions.read_meta(store_dir)
+        self.categories = {category: i for i, category in enumerate(self.meta["categories"])}
+        data = store_versions.data_dir(store_dir, self.meta)
+        for name in (*METRICS, "year", "indptr", "indices", "category_indptr", "category_indices"):
+            setattr(self, name, np.load(os.path.join(data, f"{name}.npy"), mmap_mode="r"))
+        self.nodes = ShardReader(os.path.join(data, "nodes"))
+        self.n = self.meta["papers"]
+
+    def papers(self, category):
+        """Paper rows listed in `category` (KeyError if there is none)."""
+        c = self.categories[category]
+        return np.asarray(self.category_indices[self.category_indptr[c]:self.category_indptr[c + 1]], dtype=np.int64)
+
+    def view(self, category, years=None, min_degree=0, top=None, metric="pagerank"):
+        """{"nodes", "links"} of the citation graph induced on `category`'s
+        papers published within `years` (inclusive (first, last)), keeping
+        papers with at least `min_degree` links in that graph and then the
+        `top` papers by `metric`. Links run from citing to cited paper."""
+        if metric not in METRICS:
+            raise ValueError(f"metric must be one of {', '.join(METRICS)}")
+        rows = self.papers(category)
+        if years is not None:
+            year = self.year[rows]
+            rows = rows[(year >= years[0]) & (year <= years[1])]
+
+        member = np.zeros(self.n, dtype=bool)
+        member[rows] = True
+        sources, targets = _out_edges(self.indptr, self.indices, rows)
+        inside = member[targets]
+        sources, targets = sources[inside], targets[inside]
+
+        if min_degree > 0:
+            degree = np.bincount(sources, minlength=self.n) + np.bincount(targets, minlength=self.n)
+            rows = rows[degree[rows] >= min_degree]
+        if top is not None or len(rows) > MAX_VIEW_NODES:
+            k = min(top if top is not None else MAX_VIEW_NODES, MAX_VIEW_NODES)
+            values = np.asarray(getattr(self, metric)[rows])
+            rows = rows[np.argsort(-values, kind="stable")[:k]]
+        if len(rows) < member.sum():
+            member[:] = False
+            member[rows] = True
+            keep = member[sources] & member[targets]
+            sources, targets = sources[keep], targets[keep]
+
+        rows = rows[np.argsort(-np.asarray(self.pagerank[rows]), kind="stable")]
+        nodes = self.nodes.rows(rows.tolist())
+        for name in (*METRICS, "year"):
+            for node, value in zip(nodes, np.asarray(getattr(self, name)[rows]).tolist()):
+                node[name] = value
+        id_of = dict(zip(rows.tolist(), (node["id"] for node in nodes)))
+        return {
+            "category": category,
+            "nodes": nodes,
+            "links": [{"source": id_of[s], "target": id_of[t]} for s, t in zip(sources.tolist(), targets.tolist())],
+        }
+
+
+class CategoryGraphs:
+    """Category views of the metrics store for `csv_path`, reopened when the
+    store's meta.json changes and kept in memory LRU (`max_items`)."""
+
+    def __init__(self, csv_path, store_dir=None, max_items=64):
+        self.store_dir = store_dir or store_dir_for(csv_path)
+        self.max_items = max_items
+        self._store = None
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.builds = 0
+
+    def store(self):
+        """The current MetricsStore, or None if none has been built."""
+        meta_path = os.path.join(self.store_dir, "meta.json")
+        if not os.path.isfile(meta_path):
+            return None
+        mtime = os.stat(meta_path).st_mtime
+        with self._lock:
+            if self._store is None or self._store.mtime != mtime:
+                with metrics.timed("category_graphs"):
+                    self._store = MetricsStore(self.store_dir, mtime)
+                self._items.clear()
+            return self._store
+
+    def view(self, category, **params):
+        """MetricsStore.view() for the current store, cached. Returns None if
+        no store has been built; raises KeyError for an unknown category."""
+        store = self.store()
+        if store is None:
+            return None
+        key = (store.mtime, category, json.dumps(params, sort_keys=True))
+        with self._lock:
+            graph = self._items.get(key)
+            if graph is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                metrics.inc("findmypaper_cache_requests_total", cache="category_graphs", result="hit")
+                return graph
+
+        graph = store.view(category, **params)
+        with self._lock:
+            self._items[key] = graph
+            self.builds += 1
+            metrics.inc("findmypaper_cache_requests_total", cache="category_graphs", result="build")
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return graph
+
+    def stats(self):
+        store = self._store
+        return {
+            "store": self.store_dir,
+            "papers": store.meta["papers"] if store else None,
+            "categories": len(store.categories) if store else None,
+            "memory_items": len(self._items),
+            "hits": self.hits,
+            "builds": self.builds,
+        }
@@ -0,0 +1,168 @@
+import json
+import os
+import sys
+import threading
+import time
+
+import metrics
+from paper_shards import META_FILE, ShardReader
+from search_index import SEARCH_FIELDS, SearchIndex
+
+
+def estimate_nbytes(papers):
+    """Approximate resident size of a list of flat paper dicts."""
+    total = sys.getsizeof(papers)
+    for paper in papers:
+        total += sys.getsizeof(paper)
+        total += sum(sys.getsizeof(value) for value in paper.values())
+    return total
+
+
+def _select(paper, fields):
+    return paper if fields is None else {k: v for k, v in paper.items() if k in fields}
+
+
+class CategoryData:
+    """One loaded category plus everything derived from it. A reload
+    replaces the whole object, so a derived index never outlives its data."""
+
+    def __init__(self, mtime, load_seconds):
+        self.mtime = mtime
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+        self.index_seconds = None
+        self._index = None
+        self._index_lock = threading.Lock()
+
+    def search_index(self):
+        with self._index_lock:
+            if self._index is None:
+                t0 = time.perf_counter()
+                self._index = self._build_index()
+                self.index_seconds = time.perf_counter() - t0
+                metrics.observe("findmypaper_data_load_seconds", self.index_seconds, dataset="search_index")
+        return self._index
+
+    def stats(self):
+        return {
+            "loaded": True,
+            "papers": len(self),
+            "load_seconds": round(self.load_seconds, 3),
+            "loaded_at": self.loaded_at,
+            "file_mtime": self.mtime,
+            "search_index_bytes": self._index.nbytes() if self._index is not None else 0,
+            "search_index_seconds": round(self.index_seconds, 3) if self.index_seconds is not None else None
+        }
+
+
+class JsonCategory(CategoryData):
+    """Legacy `{"nodes": [...]}` category file, parsed and held in memory."""
+
+    def __init__(self, path, mtime):
+        t0 = time.perf_counter()
+        with open(path, encoding="utf-8") as f:
+            self.papers = json.load(f).get("nodes", [])
+        super().__init__(mtime, time.perf_counter() - t0)
+        self.nbytes = estimate_nbytes(self.papers)
+
+    def __len__(self):
+        return len(self.papers)
+
+    def page(self, start, stop, fields=None):
+        return [_select(paper, fields) for paper in self.papers[start:stop]]
+
+    def rows(self, row_ids, fields=None):
+        return [_select(self.papers[i], fields) for i in row_ids]
+
+    def _build_index(self):
+        return SearchIndex.from_papers(self.papers)
+
+    def stats(self):
+        return dict(super().stats(), format="json", memory_bytes=self.nbytes)
+
+
+class ShardCategory(CategoryData):
+    """Columnar category shard (see paper_shards.py). Only the offset
+    indexes are touched up front; rows are read from disk per request."""
+
+    def __init__(self, path, mtime):
+        t0 = time.perf_counter()
+        self.reader = ShardReader(path)
+        super().__init__(mtime, time.perf_counter() - t0)
+
+    def __len__(self):
+        return len(self.reader)
+
+    def page(self, start, stop, fields=None):
+        return self.reader.page(start, stop, fields)
+
+    def rows(self, row_ids, fields=None):
+        return self.reader.rows(row_ids, fields)
+
+    def _build_index(self):
+        return SearchIndex({key: self.reader.iter_column(key) for key in SEARCH_FIELDS.values()})
+
+    def stats(self):
+        return dict(super().stats(), format="shard", memory_bytes=8 * (len(self) + 1) * len(self.reader.fields),
+                    disk_bytes=self.reader.disk_bytes())
+
+
+class CategoryStore:
+    """Process-wide cache of the per-category paper data in data_dir.
+
+    A category is read from the columnar shard directory
+    <data_dir>/<category>/ when one exists, otherwise from the legacy
+    <data_dir>/<category>.json file. Either is opened once, on first use or
+    through preload(), and kept. get() stats the source on every call and
+    reopens it when its mtime has changed, so a rebuilt category is picked
+    up without a restart.
+    """
+
+    def __init__(self, data_dir, files):
+        self.data_dir = data_dir
+        self.files = files
+        self._loaded = {}
+        self._locks = {category: threading.Lock() for category in files}
+
+    def _source(self, category):
+        """(loader, path, mtime) for the category's data, or None if it has none."""
+        name = self.files[category]
+        shard_meta = os.path.join(self.data_dir, os.path.splitext(name)[0], META_FILE)
+        json_path = os.path.join(self.data_dir, name)
+        if os.path.isfile(shard_meta):
+            return ShardCategory, os.path.dirname(shard_meta), os.stat(shard_meta).st_mtime
+        if os.path.isfile(json_path):
+            return JsonCategory, json_path, os.stat(json_path).st_mtime
+        return None
+
+    def get(self, category):
+        """Return the CategoryData for `category`, or None if it has no data file."""
+        source = self._source(category)
+        if source is None:
+            return None
+        loader, path, mtime = source
+
+        data = self._loaded.get(category)
+        if isinstance(data, loader) and data.mtime == mtime:
+            metrics.inc("findmypaper_cache_requests_total", cache="category_store", result="hit")
+            return data
+
+        with self._locks[category]:
+            # Another thread may have finished the load while we waited
+            data = self._loaded.get(category)
+            if not isinstance(data, loader) or data.mtime != mtime:
+                data = loader(path, mtime)
+                self._loaded[category] = data
+                metrics.observe("findmypaper_data_load_seconds", data.load_seconds, dataset=f"category:{category}")
+        metrics.inc("findmypaper_cache_requests_total", cache="category_store", result="load")
+        return data
+
+    def preload(self):
+        for category in self.files:
+            self.get(category)
+
+    def stats(self):
+        return {
+            category: self._loaded[category].stats() if category in self._loaded else {"loaded": False}
+            for category in self.files
+        }
@@ -0,0 +1,153 @@
+"""Citation edges compiled once into a memory-mappable CSR store.
+
+The `citations` column of arxiv.csv / arxiv_paper_nodes.csv holds Python
+list literals. compile_citations() parses them in one vectorized pass, maps
+arXiv ids to dense integers (CSV row numbers; an id that appears on several
+rows resolves to its first) and keeps the edges whose cited paper is in the
+same file:
+
+    <store>/<version>/ids.txt      one arXiv id per line; line i is CSV row i
+    <store>/<version>/indptr.npy   int64, papers + 1 entries
+    <store>/<version>/indices.npy  int32, papers cited by paper i are indices[indptr[i]:indptr[i + 1]]
+    <store>/meta.json              source file signature and counts (written last)
+
+load_citation_store() recompiles automatically when the source CSV changes.
+A compile writes a new version directory and swaps meta.json
+(store_versions.py), so a process reading the previous store is not
+disturbed, and compiles of one store are serialised by a file lock.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+import store_versions
+from pipeline_manifest import file_signature
+
+QUOTED_ID = r"['\"]([^'\"]+)['\"]"
+
+
+def store_dir_for(csv_path):
+    """Default store location: next to the CSV, e.g. arxiv.csv -> arxiv_citations/."""
+    return os.path.splitext(csv_path)[0] + "_citations"
+
+
+def compile_citations(csv_path, store_dir=None):
+    store_dir = store_dir or store_dir_for(csv_path)
+    signature = file_signature(csv_path)
+    df = pd.read_csv(csv_path, usecols=["id", "citations"], dtype={"id": str})
+
+    ids = pd.Index(df["id"].fillna(""))
+    cited = df["citations"].fillna("").astype(str).str.findall(QUOTED_ID).explode().dropna()
+    cited_rows = _first_rows(ids, cited.to_numpy())
+    resolved = cited_rows >= 0
+    citing_rows = cited.index.to_numpy()[resolved]
+
+    indptr = np.zeros(len(ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(citing_rows, minlength=len(ids)), out=indptr[1:])
+    indices = cited_rows[resolved].astype(np.int32)
+
+    version = store_versions.new_version(store_dir)
+    with open(os.path.join(version, "ids.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(ids) + "\n")
+    np.save(os.path.join(version, "indptr.npy"), indptr)
+    np.save(os.path.join(version, "indices.npy"), indices)
+    meta = {
+        "source": os.path.abspath(csv_path),
+        "signature": signature,
+        "papers": len(ids),
+        "citations": int(len(indices)),
+        "unresolved": int((~resolved).sum())
+    }
+    return store_versions.publish(store_dir, version, meta, indent=2)
+
+
+def _first_rows(ids, lookup):
+    """Row of the first occurrence of each id in `lookup`, -1 if absent."""
+    first = np.flatnonzero(~ids.duplicated())
+    found = ids[first].get_indexer(lookup)
+    return np.where(found >= 0, first[found], -1)
+
+
+class CitationStore:
+    """Read side of a compiled store. Edge arrays are memory-mapped."""
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self.meta = store_versions.read_meta(store_dir)
+        data = store_versions.data_dir(store_dir, self.meta)
+        with open(os.path.join(data, "ids.txt"), encoding="utf-8") as f:
+            self.ids = pd.Index(f.read().splitlines())
+        self.indptr = np.load(os.path.join(data, "indptr.npy"), mmap_mode="r")
+        self.indices = np.load(os.path.join(data, "indices.npy"), mmap_mode="r")
+        self._index = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def index(self):
+        """{arXiv id: first row}"""
+        if self._index is None:
+            self._index = {}
+            for i, pid in enumerate(self.ids):
+                self._index.setdefault(pid, i)
+        return self._index
+
+    def rows(self, paper_ids):
+        """First row of each id, -1 where unknown."""
+        return _first_rows(self.ids, pd.Index(paper_ids).astype(str))
+
+    def cited(self, row):
+        return self.indices[self.indptr[row]:self.indptr[row + 1]]
+
+    def edges(self):
+        """(citing rows, cited rows), one entry per citation."""
+        citing = np.repeat(np.arange(len(self.ids), dtype=np.int32), np.diff(self.indptr))
+        return citing, np.asarray(self.indices)
+
+    def citation_counts(self):
+        """Times each paper is cited from within the file, at its first row."""
+        return np.bincount(self.indices, minlength=len(self.ids))
+
+    def citation_map(self):
+        """{citing id: [cited ids]} for code that wants plain Python lists.
+        A repeated id keeps the citations of its first row."""
+        ids = self.ids.to_numpy()
+        indptr, indices = np.asarray(self.indptr), np.asarray(self.indices)
+        citation_map = {}
+        for i, pid in enumerate(ids):
+            if pid not in citation_map:
+                citation_map[pid] = [ids[j] for j in indices[indptr[i]:indptr[i + 1]]]
+        return citation_map
+
+
+_loaded = {}
+
+
+def load_citation_store(csv_path, store_dir=None):
+    """Store for csv_path, compiled first if missing or older than the CSV.
+    Loaded stores are reused within the process until the CSV changes."""
+    store_dir = store_dir or store_dir_for(csv_path)
+    signature = file_signature(csv_path)
+
+    cached = _loaded.get(store_dir)
+    if cached is not None and cached.meta["signature"] == signature:
+        return cached
+
+    if not _is_compiled(store_dir, signature):
+        # Another worker may be compiling the same store: wait for it, then
+        # check again rather than compiling twice
+        with store_versions.build_lock(store_dir):
+            if not _is_compiled(store_dir, signature):
+                compile_citations(csv_path, store_dir)
+
+    _loaded[store_dir] = CitationStore(store_dir)
+    return _loaded[store_dir]
+
+
+def _is_compiled(store_dir, signature):
+    try:
+        return store_versions.read_meta(store_dir).get("signature") == signature
+    except FileNotFoundError:
+        return False
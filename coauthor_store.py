@@ -0,0 +1,153 @@
+"""Coauthor edges as integer arrays, with the shared papers of each edge.
+
+build_coauthors() pairs up the authors of every paper in an author index
+(author_index.py) and merges the pairs:
+
+    <stem>_coauthors/meta.json      counts and the author index it was built from (written last)
+    <stem>_coauthors/<version>/     the files below, one directory per build (store_versions.py)
+    .../indptr.npy                  int64; edges of author a (to authors b > a) are rows indptr[a]:indptr[a + 1]
+    .../targets.npy                 int32 author b of each edge, ascending within an author
+    .../weights.npy                 int32 number of papers the two share
+    .../paper_indptr.npy, papers.npy
+                                    papers of edge e are papers[paper_indptr[e]:paper_indptr[e + 1]]
+                                    (paper rows of the author index)
+
+Graph payloads carry only the pair and its weight; the papers behind an
+edge are read from here when asked for (/api/coauthor/edge). Papers with
+more than `max_authors` authors are left out: a 3,000-author collaboration
+would otherwise add 4.5 million pairs of one shared paper each.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+
+import metrics
+import store_versions
+
+MAX_AUTHORS = 100
+
+
+def store_dir_for(csv_path):
+    """Default store location: next to the CSV, e.g. arxiv.csv -> arxiv_coauthors/."""
+    return os.path.splitext(csv_path)[0] + "_coauthors"
+
+
+def build_coauthors(index, store_dir, max_authors=MAX_AUTHORS, papers=None):
+    """Build the store from an author_index.AuthorIndex, over its first
+    `papers` papers (default: all). Returns the meta dict."""
+    n_papers = index.meta["papers"] if papers is None else min(papers, index.meta["papers"])
+    indptr = np.asarray(index.paper_indptr[:n_papers + 1], dtype=np.int64)
+    authors = np.asarray(index.paper_authors[:indptr[-1]], dtype=np.int64)
+    sizes = np.diff(indptr)
+    n_authors = len(index)
+
+    # Every authorship pairs with the ones after it on the same byline
+    kept = np.repeat(sizes <= max_authors, sizes)
+    position = np.arange(len(authors)) - np.repeat(indptr[:-1], sizes)
+    after = np.where(kept, np.repeat(sizes, sizes) - 1 - position, 0)
+    first = np.repeat(np.arange(len(authors)), after)
+    second = first + np.arange(len(first)) - np.repeat(np.cumsum(after) - after, after) + 1
+    a, b = np.minimum(authors[first], authors[second]), np.maximum(authors[first], authors[second])
+    paper_rows = np.repeat(np.arange(n_papers), sizes)[first].astype(np.int32)
+
+    keys = a * n_authors + b
+    order = np.argsort(keys, kind="stable")
+    keys, paper_rows = keys[order], paper_rows[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.empty(0, dtype=np.int64)
+    pair_keys = keys[starts]
+    sources, targets = pair_keys // max(n_authors, 1), pair_keys % max(n_authors, 1)
+
+    edge_indptr = np.zeros(n_authors + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=n_authors), out=edge_indptr[1:])
+    paper_indptr = np.append(starts, len(keys)).astype(np.int64)
+
+    version = store_versions.new_version(store_dir)
+    arrays = {
+        "indptr": edge_indptr,
+        "targets": targets.astype(np.int32),
+        "weights": np.diff(paper_indptr).astype(np.int32),
+        "paper_indptr": paper_indptr,
+        "papers": paper_rows,
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(version, f"{name}.npy"), array)
+
+    meta = {
+        "author_index": index.path,
+        "author_index_built_at": index.meta["built_at"],
+        "authors": n_authors,
+        "papers": int(n_papers),
+        "edges": int(len(pair_keys)),
+        "max_authors": max_authors,
+        "skipped_papers": int((sizes > max_authors).sum()),
+        "built_at": time.time(),
+    }
+    return store_versions.publish(store_dir, version, meta)
+
+
+class CoauthorStore:
+    """One opened store; arrays are memory-mapped."""
+
+    def __init__(self, store_dir, mtime=None):
+        self.path = store_dir
+        self.mtime = mtime
+        self.meta = store_versions.read_meta(store_dir)
+        data = store_versions.data_dir(store_dir, self.meta)
+        for name in ("indptr", "targets", "weights", "paper_indptr", "papers"):
+            setattr(self, name, np.load(os.path.join(data, f"{name}.npy"), mmap_mode="r"))
+        self.loaded_at = time.time()
+
+    def __len__(self):
+        return self.meta["edges"]
+
+    def edges(self):
+        """(a, b, weight) arrays of every edge, a < b."""
+        sources = np.repeat(np.arange(len(self.indptr) - 1, dtype=np.int32), np.diff(self.indptr))
+        return sources, np.asarray(self.targets), np.asarray(self.weights)
+
+    def edge(self, a, b):
+        """(weight, paper rows) of the edge between authors a and b; KeyError if they never wrote together."""
+        a, b = min(a, b), max(a, b)
+        lo, hi = self.indptr[a], self.indptr[a + 1]
+        e = lo + np.searchsorted(self.targets[lo:hi], b)
+        if e >= hi or self.targets[e] != b:
+            raise KeyError((a, b))
+        return int(self.weights[e]), np.asarray(self.papers[self.paper_indptr[e]:self.paper_indptr[e + 1]])
+
+    def stats(self):
+        return {
+            "authors": self.meta["authors"],
+            "edges": self.meta["edges"],
+            "built_at": self.meta["built_at"],
+            "loaded_at": self.loaded_at,
+        }
+
+
+class CoauthorCache:
+    """The store at `path`, reopened when its meta.json changes (same policy
+    as category_store.CategoryStore)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._store = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """The current CoauthorStore, or None if none has been built."""
+        meta_path = os.path.join(self.path, "meta.json")
+        if not os.path.isfile(meta_path):
+            return None
+        mtime = os.stat(meta_path).st_mtime
+        store = self._store
+        if store is not None and store.mtime == mtime:
+            return store
+        with self._lock:
+            if self._store is None or self._store.mtime != mtime:
+                with metrics.timed("coauthor_store"):
+                    self._store = CoauthorStore(self.path, mtime)
+            return self._store
+
+    def stats(self):
+        return self._store.stats() if self._store is not None else {"loaded": False}
@@ -0,0 +1,160 @@
+"""Persistent sentence embeddings of paper abstracts.
+
+    <store>/meta.json     model, dim, dtype, row count (written last)
+    <store>/vectors.bin   count x dim matrix, row-major, memory-mapped on read
+    <store>/keys.tsv      "<paper id>\t<abstract hash>" per row, in row order
+
+Rows are only ever appended; a paper whose abstract changed gets a new row
+and its key points at the latest one. Rows past meta.json's count (from an
+interrupted run) are ignored when the store is opened and truncated before
+the next append, so a crash never leaves a torn row. Opening a store never
+writes to it, so readers can open it while a writer appends.
+Missing vectors are encoded in large batches, optionally over a pool of
+processes, and appended chunk by chunk so a long run can resume.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+STORE_PATH = "embeddings"
+
+
+def text_hash(text):
+    return hashlib.sha1(str(text).encode("utf-8")).hexdigest()[:16]
+
+
+def open_matrix(path=STORE_PATH):
+    """Every stored row as a read-only memmap, without loading the key index;
+    for worker processes that are handed store rows by their parent."""
+    with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    return np.memmap(os.path.join(path, "vectors.bin"), dtype=meta["dtype"], mode="r",
+                     shape=(meta["count"], meta["dim"]))
+
+
+class EmbeddingStore:
+
+    def __init__(self, path=STORE_PATH, model_name=DEFAULT_MODEL, dtype="float16"):
+        self.path = path
+        self.model_name = model_name
+        self.dtype = np.dtype(dtype)
+        self.dim = None
+        self.count = 0
+        self.keys = {}  # paper id -> (row, abstract hash)
+        self._matrix = None
+        self._model = None
+        self._recovered = False
+        self._load()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _load(self):
+        meta_path = self._file("meta.json")
+        if not os.path.exists(meta_path):
+            return
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["model"] != self.model_name:
+            raise ValueError(f"{self.path} holds {meta['model']} embeddings, not {self.model_name}")
+        self.dim, self.count, self.dtype = meta["dim"], meta["count"], np.dtype(meta["dtype"])
+
+        # Anything past count was appended after the last completed write
+        with open(self._file("keys.tsv"), encoding="utf-8") as f:
+            lines = f.read().splitlines()[:self.count]
+        for row, line in enumerate(lines):
+            paper_id, digest = line.split("\t")
+            self.keys[paper_id] = (row, digest)
+
+    def _recover(self):
+        """Drop rows an interrupted writer left past count, before appending."""
+        if os.path.exists(self._file("vectors.bin")):
+            with open(self._file("vectors.bin"), "r+b") as f:
+                f.truncate(self.count * self.dim * self.dtype.itemsize)
+        if os.path.exists(self._file("keys.tsv")):
+            with open(self._file("keys.tsv"), encoding="utf-8") as f:
+                lines = f.read().splitlines()[:self.count]
+            with open(self._file("keys.tsv.tmp"), "w", encoding="utf-8") as f:
+                f.writelines(line + "\n" for line in lines)
+            os.replace(self._file("keys.tsv.tmp"), self._file("keys.tsv"))
+        self._recovered = True
+
+    def __len__(self):
+        return len(self.keys)
+
+    def matrix(self):
+        """Every stored row (including superseded ones) as a read-only memmap."""
+        if self._matrix is None and self.count:
+            self._matrix = np.memmap(self._file("vectors.bin"), dtype=self.dtype, mode="r",
+                                     shape=(self.count, self.dim))
+        return self._matrix
+
+    def rows(self, paper_ids, texts=None):
+        """Row of each paper's vector, -1 if missing or (when texts are
+        given) embedded from a different abstract."""
+        rows = np.full(len(paper_ids), -1, dtype=np.int64)
+        for i, paper_id in enumerate(paper_ids):
+            key = self.keys.get(str(paper_id))
+            if key is not None and (texts is None or key[1] == text_hash(texts[i])):
+                rows[i] = key[0]
+        return rows
+
+    def vectors(self, rows):
+        return np.asarray(self.matrix()[rows], dtype=np.float32)
+
+    def add(self, paper_ids, texts, vectors):
+        vectors = np.asarray(vectors)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        os.makedirs(self.path, exist_ok=True)
+        if not self._recovered:
+            self._recover()
+        with open(self._file("vectors.bin"), "ab") as f:
+            f.write(vectors.astype(self.dtype).tobytes())
+        with open(self._file("keys.tsv"), "a", encoding="utf-8") as f:
+            for paper_id, text in zip(paper_ids, texts):
+                f.write(f"{paper_id}\t{text_hash(text)}\n")
+        for offset, (paper_id, text) in enumerate(zip(paper_ids, texts)):
+            self.keys[str(paper_id)] = (self.count + offset, text_hash(text))
+        self.count += len(vectors)
+        self._matrix = None
+
+        meta = {"model": self.model_name, "dim": self.dim, "dtype": self.dtype.name, "count": self.count}
+        with open(self._file("meta.json.tmp"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(self._file("meta.json.tmp"), self._file("meta.json"))
+
+    def encode(self, texts, batch_size=256, workers=1):
+        """Embed texts with the store's model, over `workers` processes."""
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.model_name, device="cpu")
+        if workers > 1:
+            pool = self._model.start_multi_process_pool(["cpu"] * workers)
+            try:
+                return self._model.encode_multi_process(list(texts), pool, batch_size=batch_size)
+            finally:
+                self._model.stop_multi_process_pool(pool)
+        return self._model.encode(list(texts), batch_size=batch_size, convert_to_numpy=True)
+
+    def ensure(self, paper_ids, texts, batch_size=256, workers=1, chunk_size=50_000, encode=None):
+        """Vectors for the given papers, encoding only those missing or
+        stale. Returns (n, dim) float32 in input order."""
+        paper_ids = [str(p) for p in paper_ids]
+        texts = [str(t) for t in texts]
+        encode = encode or (lambda batch: self.encode(batch, batch_size, workers))
+
+        todo = {}
+        for i in np.flatnonzero(self.rows(paper_ids, texts) < 0):
+            todo.setdefault(paper_ids[i], texts[i])  # first occurrence of a repeated id
+        todo_ids = list(todo)
+        for start in range(0, len(todo_ids), chunk_size):
+            chunk = todo_ids[start:start + chunk_size]
+            self.add(chunk, [todo[p] for p in chunk], encode([todo[p] for p in chunk]))
+
+        if not paper_ids:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        return self.vectors(self.rows(paper_ids))
@@ -0,0 +1,206 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+import metrics
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+# Content-Encodings an artifact can be served with, best first
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def _json_default(value):
+    # numpy scalars coming out of pandas rows
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+class GraphArtifact:
+    """A built graph, serialized once and kept gzip-compressed. Brotli and
+    plain bodies are derived on demand; the ETag is content based."""
+
+    def __init__(self, gz, last_modified):
+        self.gz = gz
+        self.last_modified = last_modified
+        self.etag = hashlib.sha1(gz).hexdigest()
+        self._br = None
+
+    @classmethod
+    def from_graph(cls, graph, last_modified):
+        body = json.dumps(graph, separators=(",", ":"), default=_json_default).encode("utf-8")
+        return cls(gzip.compress(body, compresslevel=6, mtime=0), last_modified)
+
+    def body(self, encoding=None):
+        if encoding == "gzip":
+            return self.gz
+        if encoding == "br":
+            if self._br is None:
+                self._br = brotli.compress(gzip.decompress(self.gz), quality=9)
+            return self._br
+        return gzip.decompress(self.gz)
+
+
+class GraphCache:
+    """Graphs derived from one source CSV, built at most once per version
+    of that file.
+
+    The CSV is parsed once per version and shared by all builders. Each
+    built graph is kept in memory (LRU, `max_items`) and written to
+    `cache_dir` as gzip JSON (LRU by file mtime, `max_disk_items`), so a
+    restart serves it from disk without rebuilding. Any change to the CSV's
+    size or mtime invalidates both. Builds run outside the cache's lock, one
+    at a time per graph and params, so a slow build does not hold up
+    requests for other graphs.
+    """
+
+    def __init__(self, source_path, cache_dir="graph_cache", max_items=32, max_disk_items=256):
+        self.source_path = source_path
+        self.cache_dir = cache_dir
+        self.max_items = max_items
+        self.max_disk_items = max_disk_items
+        self._items = OrderedDict()
+        self._frame = None
+        self._frame_version = None
+        self._lock = threading.Lock()
+        self._frame_lock = threading.Lock()
+        self._building = {}  # key -> lock held while that key is read or built
+        self.hits = self.disk_hits = self.builds = 0
+
+    def version(self):
+        st = os.stat(self.source_path)
+        return f"{st.st_size}-{st.st_mtime_ns}", st.st_mtime
+
+    def frame(self):
+        """The source CSV as a DataFrame, re-read only when the file changes."""
+        version, _ = self.version()
+        with self._frame_lock:
+            if self._frame_version != version:
+                with metrics.timed("graph_csv"):
+                    self._frame = pd.read_csv(self.source_path)
+                self._frame_version = version
+            return self._frame
+
+    def _memory(self, key):
+        with self._lock:
+            artifact = self._items.get(key)
+            if artifact is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                metrics.inc("findmypaper_cache_requests_total", cache="graph_cache", result="memory")
+            return artifact
+
+    def get(self, name, builder, **params):
+        """Artifact for builder(frame, **params), built on the first request
+        for this name/params/source version."""
+        version, mtime = self.version()
+        params_key = hashlib.sha1(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+        key = f"{name}-{version}-{params_key}"
+
+        artifact = self._memory(key)
+        if artifact is not None:
+            return artifact
+
+        with self._lock:
+            building = self._building.setdefault(key, threading.Lock())
+        try:
+            with building:
+                # Another request may have built it while this one waited
+                artifact = self._memory(key)
+                if artifact is not None:
+                    return artifact
+
+                path = os.path.join(self.cache_dir, key + ".json.gz")
+                artifact = self._read(path, mtime)
+                if artifact is not None:
+                    result = "disk"
+                else:
+                    frame = self.frame()
+                    with metrics.timed(f"graph:{name}"):
+                        artifact = GraphArtifact.from_graph(builder(frame, **params), mtime)
+                    self._write(path, artifact.gz)
+                    self._drop_stale(name, version)
+                    self._evict_disk()
+                    result = "build"
+
+                with self._lock:
+                    if result == "disk":
+                        self.disk_hits += 1
+                    else:
+                        self.builds += 1
+                    metrics.inc("findmypaper_cache_requests_total", cache="graph_cache", result=result)
+                    self._items[key] = artifact
+                    while len(self._items) > self.max_items:
+                        self._items.popitem(last=False)
+                return artifact
+        finally:
+            with self._lock:
+                if self._building.get(key) is building:
+                    del self._building[key]
+
+    def _read(self, path, mtime):
+        """The artifact cached at path, or None. A hit refreshes the file's
+        mtime, which orders the disk LRU."""
+        try:
+            with open(path, "rb") as f:
+                artifact = GraphArtifact(f.read(), mtime)
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return artifact
+
+    def _write(self, path, data):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _drop_stale(self, name, version):
+        """Remove this graph's files built from older versions of the source."""
+        for filename in os.listdir(self.cache_dir):
+            if filename.startswith(f"{name}-") and not filename.startswith(f"{name}-{version}-"):
+                _remove(os.path.join(self.cache_dir, filename))
+        with self._lock:
+            for key in [k for k in self._items if k.startswith(f"{name}-") and not k.startswith(f"{name}-{version}-")]:
+                del self._items[key]
+
+    def _evict_disk(self):
+        """Remove the least recently used files beyond max_disk_items."""
+        files = []
+        for filename in os.listdir(self.cache_dir):
+            if filename.endswith(".json.gz"):
+                path = os.path.join(self.cache_dir, filename)
+                try:
+                    files.append((os.stat(path).st_mtime_ns, path))
+                except FileNotFoundError:
+                    pass
+        for _, path in sorted(files)[:max(len(files) - self.max_disk_items, 0)]:
+            _remove(path)
+
+    def stats(self):
+        return {
+            "source": self.source_path,
+            "memory_items": len(self._items),
+            "memory_bytes": sum(len(a.gz) for a in self._items.values()),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "builds": self.builds
+        }
+
+
+def _remove(path):
+    # Another worker may have removed it first
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,223 @@
+"""PageRank and centrality on scipy.sparse CSR adjacency.
+
+Shared by the graph generators in used/ in place of networkx, whose
+pure-Python centralities limited them to a few thousand rows. Results follow
+networkx's definitions (pagerank, betweenness_centrality with normalized=True,
+closeness_centrality with wf_improved=True); `python graph_metrics.py` checks
+them against networkx on small random graphs.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import shortest_path
+
+
+class Graph:
+    """Nodes 0..n-1 (with optional labels) and a CSR adjacency matrix.
+    Undirected graphs store every edge in both directions; repeated edges
+    are merged, keeping the largest weight."""
+
+    def __init__(self, n, sources, targets, weights=None, directed=True, labels=None):
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        weights = np.ones(len(sources)) if weights is None else np.asarray(weights, dtype=float)
+        if not directed:
+            # Self-loops appear once, like in networkx
+            mirror = sources != targets
+            sources, targets = np.concatenate([sources, targets[mirror]]), np.concatenate([targets, sources[mirror]])
+            weights = np.concatenate([weights, weights[mirror]])
+
+        # Merge duplicate edges: sort by (source, target, weight) and keep the last of each run
+        order = np.lexsort((weights, targets, sources))
+        sources, targets, weights = sources[order], targets[order], weights[order]
+        last = np.ones(len(sources), dtype=bool)
+        last[:-1] = (sources[1:] != sources[:-1]) | (targets[1:] != targets[:-1])
+
+        self.n = n
+        self.directed = directed
+        self.labels = labels
+        self.adjacency = sp.csr_array(
+            (weights[last], (sources[last], targets[last])), shape=(n, n))
+
+    @classmethod
+    def from_edges(cls, edges, nodes=(), directed=True):
+        """Build from (u, v) or (u, v, weight) label pairs. `nodes` adds
+        labels that may have no edges; node order is first appearance."""
+        index = {}
+        for node in nodes:
+            index.setdefault(node, len(index))
+        sources, targets, weights = [], [], []
+        for edge in edges:
+            sources.append(index.setdefault(edge[0], len(index)))
+            targets.append(index.setdefault(edge[1], len(index)))
+            weights.append(edge[2] if len(edge) > 2 else 1.0)
+        return cls(len(index), sources, targets, weights, directed=directed, labels=list(index))
+
+    @classmethod
+    def from_networkx(cls, G, weight="weight"):
+        return cls.from_edges(
+            ((u, v, d.get(weight, 1.0)) for u, v, d in G.edges(data=True)),
+            nodes=G.nodes, directed=G.is_directed())
+
+    def degree(self):
+        """Number of neighbours (undirected) or in+out edges (directed)."""
+        pattern = (self.adjacency != 0).astype(np.int64)
+        out_degree = pattern.sum(axis=1)
+        if not self.directed:
+            # A self-loop counts twice, as in networkx
+            return out_degree + pattern.diagonal()
+        return out_degree + pattern.sum(axis=0)
+
+    def as_dict(self, values):
+        """{label: value} for per-node results."""
+        return dict(zip(self.labels, map(float, values)))
+
+
+def pagerank(graph, alpha=0.85, tol=1.0e-6, max_iter=100, weighted=True):
+    """Power-iteration PageRank; dangling nodes spread their rank uniformly."""
+    n = graph.n
+    if n == 0:
+        return np.empty(0)
+    A = graph.adjacency if weighted else (graph.adjacency != 0).astype(float)
+    out_weight = np.asarray(A.sum(axis=1)).ravel()
+    dangling = out_weight == 0
+    inv = np.divide(1.0, out_weight, out=np.zeros(n), where=~dangling)
+    # Row-stochastic transition matrix, transposed so each step is P.T @ x
+    transition_t = (sp.diags_array(inv) @ A).T.tocsr()
+
+    x = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        last = x
+        x = alpha * (transition_t @ last + last[dangling].sum() / n) + (1 - alpha) / n
+        if np.abs(x - last).sum() < n * tol:
+            return x
+    raise RuntimeError(f"PageRank did not converge in {max_iter} iterations")
+
+
+def _bfs_levels(indptr, indices, source, n):
+    """Level-synchronous BFS from `source`. Returns path counts and, per
+    level, the (parent, child) shortest-path edges leading into it."""
+    dist = np.full(n, -1, dtype=np.int64)
+    sigma = np.zeros(n)
+    dist[source] = 0
+    sigma[source] = 1.0
+    frontier = np.array([source], dtype=np.int64)
+    levels = []
+    depth = 0
+    while len(frontier):
+        starts, stops = indptr[frontier], indptr[frontier + 1]
+        counts = stops - starts
+        parents = np.repeat(frontier, counts)
+        # Concatenate the neighbour ranges of every frontier node
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        children = indices[np.repeat(starts, counts) + offsets]
+
+        unseen = dist[children] == -1
+        dist[children[unseen]] = depth + 1
+        on_path = dist[children] == depth + 1
+        parents, children = parents[on_path], children[on_path]
+        np.add.at(sigma, children, sigma[parents])
+
+        levels.append((parents, children))
+        frontier = np.unique(children)
+        depth += 1
+    return sigma, levels
+
+
+def betweenness(graph, k=None, seed=None, normalized=True):
+    """Brandes betweenness (unweighted). With k, only k randomly chosen
+    pivot sources are expanded and the result is rescaled by n / k."""
+    n = graph.n
+    A = graph.adjacency.tocsr()
+    indptr, indices = A.indptr.astype(np.int64), A.indices.astype(np.int64)
+
+    if k is None or k >= n:
+        sources, k = np.arange(n), None
+    else:
+        sources = np.random.default_rng(seed).choice(n, size=k, replace=False)
+
+    bc = np.zeros(n)
+    for source in sources:
+        sigma, levels = _bfs_levels(indptr, indices, source, n)
+        delta = np.zeros(n)
+        for parents, children in reversed(levels):
+            np.add.at(delta, parents, sigma[parents] / sigma[children] * (1 + delta[children]))
+        delta[source] = 0
+        bc += delta
+
+    if normalized:
+        scale = 1 / ((n - 1) * (n - 2)) if n > 2 else None
+    else:
+        scale = None if graph.directed else 0.5
+    if scale is not None:
+        if k is not None:
+            scale *= n / k
+        bc *= scale
+    return bc
+
+
+def closeness(graph, workers=None, batch_size=16):
+    """Closeness centrality (unweighted, Wasserman-Faust scaling for
+    disconnected graphs). BFS batches run on a thread pool; scipy's
+    shortest-path kernel does the traversal in C."""
+    n = graph.n
+    # Distances *to* each node, as networkx uses for directed graphs
+    A = graph.adjacency.T.tocsr() if graph.directed else graph.adjacency
+    result = np.zeros(n)
+
+    def run(batch):
+        dist = shortest_path(A, method="D", unweighted=True, indices=batch)
+        reachable = np.isfinite(dist)
+        totals = np.where(reachable, dist, 0).sum(axis=1)
+        found = reachable.sum(axis=1)  # includes the node itself
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values = np.where(totals > 0, (found - 1) / totals, 0.0)
+        if n > 1:
+            values *= (found - 1) / (n - 1)
+        result[batch] = values
+
+    batches = [np.arange(start, min(start + batch_size, n)) for start in range(0, n, batch_size)]
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        list(pool.map(run, batches))
+    return result
+
+
+def check_against_networkx(trials=5, seed=0):
+    """Compare every metric with networkx on small random graphs."""
+    import networkx as nx
+
+    rng = np.random.default_rng(seed)
+    for trial in range(trials):
+        for directed in (False, True):
+            G = nx.gnp_random_graph(60, 0.06, seed=int(rng.integers(1 << 30)), directed=directed)
+            G.add_nodes_from(range(60, 64))  # isolated nodes
+            for u, v in G.edges:
+                G[u][v]["weight"] = float(rng.integers(1, 5))
+            graph = Graph.from_networkx(G)
+            order = graph.labels
+
+            expected = {
+                "pagerank": nx.pagerank(G, alpha=0.85),
+                "betweenness": nx.betweenness_centrality(G),
+                "closeness": nx.closeness_centrality(G),
+                "degree": dict(G.degree())
+            }
+            actual = {
+                "pagerank": pagerank(graph),
+                "betweenness": betweenness(graph),
+                "closeness": closeness(graph, workers=2),
+                "degree": graph.degree()
+            }
+            for metric, values in expected.items():
+                ref = np.array([values[node] for node in order], dtype=float)
+                assert np.allclose(actual[metric], ref, atol=1e-5), f"{metric} differs (directed={directed})"
+
+            # Sampling every node as a pivot is the exact computation
+            assert np.allclose(betweenness(graph, k=graph.n), actual["betweenness"])
+    print(f"✅ graph_metrics matches networkx on {trials * 2} random graphs")
+
+
+if __name__ == "__main__":
+    check_against_networkx()
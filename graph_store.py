@@ -0,0 +1,329 @@
+"""Laid-out graphs on disk, indexed for level-of-detail tile queries.
+
+A stored graph is a directory under the store root:
+
+    <root>/<name>/meta.json     counts, zoom levels, node fields (written last)
+    <root>/<name>/<version>/    the files below, one directory per build (store_versions.py)
+    .../nodes/                  node attributes, one row per node (paper_shards.py)
+    .../x.npy, y.npy            float32 layout positions scaled into [0, 1]
+    .../pagerank.npy            float32
+    .../indptr.npy, indices.npy links as CSR over node rows (source -> targets)
+    .../lod_*.npy               the tile index below
+    .../rank_<metric>.npy       node rows by descending metric (PageRank, degree
+                                and every numeric node field), for /api/subgraph
+    .../category_codes.npy, year.npy
+                                per-node filter columns (-1 / 0 where absent)
+
+Zoom level z splits [0, 1]^2 into 2^z x 2^z tiles. A node is drawn from
+the first zoom at which it is among the `per_tile` highest-PageRank nodes
+of its tile (at max_zoom every node is drawn). Since a tile's nodes are a
+subset of its parent's, this makes the drawn set grow monotonically with
+zoom and caps it at `per_tile` nodes per tile. Nodes are sorted by that
+first zoom, then by the Morton (Z-order) code of their position, so the
+nodes of any tile at any zoom are one binary-searched range per level and
+a query costs time proportional to what it returns.
+"""
+import os
+import re
+import threading
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+import metrics
+import store_versions
+from author_graph import category_pattern
+from paper_shards import ShardReader, ShardWriter
+
+MORTON_BITS = 16
+MAX_QUERY_TILES = 256
+MAX_SUBGRAPH_NODES = 100_000
+LAYOUT_FIELDS = ("x", "y", "x3d", "y3d", "z3d")
+
+
+def _spread_bits(v):
+    """Insert a zero bit above each of the low 16 bits of v."""
+    v = np.asarray(v, dtype=np.uint64) & np.uint64(0xFFFF)
+    for shift, mask in ((8, 0x00FF00FF), (4, 0x0F0F0F0F), (2, 0x33333333), (1, 0x55555555)):
+        v = (v | (v << np.uint64(shift))) & np.uint64(mask)
+    return v
+
+
+def _interleave(ix, iy):
+    return _spread_bits(ix) | (_spread_bits(iy) << np.uint64(1))
+
+
+def morton_codes(x, y):
+    """Z-order codes of positions in [0, 1] at MORTON_BITS per axis."""
+    top = (1 << MORTON_BITS) - 1
+    ix = np.clip((np.asarray(x) * (1 << MORTON_BITS)).astype(np.int64), 0, top)
+    iy = np.clip((np.asarray(y) * (1 << MORTON_BITS)).astype(np.int64), 0, top)
+    return _interleave(ix, iy)
+
+
+def first_zoom(codes, pagerank, per_tile, max_zoom):
+    """Zoom level at which each node is first drawn (see module docstring)."""
+    n = len(codes)
+    zoom = np.full(n, max_zoom, dtype=np.int8)
+    by_rank = np.argsort(-np.asarray(pagerank), kind="stable")
+    for z in range(max_zoom):
+        tiles = codes[by_rank] >> np.uint64(2 * (MORTON_BITS - z))
+        order = np.argsort(tiles, kind="stable")  # PageRank order within each tile
+        sorted_tiles = tiles[order]
+        starts = np.flatnonzero(np.r_[True, sorted_tiles[1:] != sorted_tiles[:-1]])
+        rank = np.arange(n) - np.repeat(starts, np.diff(np.r_[starts, n]))
+        top = by_rank[order[rank < per_tile]]
+        zoom[top] = np.minimum(zoom[top], z)
+    return zoom
+
+
+def _deepest_zoom(sorted_codes, per_tile):
+    """First zoom at which no tile holds more than per_tile nodes."""
+    for z in range(1, MORTON_BITS):
+        tiles = sorted_codes >> np.uint64(2 * (MORTON_BITS - z))
+        starts = np.flatnonzero(np.r_[True, tiles[1:] != tiles[:-1]])
+        if np.diff(np.r_[starts, len(tiles)]).max(initial=0) <= per_tile:
+            return z
+    return MORTON_BITS
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _metrics(nodes, fields, pagerank, links):
+    """{metric: values} for every numeric node field, plus PageRank and degree."""
+    n = len(nodes)
+    metrics = {
+        "pagerank": pagerank,
+        "degree": np.diff(links.indptr) + np.bincount(links.indices, minlength=n)
+    }
+    for field in fields:
+        if field in metrics or field in LAYOUT_FIELDS:
+            continue
+        values = [node.get(field) for node in nodes]
+        if any(v is not None for v in values) and all(v is None or _is_number(v) for v in values):
+            metrics[field] = np.array([np.nan if v is None else v for v in values], dtype=float)
+    return metrics
+
+
+def _filter_columns(nodes):
+    """(category codes, category vocabulary, years) for the subgraph filters."""
+    categories = [node.get("category") for node in nodes]
+    vocabulary = sorted({c for c in categories if isinstance(c, str) and c})
+    code_of = {c: i for i, c in enumerate(vocabulary)}
+    codes = np.array([code_of.get(c, -1) if isinstance(c, str) else -1 for c in categories], dtype=np.int32)
+    years = np.array([int(node["year"]) if _is_number(node.get("year")) else 0 for node in nodes], dtype=np.int16)
+    return codes, vocabulary, years
+
+
+def write_graph(path, nodes, sources, targets, positions, pagerank, per_tile=200, max_zoom=None):
+    """Store a laid-out graph. `nodes` are attribute dicts (must include
+    "id"); sources/targets are node rows; positions is (n, 2) in any units."""
+    n = len(nodes)
+    positions = np.asarray(positions, dtype=float)
+    lo = positions.min(axis=0) if n else np.zeros(2)
+    span = float((positions.max(axis=0) - lo).max()) if n else 0.0
+    # Square scaling keeps the layout's aspect ratio; centre the short axis
+    scaled = (positions - lo) / (span or 1.0)
+    scaled += (1 - scaled.max(axis=0)) / 2 if n else 0
+    x, y = scaled[:, 0].astype(np.float32), scaled[:, 1].astype(np.float32)
+    pagerank = np.asarray(pagerank, dtype=np.float32)
+
+    codes = morton_codes(x, y)
+    if max_zoom is None:
+        max_zoom = _deepest_zoom(np.sort(codes), per_tile)
+    zoom = first_zoom(codes, pagerank, per_tile, max_zoom)
+    order = np.lexsort((codes, zoom))
+    level_offsets = np.searchsorted(zoom[order], np.arange(max_zoom + 2)).astype(np.int64)
+
+    links = sp.csr_array(
+        (np.ones(len(sources), dtype=np.int8), (np.asarray(sources), np.asarray(targets))), shape=(n, n))
+    links.sum_duplicates()
+
+    version = store_versions.new_version(path)
+    fields = list(dict.fromkeys(key for node in nodes for key in node if key not in ("x", "y")))
+    with ShardWriter(os.path.join(version, "nodes"), fields) as writer:
+        for node in nodes:
+            writer.append(node)
+
+    category_codes, categories, years = _filter_columns(nodes)
+    arrays = {
+        "x": x, "y": y, "pagerank": pagerank,
+        "indptr": links.indptr.astype(np.int64), "indices": links.indices.astype(np.int32),
+        "lod_order": order.astype(np.int32), "lod_keys": codes[order],
+        "lod_offsets": level_offsets,
+        "category_codes": category_codes, "year": years
+    }
+    metrics = _metrics(nodes, fields, pagerank, links)
+    for metric, values in metrics.items():
+        values = np.nan_to_num(np.asarray(values, dtype=float), nan=-np.inf)
+        arrays[f"rank_{metric}"] = np.argsort(-values, kind="stable").astype(np.int32)
+    for name, values in arrays.items():
+        np.save(os.path.join(version, f"{name}.npy"), values)
+
+    meta = {"nodes": n, "links": int(links.nnz), "per_tile": per_tile, "max_zoom": max_zoom,
+            "fields": fields, "metrics": list(metrics), "categories": categories, "built_at": time.time()}
+    return store_versions.publish(path, version, meta, indent=2)
+
+
+class StoredGraph:
+    """One stored graph; arrays are memory-mapped, attributes read per row."""
+
+    def __init__(self, path, mtime):
+        self.path = path
+        self.mtime = mtime
+        self.meta = store_versions.read_meta(path)
+        self.max_zoom = self.meta["max_zoom"]
+        data = store_versions.data_dir(path, self.meta)
+        self.nodes = ShardReader(os.path.join(data, "nodes"))
+        for name in ("x", "y", "pagerank", "indptr", "indices", "lod_order", "lod_keys", "lod_offsets",
+                     "category_codes", "year"):
+            setattr(self, name, np.load(os.path.join(data, f"{name}.npy"), mmap_mode="r"))
+        self.rankings = {
+            metric: np.load(os.path.join(data, f"rank_{metric}.npy"), mmap_mode="r")
+            for metric in self.meta["metrics"]
+        }
+
+    def visible(self, bbox, zoom):
+        """Rows drawn at `zoom` inside bbox = (x0, y0, x1, y1) in [0, 1]."""
+        zoom = min(max(int(zoom), 0), self.max_zoom)
+        x0, y0, x1, y1 = (min(max(float(v), 0.0), 1.0) for v in bbox)
+        scale = 1 << zoom
+        tx = np.arange(int(x0 * scale), min(int(x1 * scale), scale - 1) + 1)
+        ty = np.arange(int(y0 * scale), min(int(y1 * scale), scale - 1) + 1)
+        if len(tx) * len(ty) > MAX_QUERY_TILES:
+            raise ValueError(f"bbox covers more than {MAX_QUERY_TILES} tiles at zoom {zoom}")
+
+        shift = np.uint64(2 * (MORTON_BITS - zoom))
+        tiles = _interleave(*(a.ravel() for a in np.meshgrid(tx, ty)))
+        lows, highs = tiles << shift, (tiles + np.uint64(1)) << shift
+
+        found = []
+        for level in range(zoom + 1):
+            start, stop = self.lod_offsets[level], self.lod_offsets[level + 1]
+            keys = self.lod_keys[start:stop]
+            for a, b in zip(np.searchsorted(keys, lows), np.searchsorted(keys, highs)):
+                if b > a:
+                    found.append(self.lod_order[start + a:start + b])
+        rows = np.concatenate(found) if found else np.empty(0, dtype=np.int32)
+
+        x, y = self.x[rows], self.y[rows]
+        rows = rows[(x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)]
+        return rows[np.argsort(-self.pagerank[rows], kind="stable")]
+
+    def links_among(self, rows):
+        """(source row, target row) pairs with both ends in `rows`."""
+        rows = np.asarray(rows, dtype=np.int64)
+        members = np.sort(rows)
+        starts, stops = self.indptr[rows], self.indptr[rows + 1]
+        counts = stops - starts
+        sources = np.repeat(rows, counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        targets = self.indices[np.repeat(starts, counts) + offsets].astype(np.int64)
+        pos = np.minimum(np.searchsorted(members, targets), max(len(members) - 1, 0))
+        keep = members[pos] == targets if len(members) else np.zeros(0, dtype=bool)
+        return sources[keep], targets[keep]
+
+    def _payload(self, rows, fields):
+        """Node records (with layout position and PageRank) for `rows` and
+        the links between them, in the /api/graph_data format."""
+        if fields is not None:
+            fields = ["id", *fields]
+        records = self.nodes.rows(rows.tolist(), fields)
+        for record, x, y, pr in zip(records, self.x[rows], self.y[rows], self.pagerank[rows]):
+            record.update(x=round(float(x), 6), y=round(float(y), 6), pagerank=float(pr))
+        id_of = dict(zip(rows.tolist(), (record["id"] for record in records)))
+        sources, targets = self.links_among(rows)
+        return {
+            "nodes": records,
+            "links": [{"source": id_of[s], "target": id_of[t]} for s, t in zip(sources.tolist(), targets.tolist())]
+        }
+
+    def tiles(self, bbox, zoom, fields=None):
+        """Payload for /api/graph/<name>/tiles: the nodes drawn at `zoom`
+        inside bbox, and the links between them."""
+        payload = self._payload(self.visible(bbox, zoom), fields)
+        return dict(payload, zoom=min(max(int(zoom), 0), self.max_zoom), max_zoom=self.max_zoom)
+
+    def top_rows(self, top, metric="pagerank", category=None, years=None):
+        """The `top` rows by `metric` among nodes passing the filters. Nodes
+        without a category or year (e.g. authors) pass those filters. The
+        ranking is scanned in growing blocks, so an unfiltered query reads
+        only `top` entries."""
+        if metric not in self.rankings:
+            raise ValueError(f"Unknown metric {metric!r}; available: {', '.join(self.rankings)}")
+        if not 0 < top <= MAX_SUBGRAPH_NODES:
+            raise ValueError(f"top must be between 1 and {MAX_SUBGRAPH_NODES}")
+        ranking = self.rankings[metric]
+        if category is None and years is None:
+            return np.asarray(ranking[:top])
+
+        if category is not None:
+            pattern = re.compile(category_pattern(category))
+            matching = [i for i, c in enumerate(self.meta["categories"]) if pattern.search(c)]
+        found, count = [], 0
+        start, block = 0, max(4 * top, 4096)
+        while count < top and start < len(ranking):
+            rows = np.asarray(ranking[start:start + block])
+            keep = np.ones(len(rows), dtype=bool)
+            if category is not None:
+                codes = self.category_codes[rows]
+                keep &= (codes < 0) | np.isin(codes, matching)
+            if years is not None:
+                year = self.year[rows]
+                keep &= (year == 0) | ((year >= years[0]) & (year <= years[1]))
+            found.append(rows[keep])
+            count += int(keep.sum())
+            start += block
+            block *= 2
+        return np.concatenate(found)[:top] if found else np.empty(0, dtype=np.int32)
+
+    def subgraph(self, top, metric="pagerank", category=None, years=None, fields=None):
+        """Payload for /api/subgraph: the induced subgraph on top_rows()."""
+        payload = self._payload(self.top_rows(top, metric, category, years), fields)
+        return dict(payload, metric=metric)
+
+    def stats(self):
+        return dict(self.meta, loaded=True, file_mtime=self.mtime)
+
+
+class GraphStore:
+    """Process-wide cache of the stored graphs under `root`, reopened when a
+    graph's meta.json changes (same policy as category_store.CategoryStore)."""
+
+    def __init__(self, root):
+        self.root = root
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    def names(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if os.path.isfile(os.path.join(self.root, name, "meta.json")))
+
+    def get(self, name):
+        """The StoredGraph called `name`, or None if there is none."""
+        meta_path = os.path.join(self.root, name, "meta.json")
+        if os.sep in name or name.startswith(".") or not os.path.isfile(meta_path):
+            return None
+        mtime = os.stat(meta_path).st_mtime
+
+        graph = self._loaded.get(name)
+        if graph is not None and graph.mtime == mtime:
+            return graph
+        with self._lock:
+            graph = self._loaded.get(name)
+            if graph is None or graph.mtime != mtime:
+                with metrics.timed(f"graph_store:{name}"):
+                    graph = StoredGraph(os.path.dirname(meta_path), mtime)
+                self._loaded[name] = graph
+        return graph
+
+    def stats(self):
+        return {
+            name: self._loaded[name].stats() if name in self._loaded else {"loaded": False}
+            for name in self.names()
+        }
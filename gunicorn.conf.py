@@ -0,0 +1,34 @@
+# gunicorn -c gunicorn.conf.py wsgi:app  (see wsgi.py)
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+worker_class = "gthread"
+threads = int(os.environ.get("THREADS", 4))
+
+# Import wsgi.py (and load the data) in the master, before forking workers
+preload_app = True
+
+# Graph payloads can take a while to build on a cold cache
+timeout = 120
+
+# Where each process writes its counts so /metrics can sum them (see metrics.py);
+# read when wsgi.py is imported
+os.environ.setdefault("METRICS_DIR", os.path.join("metrics", bind.replace(":", "_")))
+
+
+def on_starting(server):
+    # Files from a previous run would otherwise be summed with this one's
+    import metrics
+    metrics.registry.clear_shared()
+
+
+def worker_exit(server, worker):
+    # Counts recorded since the worker's last background publish
+    import metrics
+    metrics.registry.publish(force=True)
+
+
+def child_exit(server, worker):
+    import metrics
+    metrics.registry.retire(worker.pid)
@@ -0,0 +1,281 @@
+"""Request and data-load metrics, exported at /metrics in the Prometheus text
+format.
+
+    findmypaper_request_duration_seconds{route,method,code}  histogram
+    findmypaper_response_bytes{route}                        histogram
+    findmypaper_cache_requests_total{cache,result}           counter
+    findmypaper_data_load_seconds{dataset}                   histogram
+
+instrument(app) times every Flask request; the caches (category_store.py,
+graph_cache.py, category_graphs.py and the store caches) count their
+lookups and time their loads through inc() and timed().
+
+Under a preforking server every process keeps its own counts. With
+METRICS_DIR set (gunicorn.conf.py sets it), each process also writes them to
+METRICS_DIR/<pid>-<start>.json, from a background thread about once a second
+while they change, and /metrics sums every file, so any worker answers for
+the whole server. The gunicorn hooks in gunicorn.conf.py keep the sum right:
+on_starting clears files left by a previous run, worker_exit flushes a
+worker's last counts, and child_exit (in the master) folds an exited worker's
+file into retired.json, so totals never go down when a worker is replaced.
+A forked worker starts from zero, so data loaded in the master before the
+fork (wsgi.py) is counted once, in the master's file.
+
+Request profiling: with PROFILE_REQUESTS=1, a request carrying ?profile=1
+is run under sampling_profiler.Profiler and its stacks are written to
+PROFILE_DIR; the response names the file in an X-Profile header.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from sampling_profiler import Profiler, profile_path
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+LOAD_BUCKETS = (0.01, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+PUBLISH_INTERVAL = 1.0
+RETIRED_FILE = "retired.json"
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    "findmypaper_request_duration_seconds": ("histogram", "Time to produce a response, by route", LATENCY_BUCKETS),
+    "findmypaper_response_bytes": ("histogram", "Response body size, by route", SIZE_BUCKETS),
+    "findmypaper_cache_requests_total": ("counter", "Cache lookups, by cache and result", None),
+    "findmypaper_data_load_seconds": ("histogram", "Time to load or build a dataset, index or payload", LOAD_BUCKETS),
+}
+
+
+class Registry:
+    """Counters and histograms of one process, keyed by metric name and
+    label values. Histogram values are [count per bucket..., +Inf, sum]."""
+
+    def __init__(self, share_dir=None):
+        self.share_dir = share_dir
+        self._after_fork()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # A lock held by another thread at fork time stays held in the child
+        self._lock = threading.Lock()
+        self._publish_lock = threading.Lock()
+        self.pid = os.getpid()
+        self._file = f"{self.pid}-{time.time_ns()}.json"
+        self._values = {name: {} for name in METRICS}
+        self._dirty = False
+        self._publisher = None
+
+    def _changed(self):
+        """Mark the counts for publishing; called with _lock held."""
+        self._dirty = True
+        if self.share_dir and self._publisher is None:
+            self._publisher = threading.Thread(target=self._publish_loop, name="metrics-publisher", daemon=True)
+            self._publisher.start()
+
+    def inc(self, name, amount=1, **labels):
+        with self._lock:
+            key = tuple(sorted(labels.items()))
+            series = self._values[name]
+            series[key] = series.get(key, 0) + amount
+            self._changed()
+
+    def observe(self, name, value, **labels):
+        buckets = METRICS[name][2]
+        with self._lock:
+            key = tuple(sorted(labels.items()))
+            series = self._values[name]
+            counts = series.get(key)
+            if counts is None:
+                counts = series[key] = [0] * (len(buckets) + 2)
+            counts[next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))] += 1
+            counts[-1] += value
+            self._changed()
+
+    @contextmanager
+    def timed(self, dataset):
+        """Observe the time the block takes as a load of `dataset`."""
+        start = time.perf_counter()
+        yield
+        self.observe("findmypaper_data_load_seconds", time.perf_counter() - start, dataset=dataset)
+
+    def snapshot(self):
+        """{name: [[labels, value], ...]}, JSON-serialisable."""
+        with self._lock:
+            return {name: [[list(key), value] for key, value in series.items()]
+                    for name, series in self._values.items()}
+
+    def _publish_loop(self):
+        while True:
+            time.sleep(PUBLISH_INTERVAL)
+            self.publish()
+
+    def publish(self, force=False):
+        """Write this process's counts to share_dir, if set, when they have
+        changed since they were last written (always with force)."""
+        if not self.share_dir:
+            return
+        with self._publish_lock:
+            with self._lock:
+                if not (force or self._dirty):
+                    return
+                self._dirty = False
+            self._write(self._file, self.snapshot())
+
+    def _read(self, filename):
+        try:
+            with open(os.path.join(self.share_dir, filename), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, filename, data):
+        os.makedirs(self.share_dir, exist_ok=True)
+        path = os.path.join(self.share_dir, filename)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(path + ".tmp", path)
+
+    def _retired(self):
+        return self._read(RETIRED_FILE) or {"generation": 0, "merged": [], "values": {}}
+
+    def clear_shared(self):
+        """Remove the files of a previous run of the server from share_dir,
+        then publish this process's counts. Called by the gunicorn master
+        before it forks (on_starting in gunicorn.conf.py)."""
+        if not self.share_dir:
+            return
+        if os.path.isdir(self.share_dir):
+            for filename in os.listdir(self.share_dir):
+                os.remove(os.path.join(self.share_dir, filename))
+        self.publish(force=True)
+
+    def retire(self, pid):
+        """Fold the counts of the exited process `pid` into retired.json and
+        remove its file. Called by the gunicorn master when it reaps a worker
+        (child_exit in gunicorn.conf.py)."""
+        if not self.share_dir or not os.path.isdir(self.share_dir):
+            return
+        listing = os.listdir(self.share_dir)
+        files = [name for name in listing if name.startswith(f"{pid}-") and name.endswith(".json")]
+        if not files:
+            return
+        retired = self._retired()
+        totals = _sum([retired["values"]] + [self._read(name) or {} for name in files])
+        self._write(RETIRED_FILE, {
+            # Readers skip files listed here, so a file folded in but not yet
+            # removed is not counted twice
+            "generation": retired["generation"] + 1,
+            "merged": [name for name in retired["merged"] if name in listing] + files,
+            "values": {name: [[list(key), value] for key, value in series.items()]
+                       for name, series in totals.items()},
+        })
+        for name in files:
+            os.remove(os.path.join(self.share_dir, name))
+
+    def collect(self):
+        """Snapshots of this process, of every other process sharing
+        share_dir, and of the retired ones."""
+        if not self.share_dir or not os.path.isdir(self.share_dir):
+            return [self.snapshot()]
+        for _ in range(5):
+            retired = self._retired()
+            snapshots = [retired["values"], self.snapshot()]
+            skip = {RETIRED_FILE, self._file, *retired["merged"]}
+            for filename in os.listdir(self.share_dir):
+                if filename.endswith(".json") and filename not in skip:
+                    snapshot = self._read(filename)
+                    if snapshot is not None:
+                        snapshots.append(snapshot)
+            # A worker retired while the files were read may have been missed
+            if self._retired()["generation"] == retired["generation"]:
+                break
+        return snapshots
+
+    def render(self):
+        """Every process's counts, summed, in the Prometheus text format."""
+        totals = _sum(self.collect())
+        lines = []
+        for name, (kind, help_text, buckets) in METRICS.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for key, value in sorted(totals[name].items()):
+                if kind == "counter":
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(list(buckets) + ["+Inf"], value[:-1]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(key)} {value[-1]:.6f}")
+                lines.append(f"{name}_count{_format_labels(key)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _sum(snapshots):
+    """{name: {labels: value}} totals of snapshot() dicts."""
+    totals = {name: {} for name in METRICS}
+    for snapshot in snapshots:
+        for name, series in snapshot.items():
+            if name not in totals:
+                continue
+            for labels, value in series:
+                key = tuple(tuple(pair) for pair in labels)
+                if isinstance(value, list):
+                    current = totals[name].get(key, [0] * len(value))
+                    totals[name][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    totals[name][key] = totals[name].get(key, 0) + value
+    return totals
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+registry = Registry(os.environ.get("METRICS_DIR") or None)
+inc = registry.inc
+observe = registry.observe
+timed = registry.timed
+
+
+def instrument(app):
+    """Record the latency and response size of every request to app."""
+    from flask import g, request
+
+    profiling = bool(os.environ.get("PROFILE_REQUESTS"))
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+        if profiling and request.args.get("profile") == "1":
+            g.profile_path = profile_path(request.url_rule.rule if request.url_rule else "unmatched")
+            g.profiler = Profiler().start()
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop("metrics_start", None)
+        if start is None:
+            return response
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        observe("findmypaper_request_duration_seconds", time.perf_counter() - start,
+                route=route, method=request.method, code=str(response.status_code))
+        if not response.direct_passthrough:
+            observe("findmypaper_response_bytes", response.calculate_content_length() or 0, route=route)
+        elif response.content_length is not None:
+            observe("findmypaper_response_bytes", response.content_length, route=route)
+
+        if "profiler" in g:
+            response.headers["X-Profile"] = g.profile_path
+        return response
+
+    # Runs even when the view raised, so a failed request's sampler thread
+    # is stopped (and its profile written) too
+    @app.teardown_request
+    def stop_profiler(exc):
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.stop().write(g.pop("profile_path"))
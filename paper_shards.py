@@ -0,0 +1,180 @@
+"""Columnar, offset-indexed storage for paper records.
+
+A shard is a directory holding one column per field:
+
+    <shard>/meta.json                  {"format": 1, "count": N, "fields": [...], "version": ...}
+    <shard>/<version>/<field>.jsonl    one JSON-encoded value per line
+    <shard>/<version>/<field>.idx      N + 1 little-endian uint64 byte offsets into <field>.jsonl
+
+Row i of a field lives at bytes idx[i]:idx[i + 1] of its column, so reading a
+page touches only those rows, and only the fields that were asked for.
+Every write fills a new version directory and publishes it by replacing
+meta.json (store_versions.py), so meta.json doubles as the shard's version
+stamp and a reader never sees columns and a count from different writes.
+"""
+import json
+import mmap
+import os
+import shutil
+import struct
+
+import numpy as np
+
+import store_versions
+
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+OFFSET = struct.Struct("<Q")
+
+
+def is_shard(path):
+    return os.path.isfile(os.path.join(path, META_FILE))
+
+
+class ShardWriter:
+    """Append records to a new version of a shard, one row at a time.
+    Nothing but the file buffers is held in memory; close() publishes the
+    version, so readers holding the previous one keep working, and the
+    shard's previous contents stay readable (ShardReader(path)) until then."""
+
+    def __init__(self, path, fields):
+        self.path = path
+        self.fields = list(fields)
+        self.count = 0
+        self.version = store_versions.new_version(path)
+
+        self._columns = {}
+        self._indexes = {}
+        self._positions = {}
+        for field in self.fields:
+            self._columns[field] = open(os.path.join(self.version, f"{field}.jsonl"), "wb")
+            self._indexes[field] = open(os.path.join(self.version, f"{field}.idx"), "wb")
+            self._indexes[field].write(OFFSET.pack(0))
+            self._positions[field] = 0
+
+    def append(self, record):
+        for field in self.fields:
+            line = json.dumps(record.get(field, "")).encode("utf-8") + b"\n"
+            self._columns[field].write(line)
+            self._positions[field] += len(line)
+            self._indexes[field].write(OFFSET.pack(self._positions[field]))
+        self.count += 1
+
+    def extend(self, path):
+        """Append every row of the shard at `path` (same fields) by copying its
+        columns and shifting its offsets; no row is decoded."""
+        part = ShardReader(path)
+        if part.fields != self.fields:
+            raise ValueError(f"Field mismatch: {path} has {part.fields}, expected {self.fields}")
+
+        for field in self.fields:
+            with open(os.path.join(part.data, f"{field}.jsonl"), "rb") as f:
+                shutil.copyfileobj(f, self._columns[field])
+            base = np.uint64(self._positions[field])
+            with open(os.path.join(part.data, f"{field}.idx"), "rb") as f:
+                f.seek(OFFSET.size)  # first offset is always 0
+                for block in iter(lambda: f.read(OFFSET.size << 16), b""):
+                    offsets = np.frombuffer(block, dtype="<u8") + base
+                    self._indexes[field].write(offsets.astype("<u8").tobytes())
+                    self._positions[field] = int(offsets[-1])
+        self.count += part.count
+
+    def _close_files(self):
+        for field in self.fields:
+            self._columns[field].close()
+            self._indexes[field].close()
+
+    def close(self):
+        self._close_files()
+        meta = {"format": FORMAT_VERSION, "count": self.count, "fields": self.fields}
+        store_versions.publish(self.path, self.version, meta)
+
+    def abort(self):
+        """Discard the rows written so far; the shard on disk is left as it was."""
+        self._close_files()
+        shutil.rmtree(self.version, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        if kind is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class _Column:
+    def __init__(self, path, field):
+        self.data = _map(os.path.join(path, f"{field}.jsonl"))
+        self.offsets = _map(os.path.join(path, f"{field}.idx"))
+
+    def span(self, start, stop):
+        return OFFSET.unpack_from(self.offsets, 8 * start)[0], OFFSET.unpack_from(self.offsets, 8 * stop)[0]
+
+    def rows(self, start, stop):
+        if start >= stop:
+            return []
+        begin, end = self.span(start, stop)
+        return [json.loads(line) for line in self.data[begin:end].splitlines()]
+
+    def row(self, i):
+        begin, end = self.span(i, i + 1)
+        return json.loads(self.data[begin:end])
+
+
+def _map(path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class ShardReader:
+    """Random-access reader for one version of a shard. Every column is
+    memory-mapped on open, so the reader keeps serving that version after
+    the shard is rewritten; pages are only read when a field is asked for,
+    so a view that never asks for abstracts never reads or decodes them."""
+
+    def __init__(self, path):
+        self.path = path
+        meta = store_versions.read_meta(path)
+        if meta.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported shard format in {path}: {meta.get('format')}")
+        self.count = meta["count"]
+        self.fields = meta["fields"]
+        self.data = store_versions.data_dir(path, meta)
+        self._columns = {field: _Column(self.data, field) for field in self.fields}
+
+    def __len__(self):
+        return self.count
+
+    def column(self, field):
+        return self._columns[field]
+
+    def _fields(self, fields):
+        return self.fields if fields is None else [f for f in self.fields if f in fields]
+
+    def page(self, start, stop, fields=None):
+        """Rows [start, stop) as dicts restricted to `fields` (default: all)."""
+        start, stop = max(start, 0), min(stop, self.count)
+        fields = self._fields(fields)
+        columns = [self.column(field).rows(start, stop) for field in fields]
+        return [dict(zip(fields, values)) for values in zip(*columns)]
+
+    def rows(self, row_ids, fields=None):
+        """Arbitrary rows, in the order given."""
+        fields = self._fields(fields)
+        return [{field: self.column(field).row(i) for field in fields} for i in row_ids]
+
+    def iter_column(self, field, batch_size=10000):
+        """Stream every value of one field without decoding the others."""
+        column = self.column(field)
+        for start in range(0, self.count, batch_size):
+            yield from column.rows(start, min(start + batch_size, self.count))
+
+    def disk_bytes(self):
+        return sum(
+            os.path.getsize(os.path.join(self.data, f"{field}{ext}"))
+            for field in self.fields for ext in (".jsonl", ".idx")
+        )
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+MANIFEST_PATH = "pipeline_manifest.sqlite"
+
+
+def file_signature(path):
+    """Cheap change detector for an input file: size and mtime."""
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def digest(values):
+    """Stable hash of an iterable of JSON-serialisable values."""
+    h = hashlib.sha1()
+    for value in values:
+        h.update(json.dumps(value, sort_keys=True, default=str).encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+class Manifest:
+    """Bookkeeping for incremental pipeline runs, kept in one SQLite file.
+
+    - papers: id -> (update_date, categories) as of the last ingested
+      snapshot, so a new snapshot can be diffed record by record.
+    - stages: the input signature each stage last ran against, so a rerun
+      on unchanged inputs does no work.
+    - items: per-stage digests of individual outputs (e.g. one category),
+      so a stage can redo only the outputs whose inputs changed.
+    """
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS papers (
+                id TEXT PRIMARY KEY, update_date TEXT, categories TEXT);
+            CREATE TABLE IF NOT EXISTS stages (
+                stage TEXT PRIMARY KEY, inputs TEXT, finished_at REAL, stats TEXT);
+            CREATE TABLE IF NOT EXISTS items (
+                stage TEXT, item TEXT, digest TEXT, PRIMARY KEY (stage, item));
+        """)
+
+    def close(self):
+        self.db.close()
+
+    # ---------- Snapshot records ---------- #
+
+    def paper_count(self):
+        return self.db.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+
+    def lookup(self, ids):
+        """{id: (update_date, categories)} for the ids already known."""
+        found = {}
+        ids = list(ids)
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(ids), 900):
+            batch = ids[start:start + 900]
+            rows = self.db.execute(
+                f"SELECT id, update_date, categories FROM papers WHERE id IN ({','.join('?' * len(batch))})", batch)
+            found.update((pid, (update_date, categories)) for pid, update_date, categories in rows)
+        return found
+
+    def upsert_papers(self, rows):
+        """rows: iterable of (id, update_date, categories)."""
+        self.db.executemany("INSERT OR REPLACE INTO papers VALUES (?, ?, ?)", rows)
+
+    def clear_papers(self):
+        self.db.execute("DELETE FROM papers")
+
+    # ---------- Stage bookkeeping ---------- #
+
+    def inputs_signature(self, inputs):
+        return json.dumps({path: file_signature(path) for path in inputs}, sort_keys=True)
+
+    def is_current(self, stage, inputs):
+        """True if `stage` last finished against exactly these input files."""
+        row = self.db.execute("SELECT inputs FROM stages WHERE stage = ?", (stage,)).fetchone()
+        return row is not None and row[0] == self.inputs_signature(inputs)
+
+    def mark_done(self, stage, inputs, stats=None):
+        self.db.execute("INSERT OR REPLACE INTO stages VALUES (?, ?, ?, ?)",
+                        (stage, self.inputs_signature(inputs), time.time(), json.dumps(stats or {})))
+        self.db.commit()
+
+    def forget(self, stage):
+        """Make the next is_current(stage, ...) false, e.g. when another mode
+        of the stage has overwritten its outputs."""
+        self.db.execute("DELETE FROM stages WHERE stage = ?", (stage,))
+        self.db.commit()
+
+    def item_changed(self, stage, item, item_digest):
+        row = self.db.execute("SELECT digest FROM items WHERE stage = ? AND item = ?", (stage, item)).fetchone()
+        return row is None or row[0] != item_digest
+
+    def mark_item(self, stage, item, item_digest):
+        self.db.execute("INSERT OR REPLACE INTO items VALUES (?, ?, ?)", (stage, item, item_digest))
+
+    def commit(self):
+        self.db.commit()
@@ -0,0 +1,98 @@
+"""Per-stage run log for the used/ pipeline scripts.
+
+    run = run_log.start("subfield_level")
+    ...
+    run.rows = len(papers_df)
+
+When the script exits, start() appends one JSON line to pipeline_runs.jsonl
+in the working directory (next to pipeline_manifest.sqlite):
+
+    {"stage": "subfield_level", "status": "ok", "started_at": ..., "seconds": 12.31,
+     "rows": 1200000, "rows_per_sec": 97482.5, "peak_rss_mb": 812.4,
+     "workers_peak_rss_mb": 0.0, "argv": [...], "profile": null}
+
+`status` is "ok", "skipped" (set by the script when its inputs are
+unchanged), the exception that ended the script ("error: KeyError") or,
+for a script that called sys.exit() with a non-zero code or a message,
+"error: exit <code>" (a message exits with 1). `peak_rss_mb` is the
+script's own high-water mark; `workers_peak_rss_mb` the largest shard
+worker it ran.
+
+Profiling: PROFILE_STAGES=subfield_level,coauthor_graph (or "all") samples
+the named stages' main thread with sampling_profiler.Profiler and writes
+the stacks to PROFILE_DIR (default profiles/).
+"""
+import atexit
+import json
+import os
+import resource
+import sys
+import time
+
+from sampling_profiler import Profiler, profile_path
+
+RUN_LOG_PATH = "pipeline_runs.jsonl"
+
+
+class StageRun:
+    def __init__(self, stage, path=RUN_LOG_PATH):
+        self.stage = stage
+        self.path = path
+        self.rows = None
+        self.status = "ok"
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._finished = False
+        profiled = os.environ.get("PROFILE_STAGES", "").split(",")
+        self.profiler = Profiler().start() if stage in profiled or "all" in profiled else None
+
+    def finish(self):
+        """Append this run to the log (once)."""
+        if self._finished:
+            return
+        self._finished = True
+        seconds = time.perf_counter() - self._start
+        profile = self.profiler.stop().write(profile_path(self.stage)) if self.profiler else None
+        record = {
+            "stage": self.stage,
+            "status": self.status,
+            "started_at": self.started_at,
+            "seconds": round(seconds, 3),
+            "rows": self.rows,
+            "rows_per_sec": round(self.rows / seconds, 1) if self.rows and seconds else None,
+            # ru_maxrss is in KB on Linux
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "workers_peak_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+            "argv": sys.argv,
+            "profile": profile,
+        }
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+        rate = f", {record['rows_per_sec']:,.0f} rows/s" if record["rows_per_sec"] else ""
+        print(f"⏱️ {self.stage}: {record['status']} in {seconds:.1f}s{rate}, {record['peak_rss_mb']:,.0f} MB peak"
+              + (f"; profile in {profile}" if profile else ""))
+
+
+def start(stage, path=RUN_LOG_PATH):
+    """Start timing `stage`; the record is written when the process exits."""
+    run = StageRun(stage, path)
+    hook = sys.excepthook
+
+    def record_failure(kind, value, traceback):
+        run.status = f"error: {kind.__name__}"
+        hook(kind, value, traceback)
+
+    # SystemExit skips sys.excepthook, and atexit handlers never see the
+    # exit code, so the code is taken from sys.exit() itself
+    exit = sys.exit
+
+    def record_exit(code=None):
+        if code is not None and code != 0:
+            run.status = f"error: exit {code if isinstance(code, int) else 1}"
+        exit(code)
+
+    sys.excepthook = record_failure
+    sys.exit = record_exit
+    atexit.register(run.finish)
+    return run
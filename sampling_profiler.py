@@ -0,0 +1,93 @@
+"""A small sampling profiler for finding hot spots in a running server or
+pipeline stage, with no dependencies.
+
+Profiler samples one thread's Python stack every `interval` seconds from a
+background thread and counts each distinct stack. write() saves the counts
+in the collapsed format ("outer;inner;leaf count" per line) that
+flamegraph.pl, speedscope and inferno read:
+
+    with Profiler() as profiler:
+        work()
+    profiler.write("profiles/work.folded")
+
+Time spent in native code (numpy, pandas, json) is charged to the Python
+frame that called it. Threads and processes the profiled thread starts are
+not sampled.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+
+
+def frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Profiler:
+    """Stack samples of the thread `thread_id` (default: the calling thread)."""
+
+    def __init__(self, thread_id=None, interval=0.005):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self.seconds = 0.0
+        self._done = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._done.set()
+        self._thread.join()
+        self.seconds = time.perf_counter() - self._started
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _sample(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def samples(self):
+        return sum(self.stacks.values())
+
+    def top(self, n=10):
+        """[(function, share of samples)] for the n functions most often on top of the stack."""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        total = self.samples() or 1
+        return [(name, count / total) for name, count in leaves.most_common(n)]
+
+    def write(self, path):
+        """Save the samples in collapsed-stack format; returns path."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+def profile_path(label):
+    """PROFILE_DIR/<label>-<timestamp>-<pid>.folded, label made filename-safe."""
+    safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in label.strip("/")) or "root"
+    return os.path.join(PROFILE_DIR, f"{safe}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.folded")
@@ -0,0 +1,166 @@
+import math
+import re
+from array import array
+from collections import Counter
+
+import numpy as np
+
+# Search box name -> paper record field
+SEARCH_FIELDS = {
+    "title": "title",
+    "author": "authors",
+    "abstract": "abstract"
+}
+
+# A hit in the title counts more than a hit somewhere in the abstract
+FIELD_WEIGHTS = {
+    "title": 3.0,
+    "author": 2.0,
+    "abstract": 1.0
+}
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    if not isinstance(text, str):
+        return []
+    return TOKEN_RE.findall(text.lower())
+
+
+class FieldIndex:
+    """Postings for one field, stored CSR-style: the documents containing
+    term `t` are docs[indptr[t]:indptr[t + 1]] (ascending), with matching
+    term frequencies in tfs."""
+
+    def __init__(self, values):
+        vocab = {}
+        term_ids = array("I")
+        doc_ids = array("I")
+        tfs = array("H")
+        doc_len = array("f")
+
+        for doc_id, text in enumerate(values):
+            tokens = tokenize(text)
+            doc_len.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                term_ids.append(vocab.setdefault(term, len(vocab)))
+                doc_ids.append(doc_id)
+                tfs.append(min(tf, 0xFFFF))
+
+        term_ids = np.frombuffer(term_ids, dtype=np.uint32)
+        # Stable sort keeps doc ids ascending inside every posting list
+        order = np.argsort(term_ids, kind="stable")
+
+        self.vocab = vocab
+        self.docs = np.frombuffer(doc_ids, dtype=np.uint32)[order].astype(np.int64)
+        self.tfs = np.frombuffer(tfs, dtype=np.uint16)[order].astype(np.float32)
+        self.indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(vocab)), out=self.indptr[1:])
+        self.doc_len = np.frombuffer(doc_len, dtype=np.float32).copy()
+        self.avgdl = float(self.doc_len.mean()) if len(self.doc_len) else 0.0
+
+    def score(self, term):
+        """BM25 contribution of `term` as (sorted doc ids, scores)."""
+        tid = self.vocab.get(term)
+        if tid is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        start, end = self.indptr[tid], self.indptr[tid + 1]
+        docs = self.docs[start:end]
+        tf = self.tfs[start:end]
+
+        n_docs = len(self.doc_len)
+        df = end - start
+        idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        norm = K1 * (1 - B + B * self.doc_len[docs] / max(self.avgdl, 1e-9))
+        return docs, idf * tf * (K1 + 1) / (tf + norm)
+
+    def nbytes(self):
+        return self.docs.nbytes + self.tfs.nbytes + self.indptr.nbytes + self.doc_len.nbytes
+
+
+class SearchIndex:
+    """In-memory BM25 index over the title/author/abstract fields of a
+    category's papers. Documents are identified by their row number in the
+    data the index was built from."""
+
+    def __init__(self, columns):
+        """`columns` maps each record field in SEARCH_FIELDS to an iterable of
+        its values in row order."""
+        self.fields = {
+            name: FieldIndex(columns[key])
+            for name, key in SEARCH_FIELDS.items()
+        }
+        self.size = len(self.fields["title"].doc_len)
+
+    @classmethod
+    def from_papers(cls, papers):
+        # Lists, not generators: a generator here would read `key` only when
+        # FieldIndex consumes it, after the loop has moved on to the last field
+        return cls({key: [paper.get(key, "") for paper in papers] for key in SEARCH_FIELDS.values()})
+
+    def _clause(self, term, fields):
+        """Documents matching `term` in any of `fields`, with summed weighted scores."""
+        hits = [self.fields[f].score(term) for f in fields]
+        hits = [(docs, FIELD_WEIGHTS[f] * scores) for f, (docs, scores) in zip(fields, hits) if len(docs)]
+        if not hits:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if len(hits) == 1:
+            return hits[0]
+
+        docs = np.concatenate([d for d, _ in hits])
+        scores = np.concatenate([s for _, s in hits])
+        unique_docs, inverse = np.unique(docs, return_inverse=True)
+        return unique_docs, np.bincount(inverse, weights=scores).astype(np.float32)
+
+    def search(self, queries, offset=0, limit=50):
+        """Rank documents for a dict of queries.
+
+        `queries` maps a search box name ("title", "author", "abstract") to
+        its text; the key "q" searches all fields at once. Every term has to
+        match (in its own field, or in any field for "q"). Returns
+        (total_matches, [(doc_id, score), ...]) for the requested slice.
+        """
+        clauses = []
+        for name, text in queries.items():
+            fields = list(SEARCH_FIELDS) if name == "q" else [name]
+            for term in tokenize(text):
+                if (term, tuple(fields)) not in clauses:
+                    clauses.append((term, tuple(fields)))
+
+        if not clauses:
+            stop = min(offset + limit, self.size)
+            return self.size, [(doc_id, 0.0) for doc_id in range(offset, stop)]
+
+        results = [self._clause(term, fields) for term, fields in clauses]
+        # Intersect starting from the rarest clause so the candidate set stays small
+        results.sort(key=lambda r: len(r[0]))
+        candidates, scores = results[0]
+        for docs, term_scores in results[1:]:
+            if not len(candidates):
+                break
+            idx = np.searchsorted(docs, candidates)
+            idx[idx == len(docs)] = 0
+            match = docs[idx] == candidates
+            candidates = candidates[match]
+            scores = scores[match] + term_scores[idx[match]]
+
+        # Only the top offset+limit hits need sorting: highest score first,
+        # ties broken by original order. Every hit tied with the last of them
+        # is kept, so the page boundary does not depend on partition order.
+        total = len(candidates)
+        top = offset + limit
+        if 0 < top < total:
+            cutoff = -np.partition(-scores, top - 1)[top - 1]
+            keep = scores >= cutoff
+            candidates, scores = candidates[keep], scores[keep]
+        order = np.lexsort((candidates, -scores))[offset:offset + limit]
+        return total, [(int(candidates[i]), float(scores[i])) for i in order]
+
+    def nbytes(self):
+        return sum(field.nbytes() for field in self.fields.values())
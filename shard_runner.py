@@ -0,0 +1,36 @@
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+SHARD_RE = re.compile(r"metadata_part_(\d+)\.json$")
+
+
+def shard_paths(input_dir):
+    """metadata_part_N.json files in input_dir, ordered by N."""
+    shards = [(int(m.group(1)), name) for name in os.listdir(input_dir) if (m := SHARD_RE.match(name))]
+    return [os.path.join(input_dir, name) for _, name in sorted(shards)]
+
+
+def add_workers_argument(parser):
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="processes to map shards over (default: all cores; 1 runs in-process)")
+
+
+def run_shards(map_shard, shards, reduce, workers=None):
+    """Apply map_shard to every shard in a process pool and hand the results,
+    in shard order, to reduce. Ordering makes the reduce step deterministic,
+    so output does not depend on which worker finished first.
+
+    map_shard must be a module-level function so it can be sent to workers;
+    scripts using this need an `if __name__ == "__main__":` guard.
+    """
+    start = time.perf_counter()
+    workers = min(workers or os.cpu_count(), len(shards)) or 1
+    if workers == 1:
+        result = reduce(map(map_shard, shards))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            result = reduce(pool.map(map_shard, shards))
+    print(f"⚙️ {len(shards)} shards on {workers} worker(s) in {time.perf_counter() - start:.1f}s")
+    return result
@@ -0,0 +1,340 @@
+"""Precomputed paper counts by category and month, for /api/stats.
+
+    <path>/meta.json                      axis labels and totals (written last)
+    <path>/<version>/category_month.npy   arXiv category x month: papers listed in the category
+    <path>/<version>/main_month.npy       main category x month: papers in the main category
+    <path>/<version>/month.npy            month: papers
+    <path>/<version>/main_pairs.npy       main x main x year: papers cross-listed in both (a < b)
+    <path>/<version>/category_pairs.npy   rows of (a, b, year, papers) for arXiv categories a < b
+
+Each write goes to a new version directory and then swaps meta.json
+(store_versions.py), so an incremental ingest never rewrites the arrays
+a server has open.
+
+Months are update_date's "YYYY-MM"; papers without one fall in month ""
+(year ""). A paper counts once per arXiv category, once per main category
+and once in the month totals, so every query reads the one table that
+counts what it asks for and no full pass over the data is needed. Queries
+sum a few thousand cells and take well under a millisecond.
+"""
+import os
+import re
+import threading
+import time
+from collections import Counter
+from itertools import combinations
+
+import numpy as np
+
+import metrics
+import store_versions
+from arxiv_meta import PREFIX_TO_CATEGORY
+
+MONTH_RE = re.compile(r"^\d{4}-\d{2}")
+DIMENSIONS = ("main", "category", "year", "month")
+PAIR_DIMENSIONS = ("main_pair", "category_pair")
+
+
+def month_of(update_date):
+    update_date = update_date or ""
+    return update_date[:7] if MONTH_RE.match(update_date) else ""
+
+
+def main_of(category):
+    return PREFIX_TO_CATEGORY.get(category.split(".")[0])
+
+
+class CubeCounts:
+    """Counters the cube is built from. Like generate_category_counts.add_paper,
+    sign=-1 takes a previously counted paper back out, and counts from
+    several shards add up with update()."""
+
+    def __init__(self):
+        self.category_month = Counter()
+        self.main_month = Counter()
+        self.month = Counter()
+        self.main_pairs = Counter()
+        self.category_pairs = Counter()
+
+    def add(self, categories, update_date, sign=1):
+        month = month_of(update_date)
+        year = month[:4]
+        listed = sorted({cat for cat in (categories or "").split() if main_of(cat)})
+        mains = sorted({main_of(cat) for cat in listed})
+
+        self.month[month] += sign
+        for cat in listed:
+            self.category_month[cat, month] += sign
+        for main in mains:
+            self.main_month[main, month] += sign
+        for a, b in combinations(listed, 2):
+            self.category_pairs[a, b, year] += sign
+        for a, b in combinations(mains, 2):
+            self.main_pairs[a, b, year] += sign
+
+    def update(self, other):
+        for name in ("category_month", "main_month", "month", "main_pairs", "category_pairs"):
+            getattr(self, name).update(getattr(other, name))
+        return self
+
+    def write(self, path):
+        """Write the cube to `path` as dense arrays over the labels seen."""
+        categories = sorted({cat for (cat, _), n in self.category_month.items() if n})
+        mains = sorted({main_of(cat) for cat in categories})
+        months = sorted({month for month, n in self.month.items() if n})
+        years = sorted({month[:4] for month in months})
+        cat_at = {cat: i for i, cat in enumerate(categories)}
+        main_at = {main: i for i, main in enumerate(mains)}
+        month_at = {month: i for i, month in enumerate(months)}
+        year_at = {year: i for i, year in enumerate(years)}
+
+        category_month = np.zeros((len(categories), len(months)), dtype=np.int32)
+        for (cat, month), n in self.category_month.items():
+            if n:
+                category_month[cat_at[cat], month_at[month]] = n
+        main_month = np.zeros((len(mains), len(months)), dtype=np.int32)
+        for (main, month), n in self.main_month.items():
+            if n:
+                main_month[main_at[main], month_at[month]] = n
+        month_totals = np.array([self.month[month] for month in months], dtype=np.int32)
+        main_pairs = np.zeros((len(mains), len(mains), len(years)), dtype=np.int32)
+        for (a, b, year), n in self.main_pairs.items():
+            if n:
+                main_pairs[main_at[a], main_at[b], year_at[year]] = n
+        category_pairs = np.array(
+            sorted((cat_at[a], cat_at[b], year_at[year], n) for (a, b, year), n in self.category_pairs.items() if n),
+            dtype=np.int32).reshape(-1, 4)
+
+        version = store_versions.new_version(path)
+        for name, array in (("category_month", category_month), ("main_month", main_month), ("month", month_totals),
+                            ("main_pairs", main_pairs), ("category_pairs", category_pairs)):
+            np.save(os.path.join(version, f"{name}.npy"), array)
+        meta = {
+            "categories": categories,
+            "mains": mains,
+            "months": months,
+            "years": years,
+            "papers": int(month_totals.sum()),
+            "built_at": time.time(),
+        }
+        return store_versions.publish(path, version, meta)
+
+    @classmethod
+    def load(cls, path):
+        """Counters back from a written cube, e.g. to adjust it incrementally."""
+        cube = StatsCube(path, None)
+        counts = cls()
+        for i, j in zip(*np.nonzero(cube.category_month)):
+            counts.category_month[cube.categories[i], cube.months[j]] = int(cube.category_month[i, j])
+        for i, j in zip(*np.nonzero(cube.main_month)):
+            counts.main_month[cube.mains[i], cube.months[j]] = int(cube.main_month[i, j])
+        for j in np.flatnonzero(cube.month):
+            counts.month[cube.months[j]] = int(cube.month[j])
+        for a, b, y in zip(*np.nonzero(cube.main_pairs)):
+            counts.main_pairs[cube.mains[a], cube.mains[b], cube.years[y]] = int(cube.main_pairs[a, b, y])
+        for a, b, y, n in cube.category_pairs.tolist():
+            counts.category_pairs[cube.categories[a], cube.categories[b], cube.years[y]] = n
+        return counts
+
+
+def _parse_values(dimension, spec):
+    """`a|b` alternatives; year and month also take `from..to` ranges."""
+    values = []
+    for part in spec.split("|"):
+        if ".." in part and dimension in ("year", "month"):
+            low, high = part.split("..", 1)
+            values.append((low, high))
+        elif part:
+            values.append(part)
+    if not values:
+        raise ValueError(f"empty filter for {dimension}")
+    return values
+
+
+def parse_filters(spec):
+    """`main:physics|mathematics,year:2015..2020` -> {dimension: values}."""
+    filters = {}
+    for clause in (spec or "").split(","):
+        if not clause:
+            continue
+        dimension, sep, values = clause.partition(":")
+        if not sep or dimension not in DIMENSIONS:
+            raise ValueError(f"filter must be dimension:value with dimension in {', '.join(DIMENSIONS)}")
+        filters[dimension] = _parse_values(dimension, values)
+    return filters
+
+
+def _matches(labels, values):
+    labels = np.asarray(labels, dtype=object)
+    mask = np.zeros(len(labels), dtype=bool)
+    for value in values:
+        if isinstance(value, tuple):
+            low, high = value
+            mask |= np.array([label != "" and (not low or label >= low) and (not high or label[:len(high)] <= high)
+                              for label in labels], dtype=bool)
+        else:
+            mask |= labels == value
+    return mask
+
+
+def _records(columns):
+    """[{name: value}] rows from (name, values) columns of equal length."""
+    names = [name for name, _ in columns]
+    return [dict(zip(names, values)) for values in zip(*(values for _, values in columns))]
+
+
+class StatsCube:
+    """One opened cube. Arrays are small and loaded whole."""
+
+    def __init__(self, path, mtime):
+        self.path = path
+        self.mtime = mtime
+        self.meta = store_versions.read_meta(path)
+        data = store_versions.data_dir(path, self.meta)
+        self.categories = self.meta["categories"]
+        self.mains = self.meta["mains"]
+        self.months = self.meta["months"]
+        self.years = self.meta["years"]
+        self.category_main = np.array([self.mains.index(main_of(cat)) for cat in self.categories], dtype=np.int64)
+        self.month_year = np.array([self.years.index(month[:4]) for month in self.months], dtype=np.int64)
+        for name in ("category_month", "main_month", "month", "main_pairs", "category_pairs"):
+            setattr(self, name, np.load(os.path.join(data, f"{name}.npy")))
+        self.loaded_at = time.time()
+
+    def query(self, group_by, filters):
+        """[{dimension: label, ..., "count": n}] for the cells of `group_by`
+        (any of DIMENSIONS, or one of PAIR_DIMENSIONS optionally with year)
+        over the papers matching `filters` (see parse_filters)."""
+        unknown = [d for d in group_by if d not in DIMENSIONS + PAIR_DIMENSIONS]
+        if unknown:
+            raise ValueError(f"cannot group by {', '.join(unknown)}")
+        if any(d in PAIR_DIMENSIONS for d in group_by):
+            return self._pairs(group_by, filters)
+
+        # The table that counts each paper once per what is asked about
+        if "category" in group_by or "category" in filters:
+            table, row_labels, row_main = self.category_month, self.categories, self.category_main
+        elif "main" in group_by or "main" in filters:
+            table, row_labels, row_main = self.main_month, self.mains, np.arange(len(self.mains))
+        else:
+            table, row_labels, row_main = self.month[None, :], [""], np.zeros(1, dtype=np.int64)
+
+        rows = np.ones(len(row_labels), dtype=bool)
+        if "category" in filters:
+            rows &= _matches(row_labels, filters["category"])
+        if "main" in filters:
+            rows &= _matches(self.mains, filters["main"])[row_main]
+        cols = np.ones(len(self.months), dtype=bool)
+        if "month" in filters:
+            cols &= _matches(self.months, filters["month"])
+        if "year" in filters:
+            cols &= _matches(self.years, filters["year"])[self.month_year]
+
+        row_ids, col_ids = np.flatnonzero(rows), np.flatnonzero(cols)
+        if "category" in group_by:
+            row_key, row_dims = row_ids, [("category", self.categories)]
+        elif "main" in group_by:
+            row_key, row_dims = row_main[row_ids], [("main", self.mains)]
+        else:
+            row_key, row_dims = np.zeros(len(row_ids), dtype=np.int64), []
+        if "month" in group_by:
+            col_key, col_dims = col_ids, [("month", self.months)]
+        elif "year" in group_by:
+            col_key, col_dims = self.month_year[col_ids], [("year", self.years)]
+        else:
+            col_key, col_dims = np.zeros(len(col_ids), dtype=np.int64), []
+        # Summing several categories into one group would count a paper
+        # listed in more than one of them several times
+        if table is self.category_month and "category" not in group_by \
+                and len(set(row_key.tolist())) < len(row_ids):
+            raise ValueError("group by category, or filter on one category per group")
+
+        n_cols = int(col_key.max()) + 1 if len(col_key) else 1
+        sums = np.bincount((row_key[:, None] * n_cols + col_key[None, :]).ravel(),
+                           weights=table[np.ix_(row_ids, col_ids)].ravel(), minlength=(int(row_key.max()) + 1 if len(row_key) else 1) * n_cols)
+        cells = np.flatnonzero(sums)
+        r, c = np.divmod(cells, n_cols)
+        columns = [(name, np.asarray(labels, dtype=object)[r].tolist()) for name, labels in row_dims]
+        columns += [(name, np.asarray(labels, dtype=object)[c].tolist()) for name, labels in col_dims]
+        columns.append(("count", sums[cells].astype(np.int64).tolist()))
+        return _records(columns)
+
+    def _pairs(self, group_by, filters):
+        pair = "main_pair" if "main_pair" in group_by else "category_pair"
+        if set(group_by) - {pair, "year"} or "month" in filters:
+            raise ValueError(f"{pair} groups only with year and filters only on main, category and year")
+        by_year = "year" in group_by
+
+        if pair == "main_pair":
+            labels = self.mains
+            a, b, y = (idx.astype(np.int64) for idx in np.nonzero(self.main_pairs))
+            counts = self.main_pairs[a, b, y]
+            main_a, main_b = a, b
+            if "category" in filters:
+                raise ValueError("main_pair cannot be filtered by category")
+        else:
+            labels = self.categories
+            a, b, y, counts = (self.category_pairs[:, i].astype(np.int64) for i in range(4))
+            main_a, main_b = self.category_main[a], self.category_main[b]
+
+        keep = np.ones(len(counts), dtype=bool)
+        if "year" in filters:
+            keep &= _matches(self.years, filters["year"])[y]
+        if "main" in filters:
+            # Both sides inside the selected main categories
+            selected = _matches(self.mains, filters["main"])
+            keep &= selected[main_a] & selected[main_b]
+        if "category" in filters:
+            selected = _matches(self.categories, filters["category"])
+            keep &= selected[a] | selected[b]
+
+        n = len(labels)
+        n_years = len(self.years) if by_year else 1
+        key = (a[keep] * n + b[keep]) * n_years + (y[keep] if by_year else 0)
+        sums = np.bincount(key, weights=counts[keep], minlength=n * n * n_years)
+        cells = np.flatnonzero(sums)
+        pair_cells, year = np.divmod(cells, n_years)
+        i, j = np.divmod(pair_cells, n)
+        labels = np.asarray(labels, dtype=object)
+        columns = [(pair, [list(p) for p in zip(labels[i].tolist(), labels[j].tolist())])]
+        if by_year:
+            columns.append(("year", np.asarray(self.years, dtype=object)[year].tolist()))
+        columns.append(("count", sums[cells].astype(np.int64).tolist()))
+        return _records(columns)
+
+    def stats(self):
+        return {
+            "papers": self.meta["papers"],
+            "categories": len(self.categories),
+            "months": len(self.months),
+            "built_at": self.meta["built_at"],
+            "loaded_at": self.loaded_at,
+        }
+
+
+class CubeCache:
+    """The cube at `path`, reopened when its meta.json changes (same policy
+    as category_store.CategoryStore)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._cube = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """The current StatsCube, or None if none has been built."""
+        meta_path = os.path.join(self.path, "meta.json")
+        if not os.path.isfile(meta_path):
+            return None
+        mtime = os.stat(meta_path).st_mtime
+        cube = self._cube
+        if cube is not None and cube.mtime == mtime:
+            return cube
+        with self._lock:
+            if self._cube is None or self._cube.mtime != mtime:
+                with metrics.timed("stats_cube"):
+                    self._cube = StatsCube(self.path, mtime)
+            return self._cube
+
+    def stats(self):
+        return self._cube.stats() if self._cube is not None else {"loaded": False}
@@ -0,0 +1,102 @@
+"""Versioned data directories for the memory-mapped stores.
+
+A build writes its arrays and shards into a fresh directory and publishes
+it by replacing the store's meta.json, which names that directory:
+
+    <store>/meta.json     {..., "version": "v1718000000000000000"}  (replaced last, atomically)
+    <store>/v.../         the files of that build
+
+Servers map a store's files and keep them mapped; rewriting one in place
+(np.save, open_memmap) would truncate it under them, and touching the
+truncated pages raises SIGBUS. With a new directory per build nothing a
+reader has opened is ever rewritten. Once the new meta.json is in place,
+versions older than the one it replaced are removed; the replaced one is
+kept for readers that read meta.json just before the swap. A build that
+fails leaves its directory behind, unpublished, for the next publish to
+remove.
+
+Stores written before versioning have their files next to meta.json and
+no "version" key; data_dir() resolves both.
+
+    version = store_versions.new_version(store_dir)
+    np.save(os.path.join(version, "x.npy"), x)
+    store_versions.publish(store_dir, version, meta)
+
+Stores that are built on demand by the server (citation_store.py) take
+build_lock() around the check-and-build, so workers that find the store
+stale at the same time build it once.
+"""
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; builds there are not serialised
+    fcntl = None
+
+META_FILE = "meta.json"
+PREFIX = "v"
+
+
+def data_dir(store_dir, meta):
+    """Directory holding the files of the version `meta` describes."""
+    return os.path.join(store_dir, meta["version"]) if meta.get("version") else store_dir
+
+
+def read_meta(store_dir):
+    with open(os.path.join(store_dir, META_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def new_version(store_dir):
+    """Create an empty version directory under store_dir and return its path."""
+    os.makedirs(store_dir, exist_ok=True)
+    while True:
+        # Fixed-width decimal nanoseconds, so names sort by creation time
+        path = os.path.join(store_dir, f"{PREFIX}{time.time_ns():019d}")
+        try:
+            os.mkdir(path)
+            return path
+        except FileExistsError:
+            continue
+
+
+def publish(store_dir, version, meta, indent=None):
+    """Make `version` (a path from new_version()) the store's current data by
+    writing `meta`, plus its name, as store_dir/meta.json. Returns the
+    meta as written."""
+    meta_path = os.path.join(store_dir, META_FILE)
+    try:
+        previous = read_meta(store_dir).get("version")
+    except (OSError, ValueError):
+        previous = None
+
+    meta = dict(meta, version=os.path.basename(version))
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=indent)
+    os.replace(meta_path + ".tmp", meta_path)
+    _prune(store_dir, keep={meta["version"], previous})
+    return meta
+
+
+@contextmanager
+def build_lock(store_dir):
+    """Hold an exclusive lock on store_dir (via the file store_dir + ".lock")
+    across processes and threads until the block exits."""
+    os.makedirs(os.path.dirname(os.path.abspath(store_dir)), exist_ok=True)
+    with open(store_dir + ".lock", "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def _prune(store_dir, keep):
+    """Remove version directories older than the newest one kept. Newer ones
+    may belong to a build still in progress."""
+    newest = max(name for name in keep if name)
+    for name in os.listdir(store_dir):
+        if name.startswith(PREFIX) and name[len(PREFIX):].isdigit() and name not in keep and name < newest:
+            shutil.rmtree(os.path.join(store_dir, name), ignore_errors=True)
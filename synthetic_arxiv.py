@@ -0,0 +1,218 @@
+"""Seeded synthetic arXiv metadata, for benchmarks and load tests.
+
+generate() yields records shaped like the Kaggle arXiv snapshot (id,
+submitter, authors, title, comments, categories, abstract, versions,
+update_date, authors_parsed, ...) plus the `citations` list the repo's CSVs
+carry. IDs follow arXiv's schemes by submission month: hep-th/9901001 before
+April 2007, 0704.0001 until 2014, 1501.00001 after; monthly volume grows
+over time as on arXiv. Categories are drawn from
+static/arxiv_category_mapping_cs_fixed.csv with a long tail and cross-lists;
+author productivity and citations are heavy-tailed, and about 1% of papers
+are large collaborations. TeX accents and affiliations turn up in author
+lists as they do in the real data.
+
+write_dataset() lays out everything the used/ scripts read:
+
+    python synthetic_arxiv.py 100000 --output bench_data/100k
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import shutil
+from array import array
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+MAPPING_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static",
+                           "arxiv_category_mapping_cs_fixed.csv")
+FIRST_MONTH, LAST_MONTH = (1991, 8), (2025, 12)
+NEW_IDS, FIVE_DIGIT_IDS = (2007, 4), (2015, 1)
+CSV_COLUMNS = ["id", "title", "categories", "authors", "authors_parsed", "citations", "abstract"]
+
+SYLLABLES = ["ka", "lo", "mi", "ser", "an", "tho", "ber", "li", "ng", "wa", "zhu", "chen", "ov", "ski",
+             "ra", "el", "de", "ma", "ro", "su", "ta", "ne", "vi", "gu", "pe", "yu", "har", "sen", "ko",
+             "mar", "tin", "ez", "son", "ya", "da", "fu", "mo", "ri", "ck", "ston"]
+FIRST_NAMES = ["Wei", "Anna", "John", "Maria", "Hiroshi", "Olga", "David", "Li", "Sanjay", "Elena",
+               "Michael", "Yuki", "Ahmed", "Sofia", "Pierre", "Chen", "Laura", "Ivan", "Fatima", "Lucas",
+               "J.", "A.", "M.", "S.", "K.", "R.", "E.", "T."]
+TEX_NAMES = ["M\\\"uller", "Schr\\\"oder", "G\\'omez", "Jos\\'e", "{\\O}stergaard", "Ha\\v{s}ek", "Fran\\c{c}ois"]
+AFFILIATIONS = ["(MIT)", "(CERN)", "(University of Tokyo)", "(Max Planck Institute)", "(Caltech)"]
+
+
+def _months():
+    """Every submission month with its share of papers (growing ~10% a year)."""
+    months = []
+    year, month = FIRST_MONTH
+    while (year, month) <= LAST_MONTH:
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    weights = np.array([1.1 ** (y - FIRST_MONTH[0] + m / 12) for y, m in months])
+    return months, weights / weights.sum()
+
+
+def _categories():
+    categories = pd.read_csv(MAPPING_CSV)["category"].dropna().tolist()
+    weights = 1.0 / np.arange(1, len(categories) + 1) ** 0.8
+    return categories, weights / weights.sum()
+
+
+def _vocabulary(rng, size=3000):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def _author_pool(rng, size):
+    """[(first, last)] names; about 2% spelled with TeX accents."""
+    pool, seen = [], set()
+    while len(pool) < size:
+        last = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+        if rng.random() < 0.02:
+            last = rng.choice(TEX_NAMES) + last.lower()
+        name = (rng.choice(FIRST_NAMES), last)
+        if name not in seen:
+            seen.add(name)
+            pool.append(name)
+    return pool
+
+
+def _paper_id(year, month, seq, primary):
+    if (year, month) < NEW_IDS:
+        return f"{primary.split('.')[0]}/{year % 100:02d}{month:02d}{seq:03d}"
+    if (year, month) < FIVE_DIGIT_IDS:
+        return f"{year % 100:02d}{month:02d}.{seq:04d}"
+    return f"{year % 100:02d}{month:02d}.{seq:05d}"
+
+
+def generate(n, seed=0, mean_references=10):
+    """Yield n synthetic records in submission order."""
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    months, month_weights = _months()
+    categories, category_weights = _categories()
+    vocabulary = _vocabulary(rng)
+    pool = _author_pool(rng, max(100, n // 3))
+    author_weights = np.cumsum(1.0 / np.arange(1, len(pool) + 1) ** 0.9).tolist()
+
+    paper_months = np.sort(np_rng.choice(len(months), size=n, p=month_weights))
+    primaries = np_rng.choice(len(categories), size=n, p=category_weights)
+    references = np_rng.poisson(mean_references, size=n)
+
+    # Integer arrays rather than lists: at 2M papers `cited` holds ~20M entries
+    ids, by_category, cited = [], {}, array("i")
+    sequence = {}
+    for i in range(n):
+        year, month = months[paper_months[i]]
+        primary = categories[primaries[i]]
+        # Old-style ids number papers per archive (hep-th/...), new ones per month
+        scope = (year, month, primary.split(".")[0] if (year, month) < NEW_IDS else "")
+        seq = sequence[scope] = sequence.get(scope, 0) + 1
+        paper_id = _paper_id(year, month, seq, primary)
+
+        cross = [c for c in rng.choices(categories, weights=category_weights, k=rng.choice([0, 0, 1, 1, 2]))
+                 if c != primary]
+        paper_categories = " ".join(dict.fromkeys([primary] + cross))
+
+        big = rng.random() < 0.01
+        count = rng.randint(50, 300) if big else min(1 + int(rng.expovariate(1 / 3)), 30)
+        names = list(dict.fromkeys(rng.choices(pool, cum_weights=author_weights, k=count)))
+        authors = []
+        for first, last in names:
+            name = f"{first} {last}"
+            if rng.random() < 0.03:
+                name += " " + rng.choice(AFFILIATIONS)
+            authors.append(name)
+        author_string = ", ".join(authors[:-1]) + " and " + authors[-1] if len(authors) > 1 else authors[0]
+
+        # Citations: earlier papers, half from the same primary category, the
+        # rest preferring papers that are already cited
+        citations = []
+        same = by_category.get(primary, [])
+        for _ in range(min(references[i], i)):
+            roll = rng.random()
+            if roll < 0.5 and same:
+                citations.append(same[rng.randrange(len(same))])
+            elif roll < 0.8 and cited:
+                citations.append(cited[rng.randrange(len(cited))])
+            else:
+                citations.append(rng.randrange(i))
+        citations = list(dict.fromkeys(citations))
+        cited.extend(citations)
+        by_category.setdefault(primary, array("i")).append(i)
+        ids.append(paper_id)
+
+        topic = primaries[i] * 17 % len(vocabulary)
+        words = vocabulary[topic:topic + 300] or vocabulary
+        created = date(year, month, 1) + timedelta(days=rng.randrange(28))
+        updated = created + timedelta(days=int(rng.expovariate(1 / 200)))
+        yield {
+            "id": paper_id,
+            "submitter": f"{names[0][0]} {names[0][1]}",
+            "authors": author_string,
+            "title": " ".join(rng.choices(words, k=rng.randint(6, 12))).capitalize(),
+            "comments": f"{rng.randint(4, 40)} pages, {rng.randint(0, 12)} figures",
+            "journal-ref": None,
+            "doi": None,
+            "report-no": None,
+            "categories": paper_categories,
+            "license": None,
+            "abstract": " ".join(rng.choices(words + vocabulary[:200], k=rng.randint(60, 150))) + ".",
+            "versions": [{"version": "v1", "created": created.strftime("%a, %d %b %Y 12:00:00 GMT")}],
+            "update_date": min(updated, date(2025, 12, 31)).isoformat(),
+            "authors_parsed": [[last, first, ""] for first, last in names],
+            "citations": [ids[c] for c in citations],
+        }
+
+
+def write_dataset(out_dir, n, seed=0, parts=30):
+    """Write n synthetic papers as every input the pipeline reads:
+
+        out_dir/metadata.json                      the snapshot, one JSON record per line (used/ingest.py)
+        out_dir/datafiles/metadata_part_*.json     the same, split in `parts` (used/breakingmeta.py layout)
+        out_dir/arxiv.csv, arxiv_paper_nodes.csv   the graph scripts' CSV columns
+        out_dir/arxiv_category_mapping_cs_fixed.csv
+
+    Returns the number of records written."""
+    os.makedirs(os.path.join(out_dir, "datafiles"), exist_ok=True)
+    per_part = max((n + parts - 1) // parts, 1)
+    snapshot = open(os.path.join(out_dir, "metadata.json"), "w", encoding="utf-8")
+    table = open(os.path.join(out_dir, "arxiv.csv"), "w", encoding="utf-8", newline="")
+    writer = csv.writer(table)
+    writer.writerow(CSV_COLUMNS)
+    part = None
+    try:
+        for i, record in enumerate(generate(n, seed)):
+            if i % per_part == 0:
+                if part:
+                    part.close()
+                part = open(os.path.join(out_dir, "datafiles", f"metadata_part_{i // per_part + 1}.json"),
+                            "w", encoding="utf-8")
+            line = json.dumps({k: v for k, v in record.items() if k != "citations"}) + "\n"
+            snapshot.write(line)
+            part.write(line)
+            writer.writerow([record["id"], record["title"], record["categories"], record["authors"],
+                             str(record["authors_parsed"]), str(record["citations"]), record["abstract"]])
+    finally:
+        for f in (snapshot, table, part):
+            if f:
+                f.close()
+
+    shutil.copyfile(os.path.join(out_dir, "arxiv.csv"), os.path.join(out_dir, "arxiv_paper_nodes.csv"))
+    shutil.copyfile(MAPPING_CSV, os.path.join(out_dir, "arxiv_category_mapping_cs_fixed.csv"))
+    return n
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic arXiv dataset")
+    parser.add_argument("records", type=int, help="number of papers")
+    parser.add_argument("--output", required=True, help="directory to write into")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--parts", type=int, default=30, help="metadata_part_*.json files")
+    args = parser.parse_args()
+    write_dataset(args.output, args.records, args.seed, args.parts)
+    print(f"✅ {args.records:,} synthetic papers written to {args.output}/")
@@ -0,0 +1,37 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from ann_index import AnnIndex, build_index
+
+
+class Store:
+    """The parts of embedding_store.EmbeddingStore build_index() reads."""
+
+    model_name = "test"
+
+    def __init__(self, vectors):
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+        self.dim = self.vectors.shape[1]
+        self.keys = {f"p{i}": (i,) for i in range(len(self.vectors))}
+
+    def matrix(self):
+        return self.vectors
+
+
+def test_rebuild_leaves_the_open_index_readable(tmp_path):
+    path = str(tmp_path / "ann")
+    rng = np.random.default_rng(0)
+    build_index(Store(rng.normal(size=(200, 8))), path)
+    opened = AnnIndex(path, mtime=None)
+    before = opened.similar("p0", k=5)
+
+    for _ in range(3):
+        build_index(Store(rng.normal(size=(300, 8))), path, rebuild=True)
+
+    assert opened.similar("p0", k=5) == before
+    assert len(AnnIndex(path, mtime=None).ids) == 300
+    # The current version and the one it replaced are kept
+    assert len([name for name in os.listdir(path) if name.startswith("v")]) == 2
@@ -0,0 +1,65 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from author_index import AuthorIndex, build_author_index, store_dir_for
+
+# Schrödinger is spelt with a TeX accent, in Unicode (twice) and in ASCII in
+# the plain `authors` column of a paper without `authors_parsed`
+PAPERS = [
+    ["0001.0001", "One", "", r"""[['Schr\\"odinger', 'Erwin', ''], ['Bohr', 'Niels', '']]"""],
+    ["0001.0002", "Two", "", "[['Schrödinger', 'Erwin', ''], ['Born', 'Max', '']]"],
+    ["0001.0003", "Three", "Erwin Schrodinger and Max Born (Gottingen)", None],
+    ["0001.0004", "Four", "", "[['Borel', 'Emile', ''], ['Born', 'Max', '']]"],
+    ["0001.0005", "Five", "", "[['Bose', 'Satyendra Nath', ''], ['Physics Department', '', '']]"],
+    ["0101.0001", "Six", "", "[['Schrödinger', 'Erwin', '']]"],
+    ["0001.0001", "One, again", "", "[['Fermi', 'Enrico', '']]"],
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    csv_path = str(tmp_path / "arxiv.csv")
+    pd.DataFrame(PAPERS, columns=["id", "title", "authors", "authors_parsed"]).to_csv(csv_path, index=False)
+    build_author_index(csv_path)
+    return AuthorIndex(store_dir_for(csv_path))
+
+
+def names(records):
+    return [record["name"] for record in records]
+
+
+def test_spellings_resolve_to_one_author(index):
+    assert len(index) == 5
+    author = index.find("Erwin Schrödinger")
+    for spelling in ('Erwin Schr\\"odinger', 'Erwin Schr\\"{o}dinger', "ERWIN SCHRODINGER", "erwin  schrödinger."):
+        assert index.find(spelling) == author
+    with pytest.raises(KeyError):
+        index.find("Enrico Fermi")  # only on the repeated row of 0001.0001
+
+    record = index.author("Erwin Schrodinger")
+    assert (record["name"], record["key"], record["paper_count"]) == ("Erwin Schrödinger", "erwin schrodinger", 4)
+    assert sorted(paper["id"] for paper in record["papers"]) == ["0001.0001", "0001.0002", "0001.0003", "0101.0001"]
+    assert record["papers"][0]["id"] == "0101.0001"  # newest first
+    assert [(c["name"], c["shared_papers"]) for c in record["coauthors"]] == [("Max Born", 2), ("Niels Bohr", 1)]
+
+
+def test_suggest_orders_by_paper_count_then_key(index):
+    assert names(index.suggest("bo")) == ["Max Born", "Emile Borel", "Niels Bohr", "Satyendra Nath Bose"]
+    assert [r["paper_count"] for r in index.suggest("bo")] == [3, 1, 1, 1]
+    assert names(index.suggest("bo", limit=2)) == ["Max Born", "Emile Borel"]
+    assert names(index.suggest("m bo")) == ["Max Born"]
+    assert names(index.suggest("Schrö")) == ["Erwin Schrödinger"]
+    assert index.suggest("") == []
+    assert index.suggest("department") == []
+
+
+def test_misspelt_queries_fall_back_to_trigrams(index):
+    assert names(index.suggest("shrodinger")) == ["Erwin Schrödinger"]
+    assert names(index.suggest("satyendra boss")) == ["Satyendra Nath Bose"]
+    assert index.suggest("heisenberg") == []
+    with pytest.raises(KeyError):
+        index.find("Erwin Shrodinger")
@@ -0,0 +1,92 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import category_graphs
+from category_graphs import CategoryGraphs, MetricsStore, build_metrics, store_dir_for
+
+# hep-th papers A..E (2015, 2015, 2016, 2016, 2016) and one cs.AI paper F:
+# A -> B, C -> A, C -> B, D -> C inside hep-th; C -> F and D -> F leave it;
+# E is isolated. In-degree over the whole graph: B and F 2, A and C 1.
+A, B, C, D, E, F = "1501.00001", "1501.00002", "1601.00001", "1601.00002", "1601.00003", "1701.00001"
+PAPERS = [
+    [A, "Paper A", "hep-th", f"['{B}']"],
+    [B, "Paper B", "hep-th", "[]"],
+    [C, "Paper C", "hep-th", f"['{A}', '{B}', '{F}']"],
+    [D, "Paper D", "hep-th math-ph", f"['{C}', '{F}']"],
+    [E, "Paper E", "hep-th", "[]"],
+    [F, "Paper F", "cs.AI", "[]"],
+]
+
+
+def write_csv(path, rows):
+    pd.DataFrame(rows, columns=["id", "title", "categories", "citations"]).to_csv(path, index=False)
+
+
+def ids(view):
+    return sorted(node["id"] for node in view["nodes"])
+
+
+def links(view):
+    return sorted((link["source"], link["target"]) for link in view["links"])
+
+
+@pytest.fixture
+def store(tmp_path):
+    csv_path = str(tmp_path / "arxiv.csv")
+    write_csv(csv_path, PAPERS)
+    build_metrics(csv_path)
+    return MetricsStore(store_dir_for(csv_path))
+
+
+def test_view_filters_and_refilters_links(store, monkeypatch):
+    view = store.view("hep-th")
+    assert ids(view) == [A, B, C, D, E]
+    assert links(view) == [(A, B), (C, A), (C, B), (D, C)]
+    node = next(node for node in view["nodes"] if node["id"] == D)
+    assert (node["title"], node["year"], node["in_degree"], node["out_degree"]) == ("Paper D", 2016, 0, 2)
+
+    view = store.view("hep-th", years=(2016, 2016))
+    assert ids(view) == [C, D, E]
+    assert links(view) == [(D, C)]
+
+    view = store.view("hep-th", min_degree=1)
+    assert ids(view) == [A, B, C, D]
+    assert links(view) == [(A, B), (C, A), (C, B), (D, C)]
+
+    # Ties keep paper order, so A beats C; links to dropped papers go too
+    view = store.view("hep-th", top=2, metric="in_degree")
+    assert ids(view) == [A, B]
+    assert links(view) == [(A, B)]
+
+    monkeypatch.setattr(category_graphs, "MAX_VIEW_NODES", 3)
+    for top in (None, 10):
+        view = store.view("hep-th", top=top, metric="in_degree")
+        assert ids(view) == [A, B, C]
+        assert links(view) == [(A, B), (C, A), (C, B)]
+
+    assert ids(store.view("math-ph")) == [D]
+    with pytest.raises(KeyError):
+        store.view("astro-ph")
+
+
+def test_rebuild_reopens_store(tmp_path):
+    csv_path = str(tmp_path / "arxiv.csv")
+    write_csv(csv_path, PAPERS)
+    build_metrics(csv_path)
+    graphs = CategoryGraphs(csv_path)
+    opened = graphs.store()
+    assert links(graphs.view("cs.AI")) == []
+    assert graphs.view("cs.AI") is graphs.view("cs.AI")
+
+    write_csv(csv_path, PAPERS[:-1] + [[F, "Paper F", "cs.AI hep-th", f"['{E}']"]])
+    build_metrics(csv_path)
+
+    assert graphs.store() is not opened
+    assert links(graphs.view("cs.AI")) == []
+    assert links(graphs.view("hep-th", years=(2016, 2017))) == [(C, F), (D, C), (D, F), (F, E)]
+    # The replaced store stays readable for whoever still holds it
+    assert ids(opened.view("hep-th", years=(2016, 2016))) == [C, D, E]
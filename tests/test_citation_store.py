@@ -0,0 +1,35 @@
+import os
+import sys
+import threading
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import citation_store
+from citation_store import CitationStore, load_citation_store, store_dir_for
+
+
+def write_csv(path, rows):
+    pd.DataFrame(rows, columns=["id", "citations"]).to_csv(path, index=False)
+
+
+def test_concurrent_loads_compile_once_and_recompiles_keep_open_stores(tmp_path, monkeypatch):
+    csv_path = str(tmp_path / "arxiv.csv")
+    write_csv(csv_path, [["1", "['2', '3']"], ["2", "['3']"], ["3", "[]"]])
+
+    compiles = []
+    compile_citations = citation_store.compile_citations
+    monkeypatch.setattr(citation_store, "compile_citations",
+                        lambda *args: compiles.append(1) or compile_citations(*args))
+    threads = [threading.Thread(target=load_citation_store, args=(csv_path,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(compiles) == 1
+
+    opened = CitationStore(store_dir_for(csv_path))
+    for extra in range(3):
+        write_csv(csv_path, [["1", "['2']"], ["2", "['1']"], ["3", "[]"], [str(4 + extra), "['1']"]])
+        assert load_citation_store(csv_path).meta["citations"] == 3
+    assert opened.cited(0).tolist() == [1, 2]
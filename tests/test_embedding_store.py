@@ -0,0 +1,31 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from embedding_store import EmbeddingStore
+
+
+def test_opening_never_writes_and_the_writer_drops_torn_rows(tmp_path):
+    path = str(tmp_path / "embeddings")
+    store = EmbeddingStore(path)
+    store.add(["1", "2"], ["a", "b"], np.ones((2, 4)))
+
+    # An interrupted append: bytes and keys past meta.json's count
+    with open(os.path.join(path, "vectors.bin"), "ab") as f:
+        f.write(b"\0" * 5)
+    with open(os.path.join(path, "keys.tsv"), "a", encoding="utf-8") as f:
+        f.write("3\tdeadbeef\n4\tfe")
+    files = {name: os.stat(os.path.join(path, name)).st_mtime_ns for name in os.listdir(path)}
+
+    reader = EmbeddingStore(path)
+    assert sorted(reader.keys) == ["1", "2"]
+    assert reader.matrix().shape == (2, 4)
+    assert {name: os.stat(os.path.join(path, name)).st_mtime_ns for name in os.listdir(path)} == files
+
+    reader.add(["5"], ["c"], np.full((1, 4), 2.0))
+    reopened = EmbeddingStore(path)
+    assert sorted(reopened.keys) == ["1", "2", "5"]
+    assert reopened.vectors(reopened.rows(["5"])).tolist() == [[2.0] * 4]
+    assert os.path.getsize(os.path.join(path, "vectors.bin")) == 3 * 4 * 2
@@ -0,0 +1,35 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from graph_cache import GraphCache
+
+
+def test_builds_once_per_key_without_blocking_others_and_bounds_the_disk(tmp_path):
+    csv_path = tmp_path / "arxiv.csv"
+    csv_path.write_text("id,title\n1,a\n2,b\n")
+    cache = GraphCache(str(csv_path), cache_dir=str(tmp_path / "cache"), max_items=2, max_disk_items=3)
+    calls = []
+
+    def build(df, n):
+        calls.append(n)
+        if n == 0:
+            time.sleep(0.5)
+        return {"n": n, "rows": len(df)}
+
+    threads = [threading.Thread(target=cache.get, args=("graph", build), kwargs={"n": 0}) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    start = time.perf_counter()
+    cache.get("graph", build, n=1)
+    assert time.perf_counter() - start < 0.3  # not queued behind the slow build
+    for thread in threads:
+        thread.join()
+    assert sorted(calls) == [0, 1]
+
+    for n in range(2, 10):
+        cache.get("graph", build, n=n)
+    assert len(os.listdir(tmp_path / "cache")) == 3
@@ -0,0 +1,55 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "used"))
+from arxiv_meta import CLEAN_FIELDS
+from ingest import update_category_shard
+from paper_shards import ShardReader, ShardWriter
+
+
+def paper(paper_id, title, categories="hep-th"):
+    return {"id": paper_id, "submitter": None, "authors": "A. Author", "title": title,
+            "categories": categories, "abstract": "", "update_date": "2020-01-01"}
+
+
+def write_delta(path, papers):
+    with open(path, "w", encoding="utf-8") as f:
+        for p in papers:
+            f.write(json.dumps(p) + "\n")
+
+
+@pytest.fixture
+def shard(tmp_path):
+    path = str(tmp_path / "physics")
+    with ShardWriter(path, CLEAN_FIELDS) as writer:
+        for paper_id in ("1", "2", "3"):
+            writer.append(paper(paper_id, f"Paper {paper_id}"))
+    return path
+
+
+def test_update_leaves_open_readers_on_the_old_version(shard, tmp_path):
+    delta = str(tmp_path / "delta.jsonl")
+    write_delta(delta, [paper("2", "Paper 2, revised"), paper("4", "Paper 4"), paper("5", "Other", "cs.AI")])
+    reader = ShardReader(shard)
+
+    update_category_shard(shard, "physics", {"2"}, delta)
+
+    assert reader.page(0, 3, ["id", "title"]) == [
+        {"id": "1", "title": "Paper 1"}, {"id": "2", "title": "Paper 2"}, {"id": "3", "title": "Paper 3"}]
+    assert ShardReader(shard).page(0, 5, ["id", "title"]) == [
+        {"id": "1", "title": "Paper 1"}, {"id": "3", "title": "Paper 3"},
+        {"id": "2", "title": "Paper 2, revised"}, {"id": "4", "title": "Paper 4"}]
+
+
+def test_failed_update_publishes_nothing(shard, tmp_path):
+    delta = str(tmp_path / "delta.jsonl")
+    write_delta(delta, [paper("4", "Paper 4"), {"id": "5"}])
+
+    with pytest.raises(KeyError):
+        update_category_shard(shard, "physics", {"2"}, delta)
+
+    assert list(ShardReader(shard).iter_column("id")) == ["1", "2", "3"]
@@ -0,0 +1,28 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from metrics import Registry
+
+
+def requests_counted(registry):
+    text = registry.render()
+    return sum(int(line.rsplit(" ", 1)[1]) for line in text.splitlines()
+               if line.startswith("findmypaper_cache_requests_total{"))
+
+
+def test_totals_survive_a_worker_exit_and_a_restart_clears_them(tmp_path):
+    share_dir = str(tmp_path)
+    master, worker = Registry(share_dir), Registry(share_dir)
+    worker._file = "999999-1.json"  # as if forked: another pid
+    worker.inc("findmypaper_cache_requests_total", 3, cache="graph", result="hit")
+    master.inc("findmypaper_cache_requests_total", cache="graph", result="build")
+    worker.publish()
+    assert requests_counted(master) == 4
+
+    master.retire(999999)
+    assert sorted(os.listdir(share_dir)) == ["retired.json"]
+    assert requests_counted(master) == 4
+
+    master.clear_shared()
+    assert requests_counted(Registry(share_dir)) == 1
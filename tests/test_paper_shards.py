@@ -0,0 +1,46 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from paper_shards import ShardReader, ShardWriter
+
+
+def write(path, ids):
+    with ShardWriter(path, ["id", "title"]) as writer:
+        for paper_id in ids:
+            writer.append({"id": paper_id, "title": f"Paper {paper_id}"})
+
+
+def test_failed_write_leaves_previous_shard_in_place(tmp_path):
+    path = str(tmp_path / "shard")
+    write(path, ["1", "2"])
+
+    with pytest.raises(RuntimeError):
+        with ShardWriter(path, ["id"]) as writer:
+            writer.append({"id": "3"})
+            raise RuntimeError("interrupted")
+
+    reader = ShardReader(path)
+    assert len(reader) == 2
+    assert list(reader.iter_column("id")) == ["1", "2"]
+    assert sorted(os.listdir(path)) == ["meta.json", os.path.basename(reader.data)]
+
+
+def test_open_reader_keeps_its_version_through_rewrites(tmp_path):
+    path = str(tmp_path / "shard")
+    write(path, ["1", "2", "3"])
+    reader = ShardReader(path)
+
+    # Rewrites that shrink the shard, reading from the old version as they go
+    # (used/ingest.py does this), then several more so the version is pruned
+    with ShardWriter(path, ["id", "title"]) as writer:
+        writer.extend(path)
+    for ids in (["9"], ["8", "7"], ["6"]):
+        write(path, ids)
+
+    assert len(reader) == 3
+    assert reader.page(0, 3, ["title"]) == [{"title": "Paper 1"}, {"title": "Paper 2"}, {"title": "Paper 3"}]
+    assert reader.rows([2], ["id"]) == [{"id": "3"}]
+    assert ShardReader(path).page(0, 5) == [{"id": "6", "title": "Paper 6"}]
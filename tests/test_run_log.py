@@ -0,0 +1,35 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+SCRIPT = """
+import sys
+sys.path.insert(0, {root!r})
+import run_log
+run = run_log.start("stage")
+run.rows = 3
+{body}
+"""
+
+
+@pytest.mark.parametrize("body, code, status", [
+    ("pass", 0, "ok"),
+    ("run.status = 'skipped'\nsys.exit(0)", 0, "skipped"),
+    ("sys.exit(2)", 2, "error: exit 2"),
+    ("sys.exit('no input')", 1, "error: exit 1"),
+    ("raise ValueError('bad row')", 1, "error: ValueError"),
+])
+def test_status_follows_how_the_stage_exited(tmp_path, body, code, status):
+    script = tmp_path / "stage.py"
+    script.write_text(SCRIPT.format(root=ROOT, body=body), encoding="utf-8")
+    result = subprocess.run([sys.executable, str(script)], cwd=tmp_path, capture_output=True)
+
+    assert result.returncode == code
+    with open(tmp_path / "pipeline_runs.jsonl", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert [(r["stage"], r["status"], r["rows"]) for r in records] == [("stage", status, 3)]
@@ -0,0 +1,56 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from category_store import CategoryStore
+from paper_shards import ShardWriter
+
+PAPERS = [
+    {"id": "1", "title": "Quantum graph theory", "authors": "Ada Lovelace", "abstract": "Spectra of operators."},
+    {"id": "2", "title": "Sphere packings", "authors": "Alan Turing", "abstract": "Dense lattices in high dimension."},
+    {"id": "3", "title": "Graph colouring", "authors": "Ada Byron", "abstract": "Quantum bounds on chromatic numbers."},
+]
+QUERIES = [
+    {"title": "quantum"},
+    {"title": "lattices"},
+    {"q": "graph"},
+    {"author": "ada"},
+    {"abstract": "quantum"},
+]
+
+
+def search(store, category, queries):
+    total, hits = store.get(category).search_index().search(queries)
+    return total, [doc_id for doc_id, _ in hits]
+
+
+def test_json_and_shard_categories_search_alike(tmp_path):
+    with open(tmp_path / "legacy.json", "w", encoding="utf-8") as f:
+        json.dump({"nodes": PAPERS}, f)
+    with ShardWriter(str(tmp_path / "sharded"), ["id", "title", "authors", "abstract"]) as writer:
+        for paper in PAPERS:
+            writer.append(paper)
+
+    store = CategoryStore(str(tmp_path), {"legacy": "legacy.json", "sharded": "sharded.json"})
+    for queries in QUERIES:
+        assert search(store, "legacy", queries) == search(store, "sharded", queries), queries
+
+    assert search(store, "legacy", {"title": "quantum"}) == (1, [0])
+    assert search(store, "legacy", {"title": "lattices"}) == (0, [])
+    total, hits = search(store, "legacy", {"q": "graph"})
+    assert (total, sorted(hits)) == (2, [0, 2])
+
+
+def test_paging_through_tied_scores_returns_every_hit_once():
+    from search_index import SearchIndex
+
+    papers = [{"title": f"graph {i}", "authors": "", "abstract": ""} for i in range(1000)]
+    index = SearchIndex.from_papers(papers)
+    for limit in (7, 50):
+        seen = []
+        for offset in range(0, 1000, limit):
+            total, hits = index.search({"title": "graph"}, offset=offset, limit=limit)
+            seen += [doc_id for doc_id, _ in hits]
+        assert total == 1000
+        assert seen == list(range(1000))
@@ -0,0 +1,197 @@
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import platform
+import subprocess
+import importlib.util
+
+
+# Time the pipeline end to end on synthetic data (see synthetic_arxiv.py) at
+# one or more sizes and write the results as JSON, one entry per size and
+# stage: wall seconds, peak RSS and rows/sec. Each stage runs as its own
+# process inside <workdir>/<size>/, the directory layout the scripts expect.
+#
+#   python used/benchmark_pipeline.py --sizes 10k,100k --output bench.json
+#   python used/benchmark_pipeline.py --compare before.json after.json
+#
+# Peak RSS is the largest single process of the stage (the script or one of
+# its shard workers), as reported by wait4(). Run with the same --workers
+# and --seed on both sides of a comparison.
+
+USED_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# name -> (script, extra arguments); {workers} is filled in
+STAGES = {
+    "clean": ("cleandata.py", ["--workers", "{workers}"]),
+    "split": ("split_by_category.py", ["--workers", "{workers}"]),
+    "counts": ("generate_category_counts.py", ["--workers", "{workers}"]),
+    "subfield_level": ("create_subfield_level.py", ["--force"]),
+    "author_paper_graph": ("generate_author_paper_graph.py", ["arxiv.csv", "--force"]),
+    "coauthor_graph": ("generate_coauthor_graph.py", ["arxiv.csv", "--force", "--workers", "{workers}"]),
+    "semantic_clusters": ("create_semantic_clusters.py", ["--force", "--workers", "{workers}"]),
+}
+# Stages that cannot run without an optional package
+REQUIRES = {"semantic_clusters": "sentence_transformers"}
+
+
+def parse_size(text):
+    """10000, 10k or 2m -> records."""
+    text = text.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+
+def run(command, cwd, log_path, timeout):
+    """Run command to completion; returns (status, seconds, peak RSS in MB).
+    Output goes to log_path. On timeout the whole process group is killed."""
+    with open(log_path, "w", encoding="utf-8") as log:
+        start = time.perf_counter()
+        proc = subprocess.Popen(command, cwd=cwd, stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+        deadline = start + timeout if timeout else None
+        while True:
+            pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+            if pid:
+                break
+            if deadline and time.perf_counter() > deadline:
+                os.killpg(proc.pid, signal.SIGKILL)
+                pid, status, usage = os.wait4(proc.pid, 0)
+                proc.returncode = -signal.SIGKILL
+                return "timeout", time.perf_counter() - start, usage.ru_maxrss / 1024
+            time.sleep(0.05)
+        seconds = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return ("ok" if proc.returncode == 0 else f"exit {proc.returncode}"), seconds, usage.ru_maxrss / 1024
+
+
+def prepare(size, seed, workdir):
+    """<workdir>/<size>/ with a synthetic dataset of that size, reused if an
+    earlier run already wrote the same one. Returns (dir, generate result or None)."""
+    data_dir = os.path.join(workdir, str(size))
+    marker = os.path.join(data_dir, "synthetic.json")
+    if os.path.isfile(marker):
+        with open(marker, encoding="utf-8") as f:
+            if json.load(f) == {"records": size, "seed": seed}:
+                return data_dir, None
+
+    os.makedirs(data_dir, exist_ok=True)
+    command = [sys.executable, os.path.join(USED_DIR, "..", "synthetic_arxiv.py"), str(size),
+               "--output", ".", "--seed", str(seed)]
+    result = run(command, data_dir, os.path.join(data_dir, "generate.log"), None)
+    if result[0] == "ok":
+        with open(marker, "w", encoding="utf-8") as f:
+            json.dump({"records": size, "seed": seed}, f)
+    return data_dir, result
+
+
+def entry(size, stage, status, seconds=None, peak_rss_mb=None):
+    return {
+        "size": size,
+        "stage": stage,
+        "status": status,
+        "seconds": round(seconds, 3) if seconds is not None else None,
+        "peak_rss_mb": round(peak_rss_mb, 1) if peak_rss_mb is not None else None,
+        "rows_per_sec": round(size / seconds, 1) if status == "ok" and seconds else None,
+    }
+
+
+def benchmark(sizes, stages, seed, workdir, workers, timeout):
+    results = []
+    for size in sizes:
+        data_dir, generated = prepare(size, seed, workdir)
+        if generated:
+            results.append(entry(size, "generate", *generated))
+            print(f"📥 {size:,} records generated in {generated[1]:.1f}s")
+            if generated[0] != "ok":
+                continue
+
+        for stage in stages:
+            script, extra = STAGES[stage]
+            if stage in REQUIRES and importlib.util.find_spec(REQUIRES[stage]) is None:
+                results.append(entry(size, stage, f"skipped: {REQUIRES[stage]} not installed"))
+                print(f"   {stage}: skipped ({REQUIRES[stage]} not installed)")
+                continue
+            command = [sys.executable, os.path.join(USED_DIR, script)]
+            command += [arg.format(workers=workers) for arg in extra]
+            status, seconds, peak = run(command, data_dir, os.path.join(data_dir, f"{stage}.log"), timeout)
+            results.append(entry(size, stage, status, seconds, peak))
+            print(f"   {stage}: {status}, {seconds:.1f}s, {peak:,.0f} MB peak")
+    return results
+
+
+def current_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=USED_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old_path, new_path, tolerance):
+    """Print old vs new seconds and peak RSS for every (size, stage) in
+    both files; returns the number of regressions beyond tolerance."""
+    with open(old_path, encoding="utf-8") as f:
+        old = {(r["size"], r["stage"]): r for r in json.load(f)["results"]}
+    with open(new_path, encoding="utf-8") as f:
+        new = {(r["size"], r["stage"]): r for r in json.load(f)["results"]}
+
+    regressions = 0
+    print(f"{'size':>9}  {'stage':<20} {'seconds':>19} {'peak MB':>19}")
+    for key in sorted(old.keys() & new.keys()):
+        a, b = old[key], new[key]
+        if a["status"] != "ok" or b["status"] != "ok":
+            print(f"{key[0]:>9,}  {key[1]:<20} {a['status']} -> {b['status']}")
+            regressions += a["status"] == "ok"
+            continue
+        flags = []
+        for field in ("seconds", "peak_rss_mb"):
+            if b[field] > a[field] * (1 + tolerance):
+                flags.append(field)
+        regressions += bool(flags)
+        print(f"{key[0]:>9,}  {key[1]:<20} {a['seconds']:>8.2f} -> {b['seconds']:>8.2f} "
+              f"{a['peak_rss_mb']:>8.0f} -> {b['peak_rss_mb']:>8.0f}"
+              + ("  ❌ " + ", ".join(flags) if flags else ""))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic arXiv data")
+    parser.add_argument("--sizes", default="10k", help="comma-separated record counts, e.g. 10k,100k,1m")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"comma-separated subset of {','.join(STAGES)}")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default="bench_data", help="datasets and stage outputs go here, one directory per size")
+    parser.add_argument("--workers", type=int, default=1, help="--workers passed to every stage")
+    parser.add_argument("--timeout", type=float, default=None, help="seconds before a stage is killed")
+    parser.add_argument("--output", default="benchmark.json", help="results file")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two results files instead")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="slowdown or memory growth counted as a regression (default 0.2 = 20%%)")
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare(*args.compare, args.tolerance)
+        print(f"{'❌' if regressions else '✅'} {regressions} regression(s) beyond {args.tolerance:.0%}")
+        sys.exit(1 if regressions else 0)
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)}")
+    sizes = [parse_size(size) for size in args.sizes.split(",")]
+
+    results = benchmark(sizes, stages, args.seed, os.path.abspath(args.workdir), args.workers, args.timeout)
+    report = {
+        "commit": current_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "workers": args.workers,
+        "seed": args.seed,
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ {len(results)} measurements written to {args.output}")
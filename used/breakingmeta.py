@@ -1,32 +1,45 @@
 import os
+import sys
 import json
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import run_log
+
 # Parameters
 input_path = "metadata.json"  # The original file
 output_dir = "datafiles"      # Output folder
 num_files = 30                # Number of output files
 
+run = run_log.start("split_snapshot")
+
 # Create the output directory if it doesn't exist
 os.makedirs(output_dir, exist_ok=True)
 
-# First, count total lines (records)
+# First, count total lines (records) without holding them in memory
+total_lines = 0
+with open(input_path, 'rb') as f:
+    for block in iter(lambda: f.read(1 << 20), b''):
+        total_lines += block.count(b'\n')
+
+chunk_size = max((total_lines + num_files - 1) // num_files, 1)  # Round up division
+
+# Split and save, streaming line by line
+f_out = None
 with open(input_path, 'r', encoding='utf-8') as f:
-    lines = f.readlines()
-
-total_lines = len(lines)
-chunk_size = (total_lines + num_files - 1) // num_files  # Round up division
-
-# Split and save
-for i in range(num_files):
-    chunk = lines[i * chunk_size : (i + 1) * chunk_size]
-    output_path = os.path.join(output_dir, f"metadata_part_{i+1}.json")
-    
-    with open(output_path, 'w', encoding='utf-8') as f_out:
-        for line in chunk:
-            try:
-                json_obj = json.loads(line)  # Validate JSON
-                f_out.write(json.dumps(json_obj) + '\n')
-            except json.JSONDecodeError:
-                continue  # Skip invalid JSON lines
+    for line_no, line in enumerate(f):
+        if line_no % chunk_size == 0:
+            if f_out:
+                f_out.close()
+            output_path = os.path.join(output_dir, f"metadata_part_{line_no // chunk_size + 1}.json")
+            f_out = open(output_path, 'w', encoding='utf-8')
+        try:
+            json_obj = json.loads(line)  # Validate JSON
+            f_out.write(json.dumps(json_obj) + '\n')
+        except json.JSONDecodeError:
+            continue  # Skip invalid JSON lines
+
+if f_out:
+    f_out.close()
+run.rows = total_lines
 
 print(f"Done. {num_files} files saved in the '{output_dir}' directory.")
@@ -0,0 +1,41 @@
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import run_log
+from pipeline_manifest import Manifest
+from embedding_store import EmbeddingStore, DEFAULT_MODEL, STORE_PATH
+from ann_index import build_index
+
+# Index the embedding store (filled by used/embed_papers.py) for
+# /api/paper/<id>/similar; see ann_index.py. Reruns only place new or
+# re-embedded papers into the existing lists; --rebuild retrains them.
+parser = argparse.ArgumentParser(description="Build the nearest-neighbour index over abstract embeddings")
+parser.add_argument("--store", default=STORE_PATH, help="embedding store directory")
+parser.add_argument("--model", default=DEFAULT_MODEL, help="model the store was filled with")
+parser.add_argument("--output", default="ann_index", help="index directory")
+parser.add_argument("--rebuild", action="store_true", help="retrain the centroids and reassign every paper")
+args = parser.parse_args()
+
+store_meta = os.path.join(args.store, "meta.json")
+if not os.path.exists(store_meta):
+    sys.exit(f"❌ No embedding store at {args.store}/; run used/embed_papers.py first")
+
+stage = f"ann_index:{args.output}"
+run = run_log.start(stage)
+manifest = Manifest()
+if not args.rebuild and manifest.is_current(stage, [store_meta]):
+    print("✅ Embeddings unchanged since the last run; nothing to do.")
+    run.status = "skipped"
+    sys.exit(0)
+
+store = EmbeddingStore(args.store, args.model)
+print(f"⚙️ Indexing {len(store):,} papers...")
+start = time.time()
+meta = build_index(store, args.output, rebuild=args.rebuild)
+manifest.mark_done(stage, [store_meta], meta)
+run.rows = meta["papers"]
+print(f"✅ {meta['papers']:,} papers in {meta['nlist']:,} lists ({meta['assigned']:,} assigned) "
+      f"in {time.time() - start:.1f}s -> {args.output}/")
@@ -0,0 +1,35 @@
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import run_log
+from pipeline_manifest import Manifest
+from author_index import build_author_index, store_dir_for
+
+# Normalise and deduplicate the authors of a papers CSV into integer ids,
+# with paper<->author mappings and a name index for /api/author/<name> and
+# /api/authors/autocomplete; see author_index.py.
+parser = argparse.ArgumentParser(description="Build the author table and name index for a papers CSV")
+parser.add_argument("csv", nargs="?", default="datafiles/arxiv.csv", help="papers CSV")
+parser.add_argument("--output", default=None, help="index directory (default: <csv stem>_authors/)")
+parser.add_argument("--force", action="store_true", help="rebuild even if the CSV is unchanged")
+args = parser.parse_args()
+
+output = args.output or store_dir_for(args.csv)
+stage = f"author_index:{output}"
+run = run_log.start(stage)
+manifest = Manifest()
+if not args.force and manifest.is_current(stage, [args.csv]):
+    print("✅ Inputs unchanged since the last run; nothing to do.")
+    run.status = "skipped"
+    sys.exit(0)
+
+print(f"⚙️ Indexing the authors of {args.csv}...")
+start = time.time()
+meta = build_author_index(args.csv, output)
+manifest.mark_done(stage, [args.csv], meta)
+run.rows = meta["papers"]
+print(f"✅ {meta['authors']:,} authors over {meta['papers']:,} papers ({meta['authorships']:,} authorships) "
+      f"in {time.time() - start:.1f}s -> {output}/")
@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+import argparse
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import run_log
+from pipeline_manifest import Manifest
+from category_graphs import METRICS, MetricsStore, build_metrics, is_current, store_dir_for
+from shard_runner import add_workers_argument, run_shards
+
+# Compute the shared metrics store for a papers CSV (see category_graphs.py),
+# which /api/category_graph/<category> filters on demand, and regenerate
+# categories_graphs/<category>_{papers,edges}.csv from it for every category.
+# Categories are written in parallel (--workers).
+
+_stores = {}
+
+
+def write_category(job):
+    """Write one category's papers and edges CSVs; returns (category, papers, links)."""
+    category, store_dir, output = job
+    store = _stores.get(store_dir)
+    if store is None:
+        store = _stores[store_dir] = MetricsStore(store_dir)
+    graph = store.view(category)
+
+    columns = ["id", "title", *METRICS]
+    pd.DataFrame(graph["nodes"], columns=[*columns, "year"])[columns].to_csv(
+        os.path.join(output, f"{category}_papers.csv"), index=False)
+    pd.DataFrame(graph["links"], columns=["source", "target"]).to_csv(
+        os.path.join(output, f"{category}_edges.csv"), index=False)
+    return category, len(graph["nodes"]), len(graph["links"])
+
+
+def report(results):
+    results = list(results)
+    print(f"   {sum(r[1] for r in results):,} papers and {sum(r[2] for r in results):,} links "
+          f"over {len(results)} categories")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the metrics store and per-category citation graph CSVs")
+    parser.add_argument("csv", nargs="?", default="datafiles/arxiv.csv", help="papers CSV")
+    parser.add_argument("--output", default="categories_graphs", help="directory for the per-category CSVs")
+    parser.add_argument("--betweenness-samples", type=int, default=256,
+                        help="BFS pivots for the betweenness estimate")
+    parser.add_argument("--force", action="store_true", help="recompute the metrics and rewrite every category")
+    add_workers_argument(parser)
+    args = parser.parse_args()
+
+    stage = f"category_graphs:{args.output}"
+    run = run_log.start(stage)
+    manifest = Manifest()
+    if not args.force and manifest.is_current(stage, [args.csv]):
+        print("✅ Inputs unchanged since the last run; nothing to do.")
+        run.status = "skipped"
+        sys.exit(0)
+
+    store_dir = store_dir_for(args.csv)
+    start = time.time()
+    if args.force or not is_current(args.csv, store_dir):
+        print(f"⚙️ Computing metrics for {args.csv}...")
+        meta = build_metrics(args.csv, store_dir, args.betweenness_samples)
+        print(f"   {meta['papers']:,} papers, {meta['links']:,} links in {time.time() - start:.1f}s")
+
+    metrics_store = MetricsStore(store_dir)
+    categories = metrics_store.meta["categories"]
+    run.rows = metrics_store.meta["papers"]
+    os.makedirs(args.output, exist_ok=True)
+    print(f"⚙️ Writing {len(categories)} categories...")
+    run_shards(write_category, [(category, store_dir, args.output) for category in categories],
+               report, args.workers)
+
+    manifest.mark_done(stage, [args.csv], {"categories": len(categories)})
+    print(f"✅ Category graphs regenerated in {time.time() - start:.1f}s -> {args.output}/")
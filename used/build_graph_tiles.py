@@ -0,0 +1,71 @@
+import json
+import os
+import re
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import run_log
+from pipeline_manifest import Manifest
+from graph_metrics import Graph, pagerank
+from graph_layout import multilevel_layout
+from graph_store import write_graph
+
+# Lay out a {"nodes", "links"} graph file offline and store it tiled for
+# /api/graph/<name>/tiles (see graph_store.py), so the browser only ever
+# receives the nodes visible at its current zoom.
+parser = argparse.ArgumentParser(description="Build the level-of-detail tile store for a graph JSON file")
+parser.add_argument("graph", nargs="?", default="author_paper_graph_final.json", help="graph JSON file")
+parser.add_argument("--name", default=None,
+                    help="name served under /api/graph/<name> (default: file name without "
+                         "_graph/_final, so author_paper_graph_final.json is author_paper)")
+parser.add_argument("--output", default="graph_store", help="store root directory")
+parser.add_argument("--per-tile", type=int, default=200, help="nodes drawn per tile at each zoom level")
+parser.add_argument("--iterations", type=int, default=200, help="layout iterations on the coarsest level")
+parser.add_argument("--force", action="store_true", help="rebuild even if the graph file is unchanged")
+args = parser.parse_args()
+
+# The page and used/pagerank.py ask for the graph by this name
+name = args.name or re.sub(r"(_graph)?(_final)?$", "", os.path.splitext(os.path.basename(args.graph))[0])
+stage = f"graph_tiles:{name}"
+run = run_log.start(stage)
+manifest = Manifest()
+if not args.force and manifest.is_current(stage, [args.graph]):
+    print("✅ Inputs unchanged since the last run; nothing to do.")
+    run.status = "skipped"
+    sys.exit(0)
+
+print(f"📥 Loading {args.graph}...")
+with open(args.graph, encoding="utf-8") as f:
+    data = json.load(f)
+nodes = data["nodes"]
+index = {node["id"]: i for i, node in enumerate(nodes)}
+links = [(index[l["source"]], index[l["target"]]) for l in data["links"]
+         if l["source"] in index and l["target"] in index]
+sources = np.array([s for s, _ in links], dtype=np.int64)
+targets = np.array([t for _, t in links], dtype=np.int64)
+graph = Graph(len(nodes), sources, targets, directed=False)
+
+if all("pagerank" in node for node in nodes):
+    ranks = np.array([node["pagerank"] for node in nodes], dtype=float)
+else:
+    print("⚙️ Calculating PageRank...")
+    ranks = pagerank(graph)
+
+if all("x" in node and "y" in node for node in nodes):
+    positions = np.array([[node["x"], node["y"]] for node in nodes], dtype=float)
+else:
+    print(f"⚙️ Laying out {graph.n:,} nodes...")
+    start = time.time()
+    positions = multilevel_layout(graph, iterations=args.iterations)
+    print(f"   done in {time.time() - start:.1f}s")
+
+meta = write_graph(os.path.join(args.output, name), nodes, sources, targets, positions, ranks,
+                   per_tile=args.per_tile)
+manifest.mark_done(stage, [args.graph], meta)
+run.rows = meta["nodes"]
+print(f"✅ Stored {meta['nodes']:,} nodes / {meta['links']:,} links in {args.output}/{name}/ "
+      f"({meta['max_zoom']} zoom levels)")
@@ -1,35 +1,39 @@
 import os
+import sys
 import json
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from arxiv_meta import clean_record, iter_records
+import run_log
+from shard_runner import add_workers_argument, run_shards, shard_paths
 
 # Input and output directories
 input_dir = "datafiles"
 output_dir = "datafiles_cleaned"
-os.makedirs(output_dir, exist_ok=True)
-
-# Fields to keep, including update_date
-fields_to_keep = ["id", "submitter", "authors", "title", "categories", "abstract", "update_date"]
-
-# Loop through each metadata_part_*.json file
-for filename in os.listdir(input_dir):
-    if filename.startswith("metadata_part_") and filename.endswith(".json"):
-        input_path = os.path.join(input_dir, filename)
-        output_path = os.path.join(output_dir, filename)
-
-        cleaned_nodes = []
-
-        with open(input_path, "r", encoding="utf-8") as infile:
-            for line in infile:
-                try:
-                    record = json.loads(line)
-                    cleaned = {field: record.get(field, "") for field in fields_to_keep}
-                    if isinstance(cleaned["abstract"], str):
-                        cleaned["abstract"] = cleaned["abstract"].strip()
-                    cleaned_nodes.append(cleaned)
-                except json.JSONDecodeError:
-                    continue  # skip malformed lines
-
-        # Save cleaned records in required format
-        with open(output_path, "w", encoding="utf-8") as outfile:
-            json.dump({"nodes": cleaned_nodes}, outfile, indent=2)
-
-print("✅ All files cleaned and saved to 'datafiles_cleaned/'")
\ No newline at end of file
+
+
+def clean_shard(input_path):
+    """Clean one metadata_part_*.json file; returns the number of records."""
+    output_path = os.path.join(output_dir, os.path.basename(input_path))
+    count = 0
+
+    # Cleaned records are streamed out as JSON lines, one record per line
+    with open(output_path, "w", encoding="utf-8") as outfile:
+        for record in iter_records(input_path):
+            outfile.write(json.dumps(clean_record(record)) + "\n")
+            count += 1
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clean the metadata_part_*.json shards")
+    add_workers_argument(parser)
+    args = parser.parse_args()
+    run = run_log.start("clean")
+
+    os.makedirs(output_dir, exist_ok=True)
+    total = run_shards(clean_shard, shard_paths(input_dir), sum, args.workers)
+    run.rows = total
+
+    print(f"✅ All files cleaned ({total:,} records) and saved to 'datafiles_cleaned/'")
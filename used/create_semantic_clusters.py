@@ -1,40 +1,66 @@
 import pandas as pd
-import networkx as nx
+import numpy as np
 import os
-from collections import defaultdict, Counter
-from sklearn.cluster import KMeans
+import sys
+import argparse
+from collections import defaultdict
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sentence_transformers import SentenceTransformer
-
-# Load model
-model = SentenceTransformer("all-MiniLM-L6-v2")  # light and fast
-
-# Load data
-df = pd.read_csv("arxiv_paper_nodes.csv")
-df = df.drop_duplicates(subset="id")
-df["categories"] = df["categories"].fillna("").apply(lambda x: x.strip().split())
-
-# Build category → paper_id mapping
-category_papers = defaultdict(set)
-for _, row in df.iterrows():
-    for cat in row["categories"]:
-        category_papers[cat].add(row["id"])
-
-# Build citation map
-paper_id_set = set(df["id"])
-citation_map = {}
-for _, row in df.iterrows():
-    pid = row["id"]
+from sklearn.metrics import silhouette_score
+import scipy.sparse as sp
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import run_log
+from pipeline_manifest import Manifest, digest
+from citation_store import load_citation_store
+from graph_metrics import Graph, pagerank
+from embedding_store import EmbeddingStore, open_matrix, STORE_PATH
+from shard_runner import add_workers_argument, run_shards
+
+# Cluster each category's papers by abstract embedding and write
+# semantic_clusters/<category>/{nodes,edges}.csv.
+#   default: the top 100 papers by in-category PageRank, k = 10
+#   --all:   every paper with an abstract; k picked per category by
+#            silhouette score, MiniBatchKMeans, and keywords from one
+#            TF-IDF matrix fitted over the whole corpus
+# Categories run in parallel (--workers) in two passes: rank every category,
+# embed the papers they selected in one batch (cached in the embedding store,
+# see embedding_store.py), then cluster.
+
+TOP_PAPERS = 100
+TOP_CLUSTERS = 10
+MAX_CLUSTERS = 50
+STAGES = {"top": "semantic_clusters", "all": "semantic_clusters:all"}
+
+
+def rank_category(job):
+    """PageRank within one category's citation graph and the papers to
+    cluster, or None if the category is too small."""
+    category, paper_ids, citations, with_abstract, mode = job
+    members = set(paper_ids)
+    G = Graph.from_edges(
+        ((cited, pid) for pid in paper_ids for cited in citations.get(pid, []) if cited in members),
+        nodes=paper_ids)
+
+    # Skip if too small
+    if G.n < 20:
+        return category, None, None
     try:
-        citations = eval(row["citations"]) if isinstance(row["citations"], str) else []
-    except:
-        citations = []
-    citation_map[pid] = [c for c in citations if c in paper_id_set]
+        pr = G.as_dict(pagerank(G))
+    except RuntimeError:
+        return category, None, None
+
+    selected = sorted(paper_ids, key=lambda pid: pr.get(pid, 0), reverse=True)
+    if mode == "top":
+        selected = selected[:TOP_PAPERS]
+    selected = [pid for pid in selected if pid in with_abstract]
+    if len(selected) < 10:
+        return category, None, None
+    return category, pr, selected
 
-id_to_row = df.set_index("id").to_dict("index")
 
-# Helper to extract top 3 TF-IDF keywords from a list of abstracts
 def extract_keywords(texts, top_k=3):
+    """Top TF-IDF keywords of a list of abstracts, from a vectorizer fitted on them alone."""
     if not texts:
         return "None"
     tfidf = TfidfVectorizer(stop_words="english", max_features=100)
@@ -43,77 +69,180 @@ def extract_keywords(texts, top_k=3):
     idxs = scores.argsort()[-top_k:][::-1]
     return ", ".join([tfidf.get_feature_names_out()[i] for i in idxs])
 
-# Process each category
-for category, paper_ids in category_papers.items():
-    print(f"\n📚 Processing category: {category}")
 
-    # Build graph
-    G = nx.DiGraph()
-    for pid in paper_ids:
-        G.add_node(pid)
-        for cited in citation_map.get(pid, []):
-            if cited in paper_ids:
-                G.add_edge(cited, pid)
+def shared_keywords(tfidf_rows, labels, k, vocabulary, top_k=3):
+    """Top keywords of every cluster from rows of the shared TF-IDF matrix:
+    one sparse product sums each cluster's rows."""
+    members = sp.csr_array((np.ones(len(labels)), (labels, np.arange(len(labels)))), shape=(k, len(labels)))
+    sums = (members @ tfidf_rows).toarray()
+    top = np.argsort(-sums, axis=1, kind="stable")[:, :top_k]
+    return {cid: ", ".join(vocabulary[i] for i in top[cid] if sums[cid, i] > 0) or "None" for cid in range(k)}
+
+
+def choose_k(embeddings, seed=42, sample=5000):
+    """Cluster count with the best silhouette score on a sample, among
+    a geometric range of candidates up to sqrt(n)."""
+    n = len(embeddings)
+    high = int(min(MAX_CLUSTERS, np.sqrt(n)))
+    if high <= 2:
+        return 2
+    rows = np.random.default_rng(seed).choice(n, size=min(n, sample), replace=False)
+    X = embeddings[np.sort(rows)]
+    best, best_score = 2, -1.0
+    for k in sorted(set(np.geomspace(2, high, 8).astype(int))):
+        labels = MiniBatchKMeans(n_clusters=k, random_state=seed, batch_size=2048, n_init=3).fit_predict(X)
+        if len(set(labels)) < 2:
+            continue
+        score = silhouette_score(X, labels, sample_size=min(len(X), 2000), random_state=seed)
+        if score > best_score:
+            best, best_score = k, score
+    return best
+
+
+def cluster_category(job):
+    """Cluster one category's selected papers and write its CSVs."""
+    category, papers, pr, citations, store_rows, store_path, mode, tfidf = job
+    embeddings = np.asarray(open_matrix(store_path)[store_rows], dtype=np.float32)
+    top_papers = papers["id"].tolist()
+    abstracts = papers["abstract"].tolist()
+
+    if mode == "top":
+        k = TOP_CLUSTERS
+        cluster_ids = KMeans(n_clusters=k, random_state=42, n_init=10).fit_predict(embeddings)
+        cluster_texts = defaultdict(list)
+        for cid, abstract in zip(cluster_ids, abstracts):
+            cluster_texts[cid].append(abstract)
+        cluster_keywords = {cid: extract_keywords(texts) for cid, texts in cluster_texts.items()}
+    else:
+        k = choose_k(embeddings)
+        kmeans = MiniBatchKMeans(n_clusters=k, random_state=42, batch_size=4096, n_init=3)
+        cluster_ids = kmeans.fit_predict(embeddings)
+        tfidf_rows, vocabulary = tfidf
+        cluster_keywords = shared_keywords(tfidf_rows, cluster_ids, k, vocabulary)
+
+    nodes = pd.DataFrame({
+        "id": top_papers,
+        "title": papers["title"].tolist(),
+        "pagerank": [pr.get(pid, 0) for pid in top_papers],
+        "abstract": abstracts,
+        "cluster": cluster_ids,
+        "keywords": [cluster_keywords[cid] for cid in cluster_ids],
+    })
+
+    # Induce edge list among the clustered papers
+    members = set(top_papers)
+    edges = [{"source": cited, "target": pid}
+             for pid in top_papers for cited in citations.get(pid, []) if cited in members]
 
-    # Skip if too small
-    if G.number_of_nodes() < 20:
-        continue
-
-    # Compute PageRank
-    try:
-        pr = nx.pagerank(G)
-    except:
-        continue
-
-    top_papers = sorted(paper_ids, key=lambda pid: pr.get(pid, 0), reverse=True)[:100]
-    top_papers = [pid for pid in top_papers if pid in id_to_row and pd.notnull(id_to_row[pid]["abstract"])]
-
-    if len(top_papers) < 10:
-        continue
-
-    # Embeddings
-    abstracts = [id_to_row[pid]["abstract"] for pid in top_papers]
-    embeddings = model.encode(abstracts)
-
-    # Clustering
-    k = 10
-    kmeans = KMeans(n_clusters=k, random_state=42)
-    cluster_ids = kmeans.fit_predict(embeddings)
-
-    # Assign cluster
-    cluster_texts = defaultdict(list)
-    paper_cluster = {}
-    for pid, cid, abstract in zip(top_papers, cluster_ids, abstracts):
-        paper_cluster[pid] = cid
-        cluster_texts[cid].append(abstract)
-
-    # Extract top 3 keywords per cluster
-    cluster_keywords = {cid: extract_keywords(texts) for cid, texts in cluster_texts.items()}
-
-    # Write nodes.csv
-    nodes = []
-    for pid in top_papers:
-        row = id_to_row[pid]
-        nodes.append({
-            "id": pid,
-            "title": row["title"],
-            "pagerank": pr.get(pid, 0),
-            "abstract": row["abstract"],
-            "cluster": paper_cluster[pid],
-            "keywords": cluster_keywords[paper_cluster[pid]]
-        })
-
-    # Induce edge list among top papers
-    edges = []
-    for pid in top_papers:
-        for cited in citation_map.get(pid, []):
-            if cited in top_papers:
-                edges.append({"source": cited, "target": pid})
-
-    # Save
     out_dir = os.path.join("semantic_clusters", category)
     os.makedirs(out_dir, exist_ok=True)
-    pd.DataFrame(nodes).to_csv(os.path.join(out_dir, "nodes.csv"), index=False)
+    nodes.to_csv(os.path.join(out_dir, "nodes.csv"), index=False)
     pd.DataFrame(edges).to_csv(os.path.join(out_dir, "edges.csv"), index=False)
-
-print("\n✅ Semantic clusters saved under semantic_clusters/{category}/")
\ No newline at end of file
+    return category, len(top_papers), k
+
+
+def report(results):
+    results = list(results)
+    for category, count, k in results:
+        print(f"   {category}: {count:,} papers in {k} clusters")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cluster each category's papers by abstract embedding")
+    parser.add_argument("--all", action="store_true", help="cluster every paper instead of the top 100 by PageRank")
+    parser.add_argument("--store", default=STORE_PATH, help="embedding store directory")
+    parser.add_argument("--force", action="store_true", help="rebuild every category")
+    add_workers_argument(parser)
+    args = parser.parse_args()
+    mode = "all" if args.all else "top"
+
+    # Skip the whole stage if its input is unchanged since the last run in
+    # this mode, and otherwise redo only categories whose papers changed (see
+    # pipeline_manifest.py)
+    run = run_log.start(STAGES[mode])
+    manifest = Manifest()
+    if not args.force and manifest.is_current(STAGES[mode], ["arxiv_paper_nodes.csv"]):
+        print("✅ Inputs unchanged since the last run; nothing to do.")
+        run.status = "skipped"
+        sys.exit(0)
+
+    # Load data
+    df = pd.read_csv("arxiv_paper_nodes.csv")
+    df = df.drop_duplicates(subset="id")
+    run.rows = len(df)
+    df["categories"] = df["categories"].fillna("").apply(lambda x: x.strip().split())
+
+    # Build category → paper_id mapping
+    category_papers = defaultdict(set)
+    for pid, cats in zip(df["id"], df["categories"]):
+        for cat in cats:
+            category_papers[cat].add(pid)
+
+    # Citation map from the compiled edge store (see citation_store.py); it
+    # only holds citations between papers of this file
+    citation_map = load_citation_store("arxiv_paper_nodes.csv").citation_map()
+
+    id_to_row = df.set_index("id").to_dict("index")
+    with_abstract = {pid for pid, row in id_to_row.items() if pd.notnull(row["abstract"])}
+
+    # Work out which categories changed
+    jobs = []
+    for category, paper_ids in category_papers.items():
+        # Everything this category's output depends on
+        category_digest = digest([mode] + [
+            (pid, id_to_row[pid]["title"], id_to_row[pid]["abstract"], citation_map.get(pid, []))
+            for pid in sorted(paper_ids)
+        ])
+        if not args.force and not manifest.item_changed("semantic_clusters", category, category_digest):
+            continue
+        manifest.mark_item("semantic_clusters", category, category_digest)
+
+        paper_ids = sorted(paper_ids)
+        citations = {pid: [c for c in citation_map.get(pid, []) if c in category_papers[category]]
+                     for pid in paper_ids}
+        jobs.append((category, paper_ids, citations, with_abstract & category_papers[category], mode))
+
+    print(f"⚙️ Ranking {len(jobs)} changed categories...")
+    ranked = [result for result in run_shards(rank_category, jobs, list, args.workers) if result[1] is not None]
+    citations_of = {job[0]: job[2] for job in jobs}
+
+    # Embed every selected paper in one batch; only papers missing from the
+    # store are encoded
+    selected = sorted({pid for _, _, papers in ranked for pid in papers})
+    print(f"📥 Embedding {len(selected):,} abstracts...")
+    store = EmbeddingStore(args.store)
+    store.ensure(selected, [id_to_row[pid]["abstract"] for pid in selected], workers=args.workers or 1)
+
+    tfidf = None
+    if mode == "all":
+        # One vectorizer over the whole corpus; clusters sum their rows of it
+        print("⚙️ Fitting the shared TF-IDF matrix...")
+        corpus = sorted(with_abstract)
+        vectorizer = TfidfVectorizer(stop_words="english", max_features=20000, min_df=2, dtype=np.float32)
+        matrix = vectorizer.fit_transform([id_to_row[pid]["abstract"] for pid in corpus]).tocsr()
+        vocabulary = vectorizer.get_feature_names_out()
+        position = {pid: i for i, pid in enumerate(corpus)}
+
+    cluster_jobs = []
+    for category, pr, papers in ranked:
+        frame = pd.DataFrame({
+            "id": papers,
+            "title": [id_to_row[pid]["title"] for pid in papers],
+            "abstract": [id_to_row[pid]["abstract"] for pid in papers],
+        })
+        if mode == "all":
+            tfidf = (matrix[[position[pid] for pid in papers]], vocabulary)
+        cluster_jobs.append((category, frame, {pid: pr.get(pid, 0) for pid in papers},
+                             citations_of[category], store.rows(papers), args.store, mode, tfidf))
+
+    # Largest first so one big category does not start last
+    cluster_jobs.sort(key=lambda job: -len(job[1]))
+    print(f"⚙️ Clustering {len(cluster_jobs)} categories...")
+    run_shards(cluster_category, cluster_jobs, report, args.workers)
+
+    manifest.mark_done(STAGES[mode], ["arxiv_paper_nodes.csv"])
+    for other in STAGES:
+        if other != mode:
+            manifest.forget(STAGES[other])
+    print("\n✅ Semantic clusters saved under semantic_clusters/{category}/")
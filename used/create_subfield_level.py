@@ -1,106 +1,138 @@
 import pandas as pd
-from itertools import product
-from collections import defaultdict
+import numpy as np
+import scipy.sparse as sp
 import os
-import networkx as nx
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import run_log
+from pipeline_manifest import Manifest
+from citation_store import load_citation_store
+from graph_metrics import Graph, pagerank
+
+input_files = ["arxiv_paper_nodes.csv", "arxiv_category_mapping_cs_fixed.csv"]
+
+# Skip the whole stage if its inputs are unchanged since the last run
+# (see pipeline_manifest.py); pass --force to rebuild anyway
+run = run_log.start("subfield_level")
+manifest = Manifest()
+if "--force" not in sys.argv and manifest.is_current("subfield_level", input_files):
+    print("✅ Inputs unchanged since the last run; nothing to do.")
+    run.status = "skipped"
+    sys.exit(0)
+
+start = time.perf_counter()
 
 # Load input data
-papers_df = pd.read_csv("arxiv_paper_nodes.csv")
+papers_df = pd.read_csv("arxiv_paper_nodes.csv", usecols=["id", "categories"], dtype={"id": str})
 mapping_df = pd.read_csv("arxiv_category_mapping_cs_fixed.csv")
-
-# Mapping: category → (field, subfield)
-category_to_field = dict(zip(mapping_df["category"], mapping_df["field"]))
-category_to_subfield = dict(zip(mapping_df["category"], mapping_df["subfield"]))
-
-# Paper → fields/subfields
-paper_to_fields = {}
-paper_to_subfields = {}
-field_subfields = defaultdict(set)
-subfield_papers = defaultdict(set)
-
-for _, row in papers_df.iterrows():
-    paper_id = row["id"]
-    cats = str(row["categories"]).split()
-
-    fields = set()
-    subfields = set()
-    for cat in cats:
-        f = category_to_field.get(cat)
-        sf = category_to_subfield.get(cat)
-        if f and sf:
-            fields.add(f)
-            subfields.add(sf)
-            field_subfields[f].add(sf)
-            subfield_papers[sf].add(paper_id)
-
-    paper_to_fields[paper_id] = fields
-    paper_to_subfields[paper_id] = subfields
-
-# Edge counts
-field_edges = defaultdict(lambda: defaultdict(int))
-
-for _, row in papers_df.iterrows():
-    target_id = row["id"]
-    target_fields = paper_to_fields.get(target_id, set())
-    target_subfields = paper_to_subfields.get(target_id, set())
-
-    citations = row["citations"]
-    if isinstance(citations, str) and citations.startswith("["):
-        try:
-            citations = eval(citations)
-        except:
-            citations = []
-    elif not isinstance(citations, list):
-        citations = []
-
-    for cited_id in citations:
-        source_fields = paper_to_fields.get(cited_id, set())
-        source_subfields = paper_to_subfields.get(cited_id, set())
-        common_fields = target_fields & source_fields
-
-        for field in common_fields:
-            valid_subs = field_subfields[field]
-            for src, tgt in product(source_subfields, target_subfields):
-                if src in valid_subs and tgt in valid_subs:
-                    field_edges[field][(src, tgt)] += 1
+run.rows = len(papers_df)
+
+# Mapping: category → (field, subfield), as integer ids. A category with a
+# blank subfield still maps to one shared NaN subfield, which takes part in
+# PageRank but is never written out.
+mapping_df = mapping_df.drop_duplicates(subset="category", keep="last")
+mapping_df = mapping_df[mapping_df["field"].notna() & (mapping_df["field"] != "") & (mapping_df["subfield"] != "")]
+field_codes, field_names = pd.factorize(mapping_df["field"])
+sub_codes, sub_names = pd.factorize(mapping_df["subfield"], use_na_sentinel=False)
+category_index = pd.Index(mapping_df["category"])
+n_fields, n_subs = len(field_names), len(sub_names)
+
+# (CSV row, field, subfield) for every mapped category of every row
+exploded = papers_df["categories"].astype(str).str.split().explode()
+where = category_index.get_indexer(exploded.to_numpy())
+mapped = where >= 0
+rows = exploded.index.to_numpy()[mapped]
+fields = field_codes[where[mapped]]
+subs = sub_codes[where[mapped]]
+
+# Subfields seen under each field, and distinct papers per subfield, over all rows
+valid = np.zeros((n_fields, n_subs), dtype=bool)
+valid[fields, subs] = True
+paper_codes = pd.factorize(papers_df["id"])[0]
+paper_subs = np.unique(paper_codes[rows] * n_subs + subs)
+subfield_sizes = np.bincount(paper_subs % n_subs, minlength=n_subs)
+
+# A repeated id takes the categories of its last row
+last_row = np.zeros(paper_codes.max() + 1 if len(paper_codes) else 0, dtype=np.int64)
+last_row[paper_codes] = np.arange(len(paper_codes))
+representative = last_row[paper_codes]
+
+n_rows = len(papers_df)
+paper_field = sp.csr_array((np.ones(len(rows)), (rows, fields)), shape=(n_rows, n_fields))
+paper_sub = sp.csr_array((np.ones(len(rows)), (rows, subs)), shape=(n_rows, n_subs))
+paper_field.data[:] = 1  # a paper in a field twice still counts once
+paper_sub.data[:] = 1
+
+# Citation pairs as CSV rows (the store's rows are the CSV's rows)
+citations = load_citation_store("arxiv_paper_nodes.csv")
+if len(citations.ids) != n_rows:
+    run.status = "error: citation store mismatch"
+    sys.exit("❌ The citation store does not match arxiv_paper_nodes.csv; rerun used/compile_citations.py --force")
+citing_rows, cited_rows = citations.edges()
+target = representative[citing_rows]
+source = representative[cited_rows]
+
+# One row per (citation, field both papers share)
+shared = (paper_field[target] * paper_field[source]).tocoo()
+pair_edge, pair_field = shared.row, shared.col
+
+# Columns are the (field, subfield) pairs that exist; each citation-field row
+# marks the source's (resp. target's) subfields that are valid in that field
+column = np.full((n_fields, n_subs), -1, dtype=np.int64)
+column[valid] = np.arange(valid.sum())
+column_field, column_sub = np.nonzero(valid)
+
+
+def side(papers):
+    block = paper_sub[papers[pair_edge]].tocoo()
+    cols = column[pair_field[block.row], block.col]
+    keep = cols >= 0
+    return sp.csr_array((np.ones(keep.sum()), (block.row[keep], cols[keep])),
+                        shape=(len(pair_edge), len(column_field)))
+
+
+# Subfield-to-subfield citation counts of every field in one product;
+# (source, target) columns always share a field since they share a row
+counts = (side(source).T @ side(target)).tocoo()
+src_cols, tgt_cols, raw_counts = counts.row, counts.col, counts.data.astype(np.int64)
+edge_field = column_field[src_cols]
+print(f"⚙️ Aggregated {len(citing_rows):,} citations in {time.perf_counter() - start:.1f}s")
 
 # Write per field
-for field, edge_counts in field_edges.items():
-    valid_subs = field_subfields[field]
-    subfield_sizes = {sf: len(subfield_papers[sf]) for sf in valid_subs}
-    subfield_sizes = {sf: sz for sf, sz in subfield_sizes.items() if sz > 0}
-    valid_nodes = set(subfield_sizes)
-
-    edge_records = []
-    G = nx.DiGraph()
-
-    for (src, tgt), raw_count in edge_counts.items():
-        if src in valid_nodes and tgt in valid_nodes:
-            M, N = subfield_sizes[src], subfield_sizes[tgt]
-            weight = raw_count / (M * N) if M > 0 and N > 0 else 0
-            G.add_edge(src, tgt, weight=weight)
-            edge_records.append({
-                "source": src,
-                "target": tgt,
-                "weight": weight,
-                "raw_count": raw_count
-            })
-
-    # Create DataFrames
-    edge_df = pd.DataFrame(edge_records).dropna(subset=["source", "target"])
-    used_nodes = set(edge_df["source"]).union(set(edge_df["target"]))
-    pagerank = nx.pagerank(G, weight="weight")
-
-    node_data = [{
-        "id": sf,
-        "paper_count": subfield_sizes[sf],
-        "pagerank": pagerank.get(sf, 0)
-    } for sf in used_nodes]
+for f in np.unique(edge_field):
+    field = field_names[f]
+    in_field = np.flatnonzero(edge_field == f)
+    src = column_sub[src_cols[in_field]]
+    tgt = column_sub[tgt_cols[in_field]]
+    raw = raw_counts[in_field]
+    weight = raw / (subfield_sizes[src] * subfield_sizes[tgt])
+
+    G = Graph.from_edges(zip(src.tolist(), tgt.tolist(), weight.tolist()))
+    field_pagerank = G.as_dict(pagerank(G))
+
+    # Edges to or from the blank subfield are dropped from the output
+    named = ~pd.isna(sub_names[src]) & ~pd.isna(sub_names[tgt])
+    edge_df = pd.DataFrame({
+        "source": sub_names[src[named]],
+        "target": sub_names[tgt[named]],
+        "weight": weight[named],
+        "raw_count": raw[named],
+    }).sort_values(["source", "target"])
+    used_nodes = np.unique(np.concatenate([src[named], tgt[named]]))
+
+    node_df = pd.DataFrame({
+        "id": sub_names[used_nodes],
+        "paper_count": subfield_sizes[used_nodes],
+        "pagerank": [field_pagerank.get(sf, 0) for sf in used_nodes.tolist()],
+    }).sort_values("id")
 
     # Save
     dir_path = f"graphdata/{field.replace('/', '_')}"
     os.makedirs(dir_path, exist_ok=True)
-    pd.DataFrame(node_data).to_csv(f"{dir_path}/nodes.csv", index=False)
+    node_df.to_csv(f"{dir_path}/nodes.csv", index=False)
     edge_df.to_csv(f"{dir_path}/edges.csv", index=False)
 
-print("✅ Subfield graphs regenerated with empty source/target edges removed.")
+manifest.mark_done("subfield_level", input_files)
+print(f"✅ Subfield graphs regenerated in {time.perf_counter() - start:.1f}s.")
@@ -0,0 +1,47 @@
+import os
+import sys
+import time
+import argparse
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import run_log
+from pipeline_manifest import Manifest
+from shard_runner import add_workers_argument
+from embedding_store import EmbeddingStore, DEFAULT_MODEL, STORE_PATH
+
+# Embed every paper's abstract once into the persistent embedding store
+# (see embedding_store.py). Papers already embedded from the same abstract
+# are skipped, so rerunning after new papers arrive only encodes those.
+parser = argparse.ArgumentParser(description="Fill the abstract embedding store")
+parser.add_argument("csv", nargs="?", default="arxiv_paper_nodes.csv", help="papers CSV with id and abstract columns")
+parser.add_argument("--store", default=STORE_PATH, help="embedding store directory")
+parser.add_argument("--model", default=DEFAULT_MODEL, help="sentence-transformers model name")
+parser.add_argument("--batch-size", type=int, default=256, help="texts per encoder batch")
+parser.add_argument("--force", action="store_true", help="check every paper even if the CSV is unchanged")
+add_workers_argument(parser)
+args = parser.parse_args()
+
+stage = f"embeddings:{args.csv}"
+run = run_log.start(stage)
+manifest = Manifest()
+if not args.force and manifest.is_current(stage, [args.csv]):
+    print("✅ Inputs unchanged since the last run; nothing to do.")
+    run.status = "skipped"
+    sys.exit(0)
+
+print(f"📥 Loading {args.csv}...")
+df = pd.read_csv(args.csv, usecols=["id", "abstract"], dtype={"id": str})
+df = df.dropna(subset=["abstract"]).drop_duplicates(subset="id")
+run.rows = len(df)
+
+store = EmbeddingStore(args.store, args.model)
+before = store.count
+print(f"⚙️ Embedding abstracts of {len(df):,} papers ({len(store):,} already stored)...")
+start = time.time()
+store.ensure(df["id"].tolist(), df["abstract"].tolist(), batch_size=args.batch_size, workers=args.workers or 1)
+added = store.count - before
+
+manifest.mark_done(stage, [args.csv], {"papers": len(df), "encoded": added})
+print(f"✅ Encoded {added:,} abstracts in {time.time() - start:.1f}s; {args.store}/ holds {len(store):,} papers")
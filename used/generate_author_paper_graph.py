@@ -2,8 +2,15 @@ import pandas as pd
 import json
 import re
 import os
+import sys
 from collections import defaultdict
-import networkx as nx
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import run_log
+from pipeline_manifest import Manifest
+from citation_store import load_citation_store
+from graph_metrics import Graph, pagerank
+from author_index import is_valid_author
 
 # ====== category ======
 category_map = {
@@ -33,30 +40,30 @@ def extract_year(paper_id):
         return None
     return None
 
-def is_valid_author(author):
-    invalid_keywords = [
-        "University", "Institute", "Laboratory", "Dept", "Department",
-        "Collaboration", "College", "Group", "Center", "School",
-        "Russia", "Germany", "France", "China", "Japan", "USA",
-        "Poland", "Italy", "Turkey", "Argentina", "Korea", "India",
-        "UK", "Netherlands", "Mexico"
-    ]
-    return len(author) > 2 and not any(kw in author for kw in invalid_keywords)
-
 # ====== path======
-folder_path = os.path.dirname(os.path.abspath(__file__))
-csv_path = os.path.join(folder_path, "arxiv.csv")
-
+# arxiv.csv next to this script unless a CSV is given; outputs go next to the CSV
+csv_args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+csv_path = csv_args[0] if csv_args else os.path.join(os.path.dirname(os.path.abspath(__file__)), "arxiv.csv")
+folder_path = os.path.dirname(os.path.abspath(csv_path))
+
+# Skip the whole stage if its inputs are unchanged since the last run
+# (see pipeline_manifest.py); pass --force to rebuild anyway
+run = run_log.start("author_paper_graph")
+manifest = Manifest()
+if "--force" not in sys.argv and manifest.is_current("author_paper_graph", [csv_path]):
+    print("✅ Inputs unchanged since the last run; nothing to do.")
+    run.status = "skipped"
+    sys.exit(0)
 
 print("📥 Loading CSV...")
 df = pd.read_csv(csv_path)
+run.rows = len(df)
 
 nodes = []
 links = []
 paper_ids = set()
 author_nodes = {}
 author_paper_count = defaultdict(int)
-paper_citation_count = defaultdict(int)
 paper_authors_map = defaultdict(list)
 
 # ====== handle each row ======
@@ -118,41 +125,22 @@ for paper_id, authors in paper_authors_map.items():
                 author_nodes["author:" + a1]["coauthors"] += 1
 
 # ====== Citation count  ======
+# Times each paper is cited by any row of the CSV, from the compiled edge
+# store (see citation_store.py)
 if "citations" in df.columns:
-    for _, row in df.iterrows():
-        citing = row.get("citations", "")
-        import ast
-
-if "citations" in df.columns:
-    for _, row in df.iterrows():
-        citing = row.get("citations", "")
-        try:
-            citing_list = ast.literal_eval(citing)
-            if isinstance(citing_list, list):
-                for cited_id in citing_list:
-                    if cited_id in paper_ids:
-                        paper_citation_count[cited_id] += 1
-        except:
-            continue 
-
-        for cited_id in citing_list:
-            if cited_id in paper_ids:
-                paper_citation_count[cited_id] += 1
-
-    for n in nodes:
-        if n["type"] == "paper":
-            n["citation_count"] = paper_citation_count.get(n["id"], 0)
+    citations = load_citation_store(csv_path)
+    cited_counts = citations.citation_counts()
+    for n, row in zip(nodes, citations.rows([n["id"] for n in nodes])):
+        n["citation_count"] = int(cited_counts[row]) if row >= 0 else 0
 
 # ====== combine nodes ======
 nodes += list(author_nodes.values())
 
 # ====== PageRank ======
-G = nx.DiGraph()
-for link in links:
-    G.add_edge(link["source"], link["target"])
+G = Graph.from_edges((link["source"], link["target"]) for link in links)
 
 print("⚙️ Calculating PageRank...")
-pagerank_dict = nx.pagerank(G, alpha=0.85)
+pagerank_dict = G.as_dict(pagerank(G, alpha=0.85))
 for node in nodes:
     node["pagerank"] = round(pagerank_dict.get(node["id"], 0), 6)
 
@@ -180,4 +168,5 @@ subset_links = [l for l in links if l["source"] in subset_node_ids and l["target
 with open(os.path.join(folder_path, "author_paper_graph_10k.json"), "w") as f:
     json.dump({"nodes": subset_nodes, "links": subset_links}, f, indent=2)
 
+manifest.mark_done("author_paper_graph", [csv_path])
 print("✅ Saved subset graph to author_paper_graph_10k.json")
@@ -1,63 +1,100 @@
 import os
+import sys
 import json
-from collections import defaultdict
+import argparse
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from arxiv_meta import iter_records, main_categories
+import run_log
+from shard_runner import add_workers_argument, run_shards
+from stats_cube import CubeCounts
 
 input_dir = "datafiles_cleaned"
 output_file = "categories.json"
+cube_dir = "stats_cube"
+
+
+def add_paper(categories, update_date, category_counts, category_years, sign=1):
+    """Count one paper (sign=-1 takes a previously counted paper back out)."""
+    year = (update_date or "")[:4]  # e.g. "2007" from "2007-08-12"
+    for main_cat in main_categories(categories or ""):
+        category_counts[main_cat] += sign
+        if year.isdigit():
+            category_years.setdefault(main_cat, Counter())[year] += sign
+
+
+def count_shard(path):
+    """Paper total, per-category counts, per-category year histograms and
+    stats cube counts (see stats_cube.py) of one cleaned file."""
+    total_paper_count = 0
+    category_counts = Counter()
+    category_years = {}
+    cube = CubeCounts()
+
+    for node in iter_records(path):
+        total_paper_count += 1
+        add_paper(node.get("categories"), node.get("update_date"), category_counts, category_years)
+        cube.add(node.get("categories"), node.get("update_date"))
+
+    return total_paper_count, category_counts, category_years, cube
+
+
+def merge_counts(shard_results):
+    total_paper_count = 0
+    category_counts = Counter()
+    category_years = {}
+    cube = CubeCounts()
+    for total, counts, years, shard_cube in shard_results:
+        total_paper_count += total
+        category_counts.update(counts)
+        for cat, yearly in years.items():
+            category_years.setdefault(cat, Counter()).update(yearly)
+        cube.update(shard_cube)
+    return total_paper_count, category_counts, category_years, cube
+
+
+def load_output(path):
+    """Per-category counts and year histograms back from a categories.json."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    category_counts = Counter({cat: entry["count"] for cat, entry in data.items()})
+    category_years = {cat: Counter(entry["years"]) for cat, entry in data.items()}
+    return category_counts, category_years
+
+
+def build_output(total_paper_count, category_counts, category_years):
+    final_output = {}
+    for cat in sorted(c for c, count in category_counts.items() if count > 0):
+        count = category_counts[cat]
+        percent = (count / total_paper_count * 100) if total_paper_count > 0 else 0
+        yearly = {year: n for year, n in category_years.get(cat, {}).items() if n > 0}
+        sorted_yearly = dict(sorted(yearly.items(), key=lambda x: int(x[0])))
+        final_output[cat] = {
+            "count": count,
+            "percentage": round(percent, 2),
+            "years": sorted_yearly
+        }
+    return final_output
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Count papers per main category and year")
+    add_workers_argument(parser)
+    args = parser.parse_args()
+    run = run_log.start("category_counts")
+
+    # Parse each cleaned data file in parallel, then sum the per-file counts
+    files = sorted(os.path.join(input_dir, file) for file in os.listdir(input_dir) if file.endswith(".json"))
+    total_paper_count, category_counts, category_years, cube = run_shards(count_shard, files, merge_counts, args.workers)
+    final_output = build_output(total_paper_count, category_counts, category_years)
+    run.rows = total_paper_count
+
+    # Write to file
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(final_output, f, indent=2)
+
+    cube.write(cube_dir)
 
-prefix_to_main_category = {
-    "astro-ph": "physics", "cond-mat": "physics", "gr-qc": "physics", "hep-ex": "physics",
-    "hep-lat": "physics", "hep-ph": "physics", "hep-th": "physics", "math-ph": "physics",
-    "nlin": "physics", "nucl-ex": "physics", "nucl-th": "physics", "physics": "physics", "quant-ph": "physics",
-    "math": "mathematics",
-    "cs": "computer_science",
-    "q-bio": "quantitative_biology",
-    "q-fin": "quantitative_finance",
-    "stat": "statistics",
-    "eess": "electrical_engineering",
-    "econ": "economics"
-}
-
-# Initialize counters
-category_counts = defaultdict(int)
-category_years = defaultdict(lambda: defaultdict(int))
-total_paper_count = 0
-
-# Parse each cleaned data file
-for file in os.listdir(input_dir):
-    if file.endswith(".json"):
-        with open(os.path.join(input_dir, file), "r", encoding="utf-8") as f:
-            data = json.load(f)
-            for node in data.get("nodes", []):
-                total_paper_count += 1
-                seen_main_cats = set()
-                raw_cats = node.get("categories", "")
-                update_date = node.get("update_date", "")[:4]  # e.g. "2007" from "2007-08-12"
-
-                for cat in raw_cats.split():
-                    prefix = cat.split(".")[0]
-                    main_cat = prefix_to_main_category.get(prefix)
-                    if main_cat and main_cat not in seen_main_cats:
-                        category_counts[main_cat] += 1
-                        if update_date.isdigit():
-                            category_years[main_cat][update_date] += 1
-                        seen_main_cats.add(main_cat)
-
-# Build final output
-final_output = {}
-for cat in sorted(category_counts):
-    count = category_counts[cat]
-    percent = (count / total_paper_count * 100) if total_paper_count > 0 else 0
-    yearly = category_years[cat]
-    sorted_yearly = dict(sorted(yearly.items(), key=lambda x: int(x[0])))
-    final_output[cat] = {
-        "count": count,
-        "percentage": round(percent, 2),
-        "years": sorted_yearly
-    }
-
-# Write to file
-with open(output_file, "w", encoding="utf-8") as f:
-    json.dump(final_output, f, indent=2)
-
-print("✅ categories.json updated with count, percentage, and per-year breakdown.")
\ No newline at end of file
+    print("✅ categories.json updated with count, percentage, and per-year breakdown.")
+    print(f"✅ {cube_dir}/ holds counts by category, month and cross-listing for /api/stats.")
@@ -1,7 +1,16 @@
 import pandas as pd
+import numpy as np
 import json
-from collections import defaultdict, Counter
-import networkx as nx
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from pipeline_manifest import Manifest
+from graph_metrics import Graph, betweenness, closeness, pagerank
+import author_index
+import coauthor_store
+import run_log
 
 
 category_map = {
@@ -22,85 +31,118 @@ def map_category(cat):
     return "Other"
 
 
-csv_path = "arxiv.csv"
-output_path = "coauthor_graph.json"
-
-# ====== clean data ======
-df = pd.read_csv(csv_path)
-df = df.head(5000)
-
-nodes = {}
-edges = defaultdict(lambda: {"weight": 0, "papers": [], "titles": [], "category": None})
-author_cat_counter = defaultdict(list)
-G = nx.Graph()
-
-for _, row in df.iterrows():
-    paper_id = row["id"]
-    category_raw = str(row.get("categories", ""))
-    category = map_category(category_raw)
-    title = str(row.get("title", "")).strip()
-
-    try:
-        authors_parsed = eval(row.get("authors_parsed", "[]"))
-        author_names = [" ".join(a[:2]).strip() for a in authors_parsed if len(a) >= 2]
-    except:
-        continue
-
-    for author in author_names:
-        author_id = f"author:{author}"
-        if author_id not in nodes:
-            nodes[author_id] = {
-                "id": author_id,
-                "label": author,
-                "type": "author",
-                "paper_count": 0
-            }
-        nodes[author_id]["paper_count"] += 1
-        author_cat_counter[author_id].append(category)
-
-    for i in range(len(author_names)):
-        for j in range(i + 1, len(author_names)):
-            a1 = f"author:{author_names[i]}"
-            a2 = f"author:{author_names[j]}"
-            key = tuple(sorted([a1, a2]))
-            edges[key]["weight"] += 1
-            edges[key]["papers"].append(paper_id)
-            edges[key]["titles"].append(title)
-            edges[key]["category"] = category
-            G.add_edge(a1, a2, weight=edges[key]["weight"])
+# Authors come from the author index (author_index.py, built here if it is
+# missing or stale) and edges from the coauthor store (coauthor_store.py),
+# next to the CSV. coauthor_graph.json only carries each edge's weight; the
+# page asks /api/coauthor/edge for the shared papers of a clicked edge.
+# The default CSV is the one the server reads, so its author index and
+# coauthor store are the ones /api/coauthor/edge opens.
+parser = argparse.ArgumentParser(description="Build coauthor_graph.json from datafiles/arxiv.csv")
+parser.add_argument("csv", nargs="?", default="datafiles/arxiv.csv", help="papers CSV")
+parser.add_argument("--output", default="coauthor_graph.json", help="graph JSON file")
+parser.add_argument("--limit", type=int, default=None,
+                    help="only use the first N papers (default: all); the edges go to a separate "
+                         "<csv stem>_coauthors_first<N>/ store that the server does not read")
+parser.add_argument("--max-authors", type=int, default=coauthor_store.MAX_AUTHORS,
+                    help="leave out papers with more authors than this")
+parser.add_argument("--pivots", type=int, default=500,
+                    help="sampled sources for betweenness (exact when >= number of authors)")
+parser.add_argument("--workers", type=int, default=None, help="threads for closeness (default: all cores)")
+parser.add_argument("--force", action="store_true", help="rebuild even if the CSV is unchanged")
+args = parser.parse_args()
+
+csv_path = args.csv
+output_path = args.output
+# A partial store must not replace the full one the server serves edges from
+store_dir = coauthor_store.store_dir_for(csv_path)
+stage = "coauthor_graph"
+if args.limit is not None:
+    store_dir += f"_first{args.limit}"
+    stage += f":first{args.limit}"
+
+# Skip the whole stage if its inputs are unchanged since the last run
+# (see pipeline_manifest.py); pass --force to rebuild anyway
+run = run_log.start("coauthor_graph")
+manifest = Manifest()
+if not args.force and manifest.is_current(stage, [csv_path]):
+    print("✅ Inputs unchanged since the last run; nothing to do.")
+    run.status = "skipped"
+    sys.exit(0)
+
+# ====== authors and coauthor edges ======
+index_dir = author_index.store_dir_for(csv_path)
+if args.force or not author_index.is_current(csv_path, index_dir):
+    print("⚙️ Indexing authors...")
+    author_index.build_author_index(csv_path, index_dir)
+index = author_index.AuthorIndex(index_dir)
+meta = coauthor_store.build_coauthors(index, store_dir, args.max_authors, args.limit)
+store = coauthor_store.CoauthorStore(store_dir)
+run.rows = meta["papers"]
+print(f"⚙️ {meta['edges']:,} coauthor pairs over {meta['papers']:,} papers "
+      f"({meta['skipped_papers']:,} with more than {args.max_authors} authors left out)")
+
+# Authorships of the papers used, as (author, paper row)
+n_papers = meta["papers"]
+authorships = np.asarray(index.paper_authors[:index.paper_indptr[n_papers]], dtype=np.int64)
+paper_rows = np.repeat(np.arange(n_papers), np.diff(np.asarray(index.paper_indptr[:n_papers + 1])))
+authors = np.unique(authorships)
+local = np.full(len(index), -1, dtype=np.int64)
+local[authors] = np.arange(len(authors))
+
+# Each author's most common field over their papers, ties going to the one seen first
+df = pd.read_csv(csv_path, usecols=["id", "categories"], dtype={"id": str})
+df = df[~df["id"].duplicated()].head(n_papers)
+field_codes, fields = pd.factorize(df["categories"].fillna("").astype(str).map(map_category))
+cells = local[authorships] * len(fields) + field_codes[paper_rows]
+per_field = np.bincount(cells, minlength=len(authors) * len(fields))
+first_seen = np.full(len(per_field), len(cells))
+np.minimum.at(first_seen, cells, np.arange(len(cells)))
+author_field = (per_field * (len(cells) + 1) - first_seen).reshape(len(authors), len(fields)).argmax(axis=1)
 
 # ====== pagerank ======
-pagerank_scores = nx.pagerank(G, alpha=0.85)
-degree_dict = dict(G.degree())
-betweenness_dict = nx.betweenness_centrality(G)
-closeness_dict = nx.closeness_centrality(G)
-
-for node_id in nodes:
-    cat_list = author_cat_counter.get(node_id, [])
-    nodes[node_id]["category"] = Counter(cat_list).most_common(1)[0][0] if cat_list else "Other"
-    nodes[node_id]["pagerank"] = round(pagerank_scores.get(node_id, 0), 6)
-    nodes[node_id]["degree"] = degree_dict.get(node_id, 0)
-    nodes[node_id]["betweenness"] = round(betweenness_dict.get(node_id, 0), 6)
-    nodes[node_id]["closeness"] = round(closeness_dict.get(node_id, 0), 6)
-    nodes[node_id]["coauthor_count"] = degree_dict.get(node_id, 0)
+# Over authors with at least one coauthor; the others get zeros
+a, b, weights = store.edges()
+linked = np.zeros(len(authors), dtype=bool)
+linked[local[a]] = linked[local[b]] = True
+in_graph = np.cumsum(linked) - 1
+G = Graph(int(linked.sum()), in_graph[local[a]], in_graph[local[b]], weights, directed=False)
+print(f"⚙️ Betweenness over {min(args.pivots, G.n)} of {G.n} authors, closeness over all...")
+metrics = {}
+for name, values in [("pagerank", pagerank(G, alpha=0.85)), ("degree", G.degree()),
+                     ("betweenness", betweenness(G, k=args.pivots, seed=42)),
+                     ("closeness", closeness(G, workers=args.workers))]:
+    metrics[name] = np.zeros(len(authors))
+    metrics[name][linked] = values
+
+names = np.array(list(index.authors.iter_column("name")), dtype=object)[authors]
+paper_counts = np.bincount(local[authorships], minlength=len(authors))
+nodes = [
+    {
+        "id": f"author:{name}",
+        "label": name,
+        "type": "author",
+        "paper_count": int(paper_counts[i]),
+        "category": fields[author_field[i]],
+        "pagerank": round(float(metrics["pagerank"][i]), 6),
+        "degree": int(metrics["degree"][i]),
+        "betweenness": round(float(metrics["betweenness"][i]), 6),
+        "closeness": round(float(metrics["closeness"][i]), 6),
+        "coauthor_count": int(metrics["degree"][i]),
+    }
+    for i, name in enumerate(names.tolist())
+]
 
 # ====== get JSON ======
 graph = {
-    "nodes": list(nodes.values()),
+    "nodes": nodes,
     "links": [
-        {
-            "source": a,
-            "target": b,
-            "weight": data["weight"],
-            "papers": data["papers"],
-            "titles": data["titles"],
-            "category": data["category"]
-        }
-        for (a, b), data in edges.items()
+        {"source": nodes[s]["id"], "target": nodes[t]["id"], "weight": w}
+        for s, t, w in zip(local[a].tolist(), local[b].tolist(), weights.tolist())
     ]
 }
 
 with open(output_path, "w") as f:
-    json.dump(graph, f, indent=2)
+    json.dump(graph, f, separators=(",", ":"))
 
-print("✅ coauthor_graph.json saved，including PageRank、Degree、Betweenness、Closeness、Category")
+manifest.mark_done(stage, [csv_path])
+print(f"✅ {output_path} saved，including PageRank、Degree、Betweenness、Closeness、Category")
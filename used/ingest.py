@@ -0,0 +1,281 @@
+"""One-pass streaming ingest of the arXiv metadata snapshot.
+
+Does the work of breakingmeta.py, cleandata.py, split_by_category.py and
+generate_category_counts.py in a single read of metadata.json: every line is
+cleaned and written straight to its cleaned shard (JSON lines) and to the
+columnar shard of each main category it belongs to, and counted into
+categories.json. Only file buffers are held, so memory stays flat however
+large the snapshot is.
+
+Every run records each paper's id, update_date and categories in the
+pipeline manifest (pipeline_manifest.py). With --incremental, a new snapshot
+is diffed against it and only new or changed papers are processed: their
+old rows are dropped from, and new rows appended to, the affected category
+shards (each rewritten into a new version and published atomically, so a
+running server keeps reading the old one until then), and categories.json and the stats cube are adjusted in place. datafiles_cleaned/ is left
+alone in that mode; a full run refreshes it. Rerunning on a snapshot the
+manifest has already seen does nothing.
+
+    python used/ingest.py --input metadata.json
+    python used/ingest.py --input metadata.json --incremental
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from arxiv_meta import CLEAN_FIELDS, clean_record, iter_records, main_categories
+from paper_shards import ShardReader, ShardWriter, is_shard
+from pipeline_manifest import Manifest
+import run_log
+from generate_category_counts import add_paper, build_output, load_output
+from stats_cube import CubeCounts
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def count_lines(path):
+    lines = 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            lines += block.count(b"\n")
+    return lines
+
+
+def manifest_row(paper):
+    return paper["id"], paper["update_date"], paper["categories"]
+
+
+def ingest(input_path, cleaned_dir, categories_dir, counts_file, cube_dir, num_files, manifest):
+    os.makedirs(cleaned_dir, exist_ok=True)
+    os.makedirs(categories_dir, exist_ok=True)
+
+    # Same split as breakingmeta.py: num_files shards of equal line count
+    chunk_size = max((count_lines(input_path) + num_files - 1) // num_files, 1)
+
+    writers = {}
+    shard = None
+    records = skipped = 0
+    category_counts, category_years = Counter(), {}
+    cube = CubeCounts()
+    manifest_rows = []
+    manifest.clear_papers()
+    start = time.perf_counter()
+
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f):
+            if line_no % chunk_size == 0:
+                if shard:
+                    shard.close()
+                part = line_no // chunk_size + 1
+                shard = open(os.path.join(cleaned_dir, f"metadata_part_{part}.json"), "w", encoding="utf-8")
+
+            try:
+                cleaned = clean_record(json.loads(line))
+            except json.JSONDecodeError:
+                skipped += 1
+                continue  # skip malformed lines
+
+            shard.write(json.dumps(cleaned) + "\n")
+            for category in main_categories(cleaned["categories"] or ""):
+                if category not in writers:
+                    writers[category] = ShardWriter(os.path.join(categories_dir, category), CLEAN_FIELDS)
+                writers[category].append(cleaned)
+            add_paper(cleaned["categories"], cleaned["update_date"], category_counts, category_years)
+            cube.add(cleaned["categories"], cleaned["update_date"])
+
+            manifest_rows.append(manifest_row(cleaned))
+            if len(manifest_rows) == 10000:
+                manifest.upsert_papers(manifest_rows)
+                manifest_rows = []
+
+            records += 1
+            if records % 100000 == 0:
+                elapsed = time.perf_counter() - start
+                print(f"  {records:,} records, {records / elapsed:,.0f} rec/s")
+
+    if shard:
+        shard.close()
+    for writer in writers.values():
+        writer.close()
+    write_counts(counts_file, records, category_counts, category_years)
+    cube.write(cube_dir)
+    manifest.upsert_papers(manifest_rows)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "mode": "full",
+        "records": records,
+        "skipped": skipped,
+        "categories": {category: writer.count for category, writer in sorted(writers.items())},
+        "seconds": round(elapsed, 2),
+        "records_per_second": round(records / elapsed) if elapsed > 0 else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1) if resource else None
+    }
+
+
+def write_counts(counts_file, total_paper_count, category_counts, category_years):
+    with open(counts_file, "w", encoding="utf-8") as f:
+        json.dump(build_output(total_paper_count, category_counts, category_years), f, indent=2)
+
+
+def ingest_incremental(input_path, categories_dir, counts_file, cube_dir, manifest):
+    if not manifest.paper_count() or not os.path.exists(counts_file):
+        sys.exit("No previous snapshot recorded; run a full ingest first.")
+
+    total_paper_count = manifest.paper_count()
+    category_counts, category_years = load_output(counts_file)
+    cube = CubeCounts.load(cube_dir) if os.path.exists(os.path.join(cube_dir, "meta.json")) else None
+    # category -> ids whose current row is superseded by this snapshot
+    superseded = {}
+    appended = Counter()
+    records = skipped = new = changed = 0
+    delta_path = os.path.join(categories_dir, ".delta.jsonl")
+    start = time.perf_counter()
+
+    def flush(batch):
+        nonlocal new, changed, total_paper_count
+        known = manifest.lookup(paper["id"] for paper in batch)
+        rows = []
+        for paper in batch:
+            old = known.get(paper["id"])
+            if old is not None and old[0] == paper["update_date"]:
+                continue
+
+            if old is None:
+                new += 1
+                total_paper_count += 1
+            else:
+                changed += 1
+                old_date, old_categories = old
+                add_paper(old_categories, old_date, category_counts, category_years, sign=-1)
+                if cube is not None:
+                    cube.add(old_categories, old_date, sign=-1)
+                for category in main_categories(old_categories or ""):
+                    superseded.setdefault(category, set()).add(paper["id"])
+
+            add_paper(paper["categories"], paper["update_date"], category_counts, category_years)
+            if cube is not None:
+                cube.add(paper["categories"], paper["update_date"])
+            appended.update(main_categories(paper["categories"] or ""))
+            delta.write(json.dumps(paper) + "\n")
+            rows.append(manifest_row(paper))
+        manifest.upsert_papers(rows)
+
+    # Diff the snapshot against the manifest in batches, spooling new and
+    # changed papers to a delta file
+    with open(input_path, "r", encoding="utf-8") as f, open(delta_path, "w", encoding="utf-8") as delta:
+        batch = []
+        for line in f:
+            try:
+                batch.append(clean_record(json.loads(line)))
+            except json.JSONDecodeError:
+                skipped += 1
+                continue  # skip malformed lines
+            records += 1
+            if len(batch) == 10000:
+                flush(batch)
+                batch = []
+        flush(batch)
+
+    for category in sorted(set(superseded) | set(appended)):
+        update_category_shard(os.path.join(categories_dir, category), category,
+                              superseded.get(category, set()), delta_path)
+    os.remove(delta_path)
+    if new or changed:
+        write_counts(counts_file, total_paper_count, category_counts, category_years)
+        if cube is not None:
+            cube.write(cube_dir)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "mode": "incremental",
+        "records": records,
+        "skipped": skipped,
+        "new": new,
+        "changed": changed,
+        "categories": dict(sorted(appended.items())),
+        "seconds": round(elapsed, 2),
+        "records_per_second": round(records / elapsed) if elapsed > 0 else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1) if resource else None
+    }
+
+
+def update_category_shard(path, category, superseded, delta_path):
+    """Rewrite one category shard without the superseded rows, then append
+    the delta papers that belong to it. Untouched rows are copied; with
+    nothing superseded the old columns are copied byte for byte.
+
+    The writer fills a new version of the shard and publishes it on close
+    (see paper_shards.py); until then the server, and the reader here, see
+    the old version unchanged. If the rewrite fails nothing is published."""
+    with ShardWriter(path, CLEAN_FIELDS) as writer:
+        if is_shard(path):
+            if not superseded:
+                writer.extend(path)
+            else:
+                reader = ShardReader(path)
+                keep_from = 0
+                for row, paper_id in enumerate(reader.iter_column("id")):
+                    if paper_id in superseded:
+                        for paper in reader.page(keep_from, row):
+                            writer.append(paper)
+                        keep_from = row + 1
+                for paper in reader.page(keep_from, len(reader)):
+                    writer.append(paper)
+
+        for paper in iter_records(delta_path):
+            if category in main_categories(paper["categories"] or ""):
+                writer.append(paper)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--input", default="metadata.json")
+    parser.add_argument("--cleaned-dir", default="datafiles_cleaned")
+    parser.add_argument("--categories-dir", default="datafiles_categories")
+    parser.add_argument("--num-files", type=int, default=30)
+    parser.add_argument("--counts-file", default="categories.json")
+    parser.add_argument("--cube-dir", default="stats_cube")
+    parser.add_argument("--manifest", default="pipeline_manifest.sqlite")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only process papers that are new or changed since the last run")
+    args = parser.parse_args()
+
+    run = run_log.start("ingest")
+    manifest = Manifest(args.manifest)
+    if args.incremental and manifest.is_current("ingest", [args.input]):
+        print(f"✅ {args.input} already ingested; nothing to do.")
+        run.status = "skipped"
+        return
+
+    if args.incremental:
+        report = ingest_incremental(args.input, args.categories_dir, args.counts_file, args.cube_dir, manifest)
+    else:
+        report = ingest(args.input, args.cleaned_dir, args.categories_dir, args.counts_file,
+                        args.cube_dir, args.num_files, manifest)
+    manifest.mark_done("ingest", [args.input], report)
+    manifest.close()
+    run.rows = report["records"]
+
+    print(json.dumps(report, indent=2))
+    print(f"✅ Ingested {report['records']:,} records at {report['records_per_second']:,} rec/s "
+          f"(peak RSS {report['peak_rss_mb']} MB)")
+
+
+if __name__ == "__main__":
+    main()
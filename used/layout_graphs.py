@@ -0,0 +1,148 @@
+import json
+import os
+import sys
+import glob
+import time
+import argparse
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import run_log
+from shard_runner import add_workers_argument, run_shards
+from graph_metrics import Graph
+from graph_layout import multilevel_layout
+
+# Precompute node positions for every graph the pages draw, so they render
+# at once instead of running a force simulation in the browser on each
+# visit. Coordinates are written into the graphs' own files:
+#   nodes.csv (graphdata/<field>/, semantic_clusters/<category>/, static/field_level_nodes.csv)
+#       -> x, y columns
+#   graph JSON files given with --json (default: coauthor_graph.json)
+#       -> x, y on every node, plus x3d, y3d, z3d for those listed in --3d
+# Graphs whose nodes already carry coordinates are skipped unless --force.
+
+
+def build_graph(ids, sources, targets, weights=None):
+    index = {node_id: i for i, node_id in enumerate(ids)}
+    keep = [i for i, (s, t) in enumerate(zip(sources, targets)) if s in index and t in index]
+    return Graph(
+        len(ids),
+        [index[sources[i]] for i in keep],
+        [index[targets[i]] for i in keep],
+        None if weights is None else [weights[i] for i in keep],
+        directed=False)
+
+
+def read_edges(path):
+    try:
+        return pd.read_csv(path)
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        return pd.DataFrame(columns=["source", "target"])
+
+
+def layout_csv(nodes_path, edges_path):
+    nodes = pd.read_csv(nodes_path)
+    edges = read_edges(edges_path)
+    weights = edges["weight"].abs().tolist() if "weight" in edges.columns else None
+    graph = build_graph(nodes["id"].tolist(), edges["source"].tolist(), edges["target"].tolist(), weights)
+
+    pos = multilevel_layout(graph).astype(float)
+    nodes["x"], nodes["y"] = pos[:, 0].round(2), pos[:, 1].round(2)
+    nodes.to_csv(nodes_path, index=False)
+    return graph.n
+
+
+def layout_json(path, three_d):
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    ids = [node["id"] for node in data["nodes"]]
+    sources = [link["source"] for link in data["links"]]
+    targets = [link["target"] for link in data["links"]]
+    weights = [link.get("weight", 1) for link in data["links"]]
+    graph = build_graph(ids, sources, targets, weights)
+
+    pos = multilevel_layout(graph).astype(float)
+    for node, (x, y) in zip(data["nodes"], pos.round(2).tolist()):
+        node["x"], node["y"] = x, y
+    if three_d:
+        pos = multilevel_layout(graph, dim=3).astype(float)
+        for node, (x, y, z) in zip(data["nodes"], pos.round(2).tolist()):
+            node["x3d"], node["y3d"], node["z3d"] = x, y, z
+
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(path + ".tmp", path)
+    return graph.n
+
+
+def layout_job(job):
+    """Lay out one graph; module level so it can run in a worker process."""
+    start = time.time()
+    if job[0] == "csv":
+        _, nodes_path, edges_path = job
+        count = layout_csv(nodes_path, edges_path)
+        label = nodes_path
+    else:
+        _, path, three_d = job
+        count = layout_json(path, three_d)
+        label = path
+    return label, count, time.time() - start
+
+
+def has_layout_csv(nodes_path):
+    columns = pd.read_csv(nodes_path, nrows=0).columns
+    return "x" in columns and "y" in columns
+
+
+def has_layout_json(path, three_d):
+    with open(path, encoding="utf-8") as f:
+        nodes = json.load(f)["nodes"]
+    keys = ("x", "y", "x3d") if three_d else ("x", "y")
+    return all(all(k in node for k in keys) for node in nodes)
+
+
+def report(results):
+    results = list(results)
+    for label, count, seconds in results:
+        print(f"   {label}: {count:,} nodes in {seconds:.1f}s")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute layouts for the graph pages")
+    parser.add_argument("--graphdata", default="graphdata", help="subfield graphs directory")
+    parser.add_argument("--semantic", default="semantic_clusters", help="semantic cluster graphs directory")
+    parser.add_argument("--field-level", default="static/field_level_nodes.csv", help="top-level field nodes CSV")
+    parser.add_argument("--json", nargs="*", default=["coauthor_graph.json"], help="graph JSON files to lay out")
+    parser.add_argument("--3d", dest="three_d", nargs="*", default=["coauthor_graph.json"],
+                        help="JSON files that also get 3D coordinates")
+    parser.add_argument("--force", action="store_true", help="recompute layouts that already exist")
+    add_workers_argument(parser)
+    args = parser.parse_args()
+    run = run_log.start("layouts")
+
+    jobs = []
+    csv_graphs = [(args.field_level, args.field_level.replace("_nodes.csv", "_edges.csv"))]
+    for root in (args.graphdata, args.semantic):
+        for nodes_path in sorted(glob.glob(os.path.join(root, "*", "nodes.csv"))):
+            csv_graphs.append((nodes_path, os.path.join(os.path.dirname(nodes_path), "edges.csv")))
+    for nodes_path, edges_path in csv_graphs:
+        if os.path.exists(nodes_path) and (args.force or not has_layout_csv(nodes_path)):
+            jobs.append(("csv", nodes_path, edges_path))
+    for path in args.json:
+        three_d = path in args.three_d
+        if os.path.exists(path) and (args.force or not has_layout_json(path, three_d)):
+            jobs.append(("json", path, three_d))
+
+    if not jobs:
+        print("✅ Every graph already has a layout; nothing to do.")
+        run.status = "skipped"
+        sys.exit(0)
+
+    # Largest first so one big graph does not start last
+    jobs.sort(key=lambda job: -os.path.getsize(job[1]))
+    print(f"⚙️ Laying out {len(jobs)} graph(s)...")
+    run_shards(layout_job, jobs, report, args.workers)
+    run.rows = len(jobs)
+    print("✅ Layouts written into the graph files.")
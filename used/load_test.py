@@ -0,0 +1,367 @@
+import os
+import sys
+import json
+import time
+import random
+import signal
+import argparse
+import platform
+import threading
+import subprocess
+import http.client
+from urllib.parse import quote
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from benchmark_pipeline import STAGES, current_commit, parse_size, prepare, run
+
+# Load-test the API against a local server on synthetic data (see
+# synthetic_arxiv.py). For each request mix and concurrency level, client
+# threads replay requests for a fixed time; the report gives throughput,
+# p50/p95/p99 latency and response size per endpoint, and the server's peak
+# memory while the phase ran.
+#
+#   python used/load_test.py --size 100k --concurrency 1,8,32 --output load.json
+#   python used/load_test.py --url http://127.0.0.1:8000      # a server already running
+#   python used/load_test.py --compare before.json after.json
+#
+# By default the server is gunicorn with gunicorn.conf.py, serving wsgi:app
+# from <workdir>/<size>/ (the dataset used/benchmark_pipeline.py writes, with
+# its category shards). Client and server share the machine, so compare runs
+# from the same host only.
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Request mixes: request kind -> weight
+MIXES = {
+    "paging": {"page": 1},
+    "search": {"search": 1},
+    "graphs": {"graph_data": 1, "coauthor_graph_data": 1, "citation_graph_data": 1},
+    "mixed": {"page": 60, "search": 25, "graph_data": 5, "coauthor_graph_data": 5, "citation_graph_data": 5},
+}
+
+
+class Workload:
+    """What there is to ask for, discovered from the server itself: the
+    categories with data, their page counts, and title words to search for."""
+
+    def __init__(self, conn):
+        status, body = get(conn, "/api/category_store")
+        if status != 200:
+            raise RuntimeError(f"/api/category_store answered {status}")
+        self.pages, self.words = {}, []
+        for category in json.loads(body):
+            status, body = get(conn, f"/api/{category}?page=1&fields=title")
+            if status != 200:
+                continue
+            page = json.loads(body)
+            self.pages[category] = max(page["total_pages"], 1)
+            for paper in page["papers"]:
+                self.words += [word for word in (paper.get("title") or "").lower().split() if len(word) > 3]
+        if not self.pages:
+            raise RuntimeError("the server has no category data")
+        self.words = sorted(set(self.words)) or ["graph"]
+
+    def request(self, kind, rng):
+        """(endpoint, path) of one request of this kind."""
+        if kind in ("graph_data", "coauthor_graph_data", "citation_graph_data"):
+            return f"/api/{kind}", f"/api/{kind}"
+        category = rng.choice(sorted(self.pages))
+        if kind == "page":
+            return "/api/<category>", f"/api/{category}?page={rng.randint(1, self.pages[category])}"
+        return "/api/<category>/search", f"/api/{category}/search?q={quote(rng.choice(self.words))}"
+
+
+def get(conn, path):
+    """(status, body) of a GET, with the headers a browser would send."""
+    conn.request("GET", path, headers={"Accept-Encoding": "gzip"})
+    response = conn.getresponse()
+    return response.status, response.read()
+
+
+def server_memory(pid):
+    """(RSS, PSS) in MB summed over pid and its descendants. RSS counts pages
+    shared between preforked workers once per worker; PSS splits them."""
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                pass
+    tree, frontier = [pid], [pid]
+    while frontier:
+        frontier = [child for child, parent in parents.items() if parent in frontier]
+        tree += frontier
+
+    rss = pss = 0
+    for member in tree:
+        try:
+            with open(f"/proc/{member}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith("Rss:"):
+                        rss += int(line.split()[1])
+                    elif line.startswith("Pss:"):
+                        pss += int(line.split()[1])
+        except OSError:
+            pass
+    return rss / 1024, pss / 1024
+
+
+class MemorySampler(threading.Thread):
+    """Peak server RSS and PSS while running."""
+
+    def __init__(self, pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.pid, self.interval = pid, interval
+        self.peak_rss = self.peak_pss = 0.0
+        self._done = threading.Event()
+
+    def run(self):
+        while True:
+            rss, pss = server_memory(self.pid)
+            self.peak_rss, self.peak_pss = max(self.peak_rss, rss), max(self.peak_pss, pss)
+            if self._done.wait(self.interval):
+                return
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+def client(host, port, workload, mix, deadline, seed, samples):
+    """Send requests from the mix until the deadline, appending
+    (endpoint, seconds, status, bytes) to samples."""
+    rng = random.Random(seed)
+    kinds, weights = list(mix), list(mix.values())
+    conn = http.client.HTTPConnection(host, port, timeout=300)
+    while time.perf_counter() < deadline:
+        endpoint, path = workload.request(rng.choices(kinds, weights)[0], rng)
+        start = time.perf_counter()
+        try:
+            status, body = get(conn, path)
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=300)
+            status, body = None, b""
+        samples.append((endpoint, time.perf_counter() - start, status, len(body)))
+    conn.close()
+
+
+def run_phase(host, port, workload, mix, concurrency, duration, seed, server_pid):
+    """One mix at one concurrency level; returns per-endpoint results."""
+    samples = []
+    sampler = MemorySampler(server_pid) if server_pid else None
+    if sampler:
+        sampler.start()
+    start = time.perf_counter()
+    deadline = start + duration
+    threads = [threading.Thread(target=client, args=(host, port, workload, mix, deadline, seed + i, samples))
+               for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if sampler:
+        sampler.stop()
+
+    results = []
+    for endpoint in sorted({sample[0] for sample in samples}):
+        rows = [sample for sample in samples if sample[0] == endpoint]
+        ok = np.array([seconds for _, seconds, status, _ in rows if status in (200, 304)]) * 1000
+        results.append({
+            "endpoint": endpoint,
+            "requests": len(rows),
+            "errors": len(rows) - len(ok),
+            "rps": round(len(rows) / elapsed, 2),
+            "p50_ms": round(float(np.percentile(ok, 50)), 2) if len(ok) else None,
+            "p95_ms": round(float(np.percentile(ok, 95)), 2) if len(ok) else None,
+            "p99_ms": round(float(np.percentile(ok, 99)), 2) if len(ok) else None,
+            "mean_bytes": round(sum(size for *_, size in rows) / len(rows)),
+            "server_rss_mb": round(sampler.peak_rss, 1) if sampler else None,
+            "server_pss_mb": round(sampler.peak_pss, 1) if sampler else None,
+        })
+    return results
+
+
+def start_server(data_dir, app_module, port, workers, threads, startup_timeout):
+    """gunicorn serving app_module from data_dir; returns the process once
+    the app answers."""
+    env = dict(os.environ, BIND=f"127.0.0.1:{port}", WEB_CONCURRENCY=str(workers), THREADS=str(threads))
+    command = [sys.executable, "-m", "gunicorn", "-c", os.path.join(REPO_DIR, "gunicorn.conf.py"),
+               "--pythonpath", REPO_DIR, app_module]
+    log = open(os.path.join(data_dir, "server.log"), "w", encoding="utf-8")
+    proc = subprocess.Popen(command, cwd=data_dir, env=env, stdout=log, stderr=subprocess.STDOUT,
+                            start_new_session=True)
+    deadline = time.perf_counter() + startup_timeout
+    while time.perf_counter() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with {proc.returncode}; see {log.name}")
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        try:
+            if get(conn, "/api/category_store")[0] == 200:
+                return proc
+        except (OSError, http.client.HTTPException):
+            pass
+        finally:
+            conn.close()
+        # Not listening yet, or answering with an error while it loads
+        time.sleep(0.5)
+    stop_server(proc)
+    raise RuntimeError(f"server not answering after {startup_timeout:.0f}s; see {log.name}")
+
+
+def stop_server(proc):
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        os.killpg(proc.pid, signal.SIGKILL)
+        proc.wait()
+    except ProcessLookupError:
+        pass
+
+
+def prepare_server_data(size, seed, workdir):
+    """<workdir>/<size>/ laid out the way app.py reads it: category shards in
+    datafiles_categories/ and the graph CSV as datafiles/arxiv.csv."""
+    data_dir, _ = prepare(size, seed, workdir)
+    if not os.path.isdir(os.path.join(data_dir, "datafiles_categories")):
+        for stage in ("clean", "split"):
+            script, extra = STAGES[stage]
+            command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), script)]
+            command += [arg.format(workers=os.cpu_count()) for arg in extra]
+            status, seconds, _ = run(command, data_dir, os.path.join(data_dir, f"{stage}.log"), None)
+            if status != "ok":
+                raise RuntimeError(f"{stage} failed ({status}); see {data_dir}/{stage}.log")
+            print(f"⚙️ {stage} in {seconds:.1f}s")
+    served_csv = os.path.join(data_dir, "datafiles", "arxiv.csv")
+    if not os.path.exists(served_csv):
+        os.link(os.path.join(data_dir, "arxiv.csv"), served_csv)
+    return data_dir
+
+
+def compare(old_path, new_path, tolerance):
+    """Print old vs new throughput and p95 for every (mix, concurrency,
+    endpoint) in both files; returns the number of regressions beyond tolerance."""
+    with open(old_path, encoding="utf-8") as f:
+        old = {(r["mix"], r["concurrency"], r["endpoint"]): r for r in json.load(f)["results"]}
+    with open(new_path, encoding="utf-8") as f:
+        new = {(r["mix"], r["concurrency"], r["endpoint"]): r for r in json.load(f)["results"]}
+
+    regressions = 0
+    print(f"{'mix':<8} {'conc':>4}  {'endpoint':<26} {'req/s':>19} {'p95 ms':>21}")
+    for key in sorted(old.keys() & new.keys()):
+        a, b = old[key], new[key]
+        flags = []
+        if b["rps"] < a["rps"] * (1 - tolerance):
+            flags.append("throughput")
+        if a["p95_ms"] is not None and (b["p95_ms"] is None or b["p95_ms"] > a["p95_ms"] * (1 + tolerance)):
+            flags.append("p95")
+        if b["errors"] > a["errors"]:
+            flags.append("errors")
+        regressions += bool(flags)
+        print(f"{key[0]:<8} {key[1]:>4}  {key[2]:<26} {a['rps']:>8.1f} -> {b['rps']:>8.1f} "
+              f"{a['p95_ms'] or 0:>9.1f} -> {b['p95_ms'] or 0:>9.1f}"
+              + ("  ❌ " + ", ".join(flags) if flags else ""))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the API with request mixes at fixed concurrency")
+    parser.add_argument("--size", default="100k", help="synthetic papers to serve, e.g. 10k, 100k, 1m")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default="bench_data", help="where datasets are kept, one directory per size")
+    parser.add_argument("--mixes", default=",".join(MIXES), help=f"comma-separated subset of {','.join(MIXES)}")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated client thread counts")
+    parser.add_argument("--duration", type=float, default=20, help="seconds per mix and concurrency level")
+    parser.add_argument("--url", help="test a server that is already running instead of starting one")
+    parser.add_argument("--server-pid", type=int, help="with --url: the server's pid, for memory figures")
+    parser.add_argument("--app", default="wsgi:app", help="WSGI app gunicorn serves (default wsgi:app)")
+    parser.add_argument("--server-workers", type=int, default=os.cpu_count(), help="gunicorn workers")
+    parser.add_argument("--server-threads", type=int, default=4, help="threads per gunicorn worker")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--startup-timeout", type=float, default=900, help="seconds to wait for the server")
+    parser.add_argument("--output", default="load_test.json", help="results file")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two results files instead")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="throughput drop or p95 growth counted as a regression (default 0.2 = 20%%)")
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare(*args.compare, args.tolerance)
+        print(f"{'❌' if regressions else '✅'} {regressions} regression(s) beyond {args.tolerance:.0%}")
+        sys.exit(1 if regressions else 0)
+
+    mixes = [mix.strip() for mix in args.mixes.split(",") if mix.strip()]
+    unknown = [mix for mix in mixes if mix not in MIXES]
+    if unknown:
+        parser.error(f"unknown mix(es): {', '.join(unknown)}")
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    server, size = None, None
+    if args.url:
+        address = args.url.split("://", 1)[-1].rstrip("/")
+        host, _, port = address.partition(":")
+        port, server_pid = int(port or 80), args.server_pid
+    else:
+        size = parse_size(args.size)
+        data_dir = prepare_server_data(size, args.seed, os.path.abspath(args.workdir))
+        print(f"📥 Starting {args.app} on {size:,} papers...")
+        start = time.perf_counter()
+        server = start_server(data_dir, args.app, args.port, args.server_workers, args.server_threads,
+                              args.startup_timeout)
+        print(f"✅ Server up in {time.perf_counter() - start:.1f}s")
+        host, port, server_pid = "127.0.0.1", args.port, server.pid
+
+    try:
+        conn = http.client.HTTPConnection(host, port, timeout=300)
+        workload = Workload(conn)
+
+        # First hits build graph payloads and search indexes; keep them out of the numbers
+        warmup = {}
+        rng = random.Random(args.seed)
+        for kind in sorted({kind for mix in mixes for kind in MIXES[mix]}):
+            endpoint, path = workload.request(kind, rng)
+            start = time.perf_counter()
+            status, _ = get(conn, path)
+            warmup[endpoint] = {"status": status, "ms": round((time.perf_counter() - start) * 1000, 1)}
+        conn.close()
+        idle_rss, idle_pss = server_memory(server_pid) if server_pid else (None, None)
+
+        results = []
+        for mix in mixes:
+            for concurrency in levels:
+                phase = run_phase(host, port, workload, MIXES[mix], concurrency, args.duration, args.seed, server_pid)
+                print(f"⚙️ {mix} × {concurrency}")
+                for row in phase:
+                    results.append(dict(row, mix=mix, concurrency=concurrency))
+                    print(f"   {row['endpoint']:<26} {row['rps']:>8.1f} req/s  p50 {row['p50_ms'] or 0:>8.1f}  "
+                          f"p95 {row['p95_ms'] or 0:>8.1f}  p99 {row['p99_ms'] or 0:>8.1f} ms  "
+                          f"{row['errors']} errors  {row['server_pss_mb'] or 0:,.0f} MB PSS")
+    finally:
+        if server:
+            stop_server(server)
+
+    report = {
+        "commit": current_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "papers": size,
+        "seed": args.seed,
+        "server": {"url": args.url} if args.url else
+                  {"app": args.app, "workers": args.server_workers, "threads": args.server_threads},
+        "duration": args.duration,
+        "idle_server_rss_mb": round(idle_rss, 1) if idle_rss is not None else None,
+        "idle_server_pss_mb": round(idle_pss, 1) if idle_pss is not None else None,
+        "warmup": warmup,
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ {len(results)} measurements written to {args.output}")
@@ -1,30 +1,29 @@
 import json
+import os
+import sys
+import argparse
 
-# Load full graph
-with open("graph.json", "r") as f:
-    full_graph = json.load(f)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from graph_store import GraphStore
 
-# How many top nodes to keep
-TOP_N = 10000
+# Write a top-N sample of a stored graph (see used/build_graph_tiles.py) to a
+# JSON file. The app serves the same samples on demand at
+# /api/subgraph?graph=&top=&metric=&category=&year=; this is for offline use.
+parser = argparse.ArgumentParser(description="Extract the top-N induced subgraph of a stored graph")
+parser.add_argument("--graph", default="author_paper", help="stored graph name")
+parser.add_argument("--store", default="graph_store", help="graph store root")
+parser.add_argument("--top", type=int, default=10000, help="how many top nodes to keep")
+parser.add_argument("--metric", default="pagerank", help="ranking metric")
+parser.add_argument("--output", default="sample_graph.json")
+args = parser.parse_args()
 
-# Sort and take top N nodes by PageRank
-top_nodes = sorted(full_graph["nodes"], key=lambda n: -n.get("pagerank", 0))[:TOP_N]
-top_node_ids = {node["id"] for node in top_nodes}
+graph = GraphStore(args.store).get(args.graph)
+if graph is None:
+    sys.exit(f"❌ No stored graph {args.graph!r} under {args.store}/; run used/build_graph_tiles.py first.")
 
-# Filter links: both source and target must be in top_node_ids
-filtered_links = [
-    link for link in full_graph["links"]
-    if link["source"] in top_node_ids and link["target"] in top_node_ids
-]
+subgraph = graph.subgraph(args.top, metric=args.metric)
 
-# Final subgraph
-subgraph = {
-    "nodes": top_nodes,
-    "links": filtered_links
-}
-
-# Save subgraph to new JSON file
-with open("sample_graph.json", "w") as f:
+with open(args.output, "w") as f:
     json.dump(subgraph, f, indent=2)
 
-print(f"✅ Extracted {len(top_nodes)} nodes and {len(filtered_links)} links into sample_graph.json")
\ No newline at end of file
+print(f"✅ Extracted {len(subgraph['nodes'])} nodes and {len(subgraph['links'])} links into {args.output}")
@@ -1,50 +1,64 @@
 import os
-import json
-from collections import defaultdict
+import sys
+import shutil
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from arxiv_meta import CLEAN_FIELDS, iter_records, main_categories
+from paper_shards import ShardWriter
+import run_log
+from shard_runner import add_workers_argument, run_shards, shard_paths
 
 # Define input and output directories
 input_dir = "datafiles_cleaned"
 output_dir = "datafiles_categories"
-os.makedirs(output_dir, exist_ok=True)
-
-# Category mapping (prefix to main category)
-prefix_to_category = {
-    "astro-ph": "physics", "cond-mat": "physics", "gr-qc": "physics", "hep-ex": "physics",
-    "hep-lat": "physics", "hep-ph": "physics", "hep-th": "physics", "math-ph": "physics",
-    "nlin": "physics", "nucl-ex": "physics", "nucl-th": "physics", "physics": "physics", "quant-ph": "physics",
-    "math": "mathematics",
-    "cs": "computer_science",
-    "q-bio": "quantitative_biology",
-    "q-fin": "quantitative_finance",
-    "stat": "statistics",
-    "eess": "electrical_engineering",
-    "econ": "economics"
-}
-
-# Prepare a dictionary for storing categorized papers
-categorized_papers = defaultdict(list)
-
-# Process all metadata_part_X.json files
-for i in range(1, 31):
-    filename = f"metadata_part_{i}.json"
-    filepath = os.path.join(input_dir, filename)
-    
-    with open(filepath, "r", encoding="utf-8") as f:
-        data = json.load(f)
-        for paper in data.get("nodes", []):
-            categories = paper.get("categories", "")
-            prefixes = {cat.split(".")[0] for cat in categories.split()}
-            assigned = set()
-            for prefix in prefixes:
-                main_category = prefix_to_category.get(prefix)
-                if main_category and main_category not in assigned:
-                    categorized_papers[main_category].append(paper)
-                    assigned.add(main_category)
-
-# Save each category to its own JSON file
-for category, papers in categorized_papers.items():
-    out_path = os.path.join(output_dir, f"{category}.json")
-    with open(out_path, "w", encoding="utf-8") as out_file:
-        json.dump({"nodes": papers}, out_file, indent=2)
-
-print("✅ Papers successfully categorized into datafiles_categories/")
\ No newline at end of file
+parts_dir = os.path.join(output_dir, ".parts")
+
+
+def split_shard(input_path):
+    """Bucket one cleaned shard by main category into per-shard columnar
+    parts (see paper_shards.py); returns {category: part path}."""
+    part_name = os.path.splitext(os.path.basename(input_path))[0]
+    writers = {}
+
+    for paper in iter_records(input_path):
+        for main_category in main_categories(paper.get("categories") or ""):
+            if main_category not in writers:
+                path = os.path.join(parts_dir, main_category, part_name)
+                writers[main_category] = ShardWriter(path, CLEAN_FIELDS)
+            writers[main_category].append(paper)
+
+    for writer in writers.values():
+        writer.close()
+    return {category: writer.path for category, writer in writers.items()}
+
+
+def merge_parts(shard_results):
+    """Concatenate each category's parts in shard order into its final shard."""
+    parts = {}
+    for result in shard_results:
+        for category, path in result.items():
+            parts.setdefault(category, []).append(path)
+
+    counts = {}
+    for category, paths in parts.items():
+        with ShardWriter(os.path.join(output_dir, category), CLEAN_FIELDS) as writer:
+            for path in paths:
+                writer.extend(path)
+        counts[category] = writer.count
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split the cleaned shards by main category")
+    add_workers_argument(parser)
+    args = parser.parse_args()
+    run = run_log.start("split")
+
+    os.makedirs(output_dir, exist_ok=True)
+    shutil.rmtree(parts_dir, ignore_errors=True)
+    counts = run_shards(split_shard, shard_paths(input_dir), merge_parts, args.workers)
+    shutil.rmtree(parts_dir, ignore_errors=True)
+    run.rows = sum(counts.values())
+
+    print(f"✅ Papers successfully categorized into datafiles_categories/ ({len(counts)} categories)")
@@ -0,0 +1,29 @@
+"""Production entry point for a preforking WSGI server:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+gunicorn.conf.py sets preload_app, so this module is imported once, in the
+master, before any worker is forked. Everything app.preload_data() loads
+(category data and search indexes, the parsed arxiv.csv and graph payloads,
+and the memory-mapped stores) is then shared copy-on-write by every
+worker instead of being loaded again per worker. The mmap-backed stores
+share the page cache regardless.
+
+A store rebuilt while serving is reopened by each worker on its next
+request, as under app.py; that copy is private to the worker until the
+server is restarted (or sent SIGHUP).
+"""
+import gc
+
+import metrics
+from app import app, preload_data
+
+preload_data()
+
+# Publish the load times recorded above under the master's pid; each worker
+# counts its own requests from zero (see metrics.py)
+metrics.registry.publish(force=True)
+
+# Nothing loaded above is garbage; freezing it keeps the collector from
+# writing to those objects, which would copy their pages into every worker
+gc.freeze()